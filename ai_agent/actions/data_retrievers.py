@@ -1,14 +1,24 @@
-import json
+from data_manager.data_loader import DataLoader
+from data_manager.aggregates import Aggregates
 
 
 class DataRetrievers:
     """Classe pour gérer la récupération de données du système éducatif"""
     
+    def __init__(self, data_path: str = "data/"):
+        self.data_loader = DataLoader(data_path)
+    
+    def _records(self, name: str, data: dict) -> list:
+        """Collection via le store, limitée à une période si data contient created_after / created_before"""
+        after, before = data.get("created_after"), data.get("created_before")
+        if after or before:
+            return self.data_loader.get_created_between(name, after, before)
+        return self.data_loader.load_json_file(f"{name}.json")
+    
     def get_etudiants(self, data: dict) -> str:
         """Récupère la liste des étudiants"""
         try:
-            with open("data/etudiants.json", 'r') as f:
-                etudiants = json.load(f)
+            etudiants = self._records("etudiants", data)
             
             if not etudiants:
                 return "📋 Aucun étudiant enregistré"
@@ -27,8 +37,7 @@ class DataRetrievers:
     def get_professeurs(self, data: dict) -> str:
         """Récupère la liste des professeurs"""
         try:
-            with open("data/professeurs.json", 'r') as f:
-                professeurs = json.load(f)
+            professeurs = self._records("professeurs", data)
             
             if not professeurs:
                 return "📋 Aucun professeur enregistré"
@@ -47,8 +56,7 @@ class DataRetrievers:
     def get_cours(self, data: dict) -> str:
         """Récupère la liste des cours"""
         try:
-            with open("data/cours.json", 'r') as f:
-                cours = json.load(f)
+            cours = self._records("cours", data)
             
             if not cours:
                 return "📋 Aucun cours enregistré"
@@ -68,8 +76,7 @@ class DataRetrievers:
     def get_notes(self, data: dict) -> str:
         """Récupère la liste des notes"""
         try:
-            with open("data/notes.json", 'r') as f:
-                notes = json.load(f)
+            notes = self._records("notes", data)
             
             if not notes:
                 return "📋 Aucune note enregistrée"
@@ -91,9 +98,8 @@ class DataRetrievers:
     def get_stats(self, data: dict) -> str:
         """Récupère les statistiques du système"""
         try:
-            # Récupération des données pour calculer les stats
-            current_data = self._get_current_data()
-            stats = current_data.get('stats', {})
+            # Agrégats tenus à jour à chaque écriture : aucune collection n'est relue
+            stats = Aggregates.for_store(self.data_loader.store).summary()
             
             result = "📊 **Statistiques du système :**\n\n"
             result += f"👨‍🏫 Professeurs: {stats.get('nb_professeurs', 0)}\n"
@@ -111,8 +117,7 @@ class DataRetrievers:
     def get_reviews(self, data: dict) -> str:
         """Récupère la liste des reviews"""
         try:
-            with open("data/reviews.json", 'r') as f:
-                reviews = json.load(f)
+            reviews = self._records("reviews", data)
             
             if not reviews:
                 return "📋 Aucune review enregistrée"
@@ -131,11 +136,39 @@ class DataRetrievers:
         except Exception as e:
             return f"❌ Erreur: {str(e)}"
     
+    def get_review_stats(self, data: dict) -> str:
+        """Résumé des reviews d'un cours, d'un professeur ou de l'ensemble (agrégats tenus à jour)"""
+        try:
+            aggregates = Aggregates.for_store(self.data_loader.store)
+            if data.get("cours_id") is not None:
+                titre = f"du cours {data['cours_id']}"
+                resume = aggregates.reviews(cours_id=int(data["cours_id"]))
+            elif data.get("professeur_id") is not None:
+                titre = f"du professeur {data['professeur_id']}"
+                resume = aggregates.reviews(professeur_id=int(data["professeur_id"]))
+            else:
+                titre = "de tous les cours"
+                resume = aggregates.reviews()
+            
+            if not resume["nombre"]:
+                return f"📋 Aucune review {titre}"
+            
+            result = f"⭐ **Reviews {titre} :**\n\n"
+            result += f"📋 Nombre: {resume['nombre']}\n"
+            result += f"📊 Moyenne: {resume['moyenne']}/5\n"
+            result += f"👍 Positives (4 ou 5): {round(resume['ratio_positives'] * 100)}%\n"
+            for etoiles, nombre in sorted(resume["etoiles"].items(), reverse=True):
+                result += f"  {etoiles}/5: {nombre}\n"
+            
+            return result
+            
+        except Exception as e:
+            return f"❌ Erreur: {str(e)}"
+    
     def get_evaluations(self, data: dict) -> str:
         """Récupère la liste des évaluations"""
         try:
-            with open("data/evaluations.json", 'r') as f:
-                evaluations = json.load(f)
+            evaluations = self._records("evaluations", data)
             
             if not evaluations:
                 return "📋 Aucune évaluation enregistrée"
@@ -151,38 +184,3 @@ class DataRetrievers:
             
         except Exception as e:
             return f"❌ Erreur: {str(e)}"
-    
-    def _get_current_data(self) -> dict:
-        """Récupère les données actuelles du système pour les stats"""
-        try:
-            with open("data/professeurs.json", 'r') as f:
-                professeurs = json.load(f)
-            with open("data/etudiants.json", 'r') as f:  
-                etudiants = json.load(f)
-            with open("data/cours.json", 'r') as f:
-                cours = json.load(f)
-            with open("data/evaluations.json", 'r') as f:
-                evaluations = json.load(f)
-            with open("data/notes.json", 'r') as f:
-                notes = json.load(f)
-            with open("data/reviews.json", 'r') as f:
-                reviews = json.load(f)
-                
-            return {
-                "professeurs": professeurs,
-                "etudiants": etudiants, 
-                "cours": cours,
-                "evaluations": evaluations,
-                "notes": notes,
-                "reviews": reviews,
-                "stats": {
-                    "nb_professeurs": len(professeurs),
-                    "nb_etudiants": len(etudiants),
-                    "nb_cours": len(cours),
-                    "nb_evaluations": len(evaluations),
-                    "nb_notes": len(notes),
-                    "nb_reviews": len(reviews)
-                }
-            }
-        except Exception:
-            return {"erreur": "Impossible de charger les données"}
\ No newline at end of file
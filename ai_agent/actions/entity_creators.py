@@ -1,23 +1,29 @@
-import json
 from datetime import datetime
+from data_manager.json_handler import JsonHandler
 
 
 class EntityCreators:
     """Classe pour gérer la création d'entités dans le système éducatif"""
     
+    def __init__(self):
+        self.json_handler = JsonHandler("data/")
+    
+    def _default_email(self, filename: str, nom: str, domaine: str, new_id: int) -> str:
+        """Email par défaut dérivé du nom, suffixé par l'ID s'il est déjà pris (email unique)"""
+        base = nom.lower().replace(' ', '.')
+        email = f"{base}@{domaine}"
+        if self.json_handler.store.find_unique(filename, "email", email) is not None:
+            email = f"{base}.{new_id}@{domaine}"
+        return email
+    
     def create_professeur(self, data: dict) -> str:
         """Crée un professeur"""
         try:
             nom = data.get("nom", "Professeur Inconnu")
-            email = data.get("email", f"{nom.lower().replace(' ', '.')}@university.com")
+            new_id = self.json_handler.store.next_id("professeurs.json")
+            email = data.get("email") or self._default_email("professeurs.json", nom, "university.com", new_id)
             specialite = data.get("specialite", "Enseignement général")
             
-            json_path = "data/professeurs.json"
-            with open(json_path, 'r') as f:
-                professeurs = json.load(f)
-            
-            new_id = (max([p.get('id', 0) for p in professeurs]) if professeurs else 0) + 1
-            
             nouveau = {
                 "id": new_id,
                 "nom": nom,
@@ -26,10 +32,9 @@ class EntityCreators:
                 "date_creation": datetime.now().isoformat()
             }
             
-            professeurs.append(nouveau)
-            
-            with open(json_path, 'w') as f:
-                json.dump(professeurs, f, indent=2, ensure_ascii=False)
+            new_id = self.json_handler.add_item("professeurs.json", nouveau)
+            if new_id is None:
+                return "❌ Erreur: sauvegarde impossible"
             
             return f"✅ Professeur {nom} créé (ID: {new_id})"
             
@@ -40,21 +45,10 @@ class EntityCreators:
         """Crée un étudiant"""
         try:
             nom = data.get("nom", "Étudiant Inconnu")
-            email = data.get("email", f"{nom.lower().replace(' ', '.')}@student.com")
-            
-            # Calcul du numéro d'étudiant
-            try:
-                with open("data/etudiants.json", 'r') as f:
-                    existing_students = json.load(f)
-                numero = data.get("numero_etudiant", f"E2024{len(existing_students) + 1:03d}")
-            except:
-                numero = data.get("numero_etudiant", "E2024001")
-            
-            json_path = "data/etudiants.json"
-            with open(json_path, 'r') as f:
-                etudiants = json.load(f)
-            
-            new_id = (max([e.get('id', 0) for e in etudiants]) if etudiants else 0) + 1
+            # Numéro dérivé de l'ID (séquence jamais réutilisée, même après des suppressions)
+            new_id = self.json_handler.store.next_id("etudiants.json")
+            email = data.get("email") or self._default_email("etudiants.json", nom, "student.com", new_id)
+            numero = data.get("numero_etudiant") or f"E2024{new_id:03d}"
             
             nouveau = {
                 "id": new_id,
@@ -64,10 +58,9 @@ class EntityCreators:
                 "date_creation": datetime.now().isoformat()
             }
             
-            etudiants.append(nouveau)
-            
-            with open(json_path, 'w') as f:
-                json.dump(etudiants, f, indent=2, ensure_ascii=False)
+            new_id = self.json_handler.add_item("etudiants.json", nouveau)
+            if new_id is None:
+                return "❌ Erreur: sauvegarde impossible"
             
             return f"✅ Étudiant {nom} créé (ID: {new_id})"
             
@@ -78,16 +71,11 @@ class EntityCreators:
         """Crée un cours"""
         try:
             nom = data.get("nom", "Cours Inconnu")
-            code = data.get("code", f"{nom[:3].upper()}001")
+            new_id = self.json_handler.store.next_id("cours.json")
+            code = data.get("code") or f"{nom[:3].upper()}{new_id:03d}"
             credits = data.get("credits", 3)
             professeur_id = data.get("professeur_id", 1)
             
-            json_path = "data/cours.json"
-            with open(json_path, 'r') as f:
-                cours = json.load(f)
-            
-            new_id = (max([c.get('id', 0) for c in cours]) if cours else 0) + 1
-            
             nouveau = {
                 "id": new_id,
                 "nom": nom,
@@ -97,10 +85,9 @@ class EntityCreators:
                 "date_creation": datetime.now().isoformat()
             }
             
-            cours.append(nouveau)
-            
-            with open(json_path, 'w') as f:
-                json.dump(cours, f, indent=2, ensure_ascii=False)
+            new_id = self.json_handler.add_item("cours.json", nouveau)
+            if new_id is None:
+                return "❌ Erreur: sauvegarde impossible"
             
             return f"✅ Cours {nom} créé (ID: {new_id})"
             
@@ -115,14 +102,7 @@ class EntityCreators:
             eval_type = data.get("type", "controle")
             coefficient = data.get("coefficient", 1)
             
-            json_path = "data/evaluations.json"
-            with open(json_path, 'r') as f:
-                evaluations = json.load(f)
-            
-            new_id = (max([e.get('id', 0) for e in evaluations]) if evaluations else 0) + 1
-            
             nouveau = {
-                "id": new_id,
                 "nom": nom,
                 "cours_id": cours_id,
                 "type": eval_type,
@@ -130,10 +110,9 @@ class EntityCreators:
                 "date_creation": datetime.now().isoformat()
             }
             
-            evaluations.append(nouveau)
-            
-            with open(json_path, 'w') as f:
-                json.dump(evaluations, f, indent=2, ensure_ascii=False)
+            new_id = self.json_handler.add_item("evaluations.json", nouveau)
+            if new_id is None:
+                return "❌ Erreur: sauvegarde impossible"
             
             return f"✅ Évaluation {nom} créée (ID: {new_id})"
             
@@ -148,14 +127,7 @@ class EntityCreators:
             valeur = data.get("valeur", 10.0)
             commentaire = data.get("commentaire", "")
             
-            json_path = "data/notes.json"
-            with open(json_path, 'r') as f:
-                notes = json.load(f)
-            
-            new_id = (max([n.get('id', 0) for n in notes]) if notes else 0) + 1
-            
             nouveau = {
-                "id": new_id,
                 "etudiant_id": etudiant_id,
                 "evaluation_id": evaluation_id,
                 "valeur": float(valeur),
@@ -163,10 +135,9 @@ class EntityCreators:
                 "date_creation": datetime.now().isoformat()
             }
             
-            notes.append(nouveau)
-            
-            with open(json_path, 'w') as f:
-                json.dump(notes, f, indent=2, ensure_ascii=False)
+            new_id = self.json_handler.add_item("notes.json", nouveau)
+            if new_id is None:
+                return "❌ Erreur: sauvegarde impossible"
             
             return f"✅ Note {valeur}/20 créée (ID: {new_id})"
             
@@ -181,14 +152,7 @@ class EntityCreators:
             note = data.get("note", 3)
             commentaire = data.get("commentaire", "Pas de commentaire")
             
-            json_path = "data/reviews.json"
-            with open(json_path, 'r') as f:
-                reviews = json.load(f)
-            
-            new_id = (max([r.get('id', 0) for r in reviews]) if reviews else 0) + 1
-            
             nouveau = {
-                "id": new_id,
                 "etudiant_id": etudiant_id,
                 "cours_id": cours_id,
                 "note": int(note),
@@ -196,10 +160,9 @@ class EntityCreators:
                 "date_creation": datetime.now().isoformat()
             }
             
-            reviews.append(nouveau)
-            
-            with open(json_path, 'w') as f:
-                json.dump(reviews, f, indent=2, ensure_ascii=False)
+            new_id = self.json_handler.add_item("reviews.json", nouveau)
+            if new_id is None:
+                return "❌ Erreur: sauvegarde impossible"
             
             return f"✅ Review {note}/5 créée (ID: {new_id})"
             
@@ -4,6 +4,7 @@ from openai import OpenAI
 from dotenv import load_dotenv
 from data_manager.data_loader import DataLoader
 from data_manager.data_saver import DataSaver
+from data_manager.aggregates import Aggregates
 from ..utils.action_processor import ActionProcessor
 
 load_dotenv()
@@ -75,40 +76,16 @@ Pour consulter des données, utilise ces actions :
 {"action": "get_stats"}
 {"action": "get_reviews"}
 {"action": "get_evaluations"}
+{"action": "get_review_stats", "cours_id": 1} (ou "professeur_id", ou sans filtre : moyenne, étoiles, part de reviews positives)
+Les listes acceptent une période de création (dates ISO) : {"action": "get_notes", "created_after": "2024-09-01", "created_before": "2024-10-01"}
 
 Si l'utilisateur pose une question, réponds naturellement puis ajoute le JSON si nécessaire pour effectuer une action."""
     
     def _get_current_data(self) -> dict:
         """Récupère les données du système"""
         try:
-            with open("data/professeurs.json", 'r') as f:
-                professeurs = json.load(f)
-            with open("data/etudiants.json", 'r') as f:  
-                etudiants = json.load(f)
-            with open("data/cours.json", 'r') as f:
-                cours = json.load(f)
-            with open("data/evaluations.json", 'r') as f:
-                evaluations = json.load(f)
-            with open("data/notes.json", 'r') as f:
-                notes = json.load(f)
-            with open("data/reviews.json", 'r') as f:
-                reviews = json.load(f)
-                
-            return {
-                "professeurs": professeurs,
-                "etudiants": etudiants, 
-                "cours": cours,
-                "evaluations": evaluations,
-                "notes": notes,
-                "reviews": reviews,
-                "stats": {
-                    "nb_professeurs": len(professeurs),
-                    "nb_etudiants": len(etudiants),
-                    "nb_cours": len(cours),
-                    "nb_evaluations": len(evaluations),
-                    "nb_notes": len(notes),
-                    "nb_reviews": len(reviews)
-                }
-            }
+            data = self.data_loader.load_all_data()
+            data["stats"] = Aggregates.for_store(self.data_loader.store).summary()
+            return data
         except Exception:
             return {"erreur": "Impossible de charger les données"}
\ No newline at end of file
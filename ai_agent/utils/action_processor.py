@@ -24,6 +24,7 @@ class ActionProcessor:
             ("get_cours", self.data_retrievers.get_cours),
             ("get_notes", self.data_retrievers.get_notes),
             ("get_stats", self.data_retrievers.get_stats),
+            ("get_review_stats", self.data_retrievers.get_review_stats),
             ("get_reviews", self.data_retrievers.get_reviews),
             ("get_evaluations", self.data_retrievers.get_evaluations)
         ]
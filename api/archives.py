@@ -0,0 +1,39 @@
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from data_manager.entity_store import EntityStore
+from data_manager.archive import Archive
+
+router = APIRouter()
+
+def _archive() -> Archive:
+    return Archive(EntityStore.for_path("data/"))
+
+@router.get("/archives")
+def get_archives(collection: Optional[str] = None):
+    """Segments d'archive (période, nombre d'enregistrements, taille compressée)"""
+    return _archive().segments(collection)
+
+@router.post("/archives/{collection}")
+async def archive_collection(collection: str, avant: datetime, compression: Optional[str] = None):
+    """Déplace les notes ou reviews créées avant une date dans un segment compressé"""
+    try:
+        segment = await run_in_threadpool(_archive().archive_before, collection, avant, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"archive": segment is not None, "segment": segment}
+
+@router.get("/archives/{collection}/export")
+def export_archive(collection: str, created_after: Optional[datetime] = None,
+                   created_before: Optional[datetime] = None, inclure_recents: bool = False):
+    """Export JSONL en flux de la période (archives, et fichiers chauds avec inclure_recents)"""
+    archive = _archive()
+    if not archive.segments(collection) and not inclure_recents:
+        raise HTTPException(status_code=404, detail=f"Aucune archive pour {collection}")
+
+    records = (archive.iter_history if inclure_recents else archive.iter_records)(collection, created_after, created_before)
+    lines = (json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException
+from data_manager.entity_store import EntityStore
+
+router = APIRouter()
+
+@router.get("/changes")
+def get_changes(since: int = 0, limit: int = 1000):
+    """Changements (create/update/delete) de numéro > since, pour une reprise incrémentale"""
+    feed = EntityStore.for_path("data/").change_feed
+    if feed is None:
+        raise HTTPException(status_code=404, detail="Flux de changements désactivé (CHANGE_FEED=0)")
+    evenements = feed.read_since(since, max(1, min(limit, 10000)))
+    return {
+        "depuis": since,
+        "dernier": evenements[-1]["seq"] if evenements else since,
+        # Des événements plus anciens que le premier segment conservé ont été supprimés
+        "historique_tronque": feed.oldest_seq() > since + 1,
+        "evenements": evenements,
+    }
@@ -1,16 +1,47 @@
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from data_manager.entity_store import EntityStore
+from data_manager.reports import ReportScheduler
 from .routes import router as routes_router
 from .stats import router as stats_router
+from .changes import router as changes_router
+from .archives import router as archives_router
+from .reports import router as reports_router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Démarre le planificateur de rapports avec l'API (REPORT_SCHEDULER=1) et l'arrête avec elle.
+
+    Désactivé par défaut ; activé, un seul worker le fait tourner (verrou pris par start).
+    """
+    scheduler = None
+    if os.environ.get("REPORT_SCHEDULER", "0") == "1":
+        scheduler = ReportScheduler.for_store(EntityStore.for_path("data/"))
+        scheduler.start()
+    yield
+    if scheduler is not None:
+        scheduler.stop(wait=False)
 
 app = FastAPI(
+    lifespan=lifespan,
     title="Educational System API", 
     version="1.0.0",
     description="API pour gérer le système éducatif avec professeurs, étudiants, cours et notes"
 )
 
+@app.middleware("http")
+async def snapshot_par_requete(request: Request, call_next):
+    """Chaque requête lit une version figée des données (aucun verrou en lecture)"""
+    with EntityStore.for_path("data/").snapshot():
+        return await call_next(request)
+
 # Inclure les routes
 app.include_router(routes_router, tags=["CRUD Operations"])
 app.include_router(stats_router, tags=["Statistics"])
+app.include_router(changes_router, tags=["Changes"])
+app.include_router(archives_router, tags=["Archives"])
+app.include_router(reports_router, tags=["Reports"])
 
 @app.get("/")
 def root():
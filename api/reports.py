@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from data_manager.entity_store import EntityStore
+from data_manager.reports import ReportScheduler
+from data_manager.transcript_batch import TranscriptBatch
+
+router = APIRouter()
+
+# Générations de bulletins connues de ce processus, dans l'ordre de lancement.
+# Les lots finis sont oubliés après BULLETIN_LOTS_TTL secondes ; au plus
+# BULLETIN_LOTS_MAX lots sont gardés (les plus anciens finis partent en premier).
+LOTS_MAX = int(os.environ.get("BULLETIN_LOTS_MAX", 20))
+LOTS_TTL = float(os.environ.get("BULLETIN_LOTS_TTL", 3600))
+_lots: "OrderedDict[str, TranscriptBatch]" = OrderedDict()
+_lots_lock = threading.Lock()
+# Un seul lot à la fois : chaque lot a déjà son pool de BULLETIN_WORKERS processus
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulletins")
+
+def _scheduler(name: str) -> ReportScheduler:
+    scheduler = ReportScheduler.for_store(EntityStore.for_path("data/"))
+    if name not in scheduler.names():
+        raise HTTPException(status_code=404, detail=f"Rapport inconnu: {name}")
+    return scheduler
+
+@router.get("/rapports")
+def get_rapports():
+    """Rapports planifiés : état, dernière version, écritures depuis, cadence"""
+    return ReportScheduler.for_store(EntityStore.for_path("data/")).status()
+
+@router.get("/rapports/{name}")
+def get_rapport(name: str, version: Optional[int] = None):
+    """Dernière version (ou une version donnée) d'un rapport, servie depuis son fichier sans recalcul"""
+    path = _scheduler(name).path(name, version)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Aucune version de ce rapport (encore en calcul ?)")
+    return FileResponse(path, media_type="application/json")
+
+@router.get("/rapports/{name}/versions")
+def get_rapport_versions(name: str):
+    """Numéros des versions conservées d'un rapport"""
+    return {"rapport": name, "versions": _scheduler(name).versions(name)}
+
+@router.post("/rapports/{name}/executer")
+def executer_rapport(name: str):
+    """Lance le calcul d'un rapport en arrière-plan (sans effet s'il est déjà en cours)"""
+    _scheduler(name).submit(name)
+    return {"rapport": name, "lance": True}
+
+@router.post("/rapports/{name}/annuler")
+def annuler_rapport(name: str):
+    """Annule le calcul en attente ou en cours d'un rapport"""
+    return {"rapport": name, "annule": _scheduler(name).cancel(name)}
+
+def _evict_lots():
+    """Oublie les lots finis expirés, puis les plus anciens finis au-delà de LOTS_MAX (sous _lots_lock)"""
+    now = time.monotonic()
+    for lot_id, lot in list(_lots.items()):
+        if lot.finished and now - lot.finished_at > LOTS_TTL:
+            del _lots[lot_id]
+    for lot_id, lot in list(_lots.items()):
+        if len(_lots) <= LOTS_MAX:
+            break
+        if lot.finished:
+            del _lots[lot_id]
+
+def _lot(lot_id: str) -> TranscriptBatch:
+    with _lots_lock:
+        _evict_lots()
+        lot = _lots.get(lot_id)
+    if lot is None:
+        raise HTTPException(status_code=404, detail="Génération inconnue")
+    return lot
+
+@router.post("/bulletins/lots")
+def lancer_lot_bulletins(format: str = "jsonl", workers: Optional[int] = None):
+    """Lance la génération des bulletins de tous les étudiants sur plusieurs processus.
+
+    Les lots s'exécutent l'un après l'autre (les suivants restent en_attente) ;
+    refusé (429) si LOTS_MAX lots sont déjà en attente ou en cours.
+    """
+    try:
+        lot = TranscriptBatch(EntityStore.for_path("data/"), output_format=format, workers=workers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    with _lots_lock:
+        _evict_lots()
+        if sum(1 for other in _lots.values() if not other.finished) >= LOTS_MAX:
+            raise HTTPException(status_code=429, detail="Trop de générations en attente, réessayez plus tard")
+        lot_id = uuid.uuid4().hex[:12]
+        _lots[lot_id] = lot
+        _evict_lots()
+    _executor.submit(lot.run)
+    return {"lot_id": lot_id, **lot.status()}
+
+@router.get("/bulletins/lots/{lot_id}")
+def get_lot_bulletins(lot_id: str):
+    """Avancement d'une génération (bulletins faits / total, débit)"""
+    return {"lot_id": lot_id, **_lot(lot_id).status()}
+
+@router.get("/bulletins/lots/{lot_id}/fichier")
+def get_fichier_lot_bulletins(lot_id: str):
+    """Fichier des bulletins générés (JSONL ou texte)"""
+    lot = _lot(lot_id)
+    if lot.path is None:
+        raise HTTPException(status_code=409, detail=f"Génération non terminée ({lot.state})")
+    return FileResponse(lot.path, media_type="application/x-ndjson" if lot.output_format == "jsonl" else "text/plain")
+
+@router.post("/bulletins/lots/{lot_id}/annuler")
+def annuler_lot_bulletins(lot_id: str):
+    """Arrête une génération en cours (le fichier partiel est supprimé)"""
+    _lot(lot_id).cancel()
+    return {"lot_id": lot_id, "annule": True}
@@ -1,7 +1,14 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
+import codecs
+from datetime import datetime
+from anyio import from_thread
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import Iterator, List, Optional
 from data_manager.data_loader import DataLoader
 from data_manager.data_saver import DataSaver
+from data_manager.bulk_import import ENTITY_CLASSES, iter_rows
+from data_manager.integrity import IntegrityError, DuplicateKeyError
+from data_manager.transcripts import TranscriptCache
 from entities.professeur import Professeur
 from entities.etudiant import Etudiant
 from entities.cours import Cours
@@ -11,12 +18,25 @@ router = APIRouter()
 data_loader = DataLoader("data/")
 data_saver = DataSaver("data/")
 
+def _load(name: str, created_after: Optional[datetime], created_before: Optional[datetime]) -> List[dict]:
+    """Collection complète, ou seulement la période [created_after, created_before[ (index sur date_creation)"""
+    if created_after is None and created_before is None:
+        return data_loader.load_json_file(f"{name}.json")
+    return data_loader.get_created_between(name, created_after, created_before)
+
+def _integrity_error(e: IntegrityError) -> HTTPException:
+    """409 pour une valeur unique déjà utilisée, 422 pour une clé étrangère invalide"""
+    return HTTPException(status_code=409 if isinstance(e, DuplicateKeyError) else 422, detail=str(e))
+
 # Professeurs routes
 @router.get("/professeurs", response_model=List[dict])
-def get_professeurs():
-    """Récupère tous les professeurs"""
-    professeurs = data_loader.load_professeurs()
-    return [p.to_dict() for p in professeurs]
+def get_professeurs(email: Optional[str] = None, created_after: Optional[datetime] = None,
+                    created_before: Optional[datetime] = None):
+    """Récupère tous les professeurs (ou celui d'un email, par l'index unique), filtrables par date de création"""
+    if email is not None:
+        prof = data_loader.get_professeur_by_email(email)
+        return [prof] if prof else []
+    return _load("professeurs", created_after, created_before)
 
 @router.get("/professeurs/{prof_id}")
 def get_professeur(prof_id: int):
@@ -26,11 +46,19 @@ def get_professeur(prof_id: int):
         raise HTTPException(status_code=404, detail="Professeur non trouvé")
     return prof.to_dict()
 
+@router.get("/professeurs/{prof_id}/cours", response_model=List[dict])
+def get_professeur_cours(prof_id: int):
+    """Récupère les cours d'un professeur"""
+    return data_loader.get_cours_by_professeur(prof_id)
+
 @router.post("/professeurs")
 def create_professeur(nom: str, email: str, specialite: str):
     """Crée un nouveau professeur"""
     prof = Professeur(nom=nom, email=email, specialite=specialite)
-    saved_prof = data_saver.save_professeur(prof)
+    try:
+        saved_prof = data_saver.save_professeur(prof)
+    except IntegrityError as e:
+        raise _integrity_error(e)
     return {"message": "Professeur créé", "id": saved_prof.id, "data": saved_prof.to_dict()}
 
 @router.put("/professeurs/{prof_id}")
@@ -44,23 +72,32 @@ def update_professeur(prof_id: int, nom: Optional[str] = None, email: Optional[s
     if email: prof.email = email
     if specialite: prof.specialite = specialite
     
-    saved_prof = data_saver.save_professeur(prof)
+    try:
+        saved_prof = data_saver.save_professeur(prof)
+    except IntegrityError as e:
+        raise _integrity_error(e)
     return {"message": "Professeur mis à jour", "data": saved_prof.to_dict()}
 
 @router.delete("/professeurs/{prof_id}")
-def delete_professeur(prof_id: int):
-    """Supprime un professeur"""
-    success = data_saver.delete_professeur(prof_id)
+def delete_professeur(prof_id: int, mode: Optional[str] = None):
+    """Supprime un professeur (mode : cascade, restrict ou nullify)"""
+    try:
+        success = data_saver.delete_professeur(prof_id, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=409 if isinstance(e, IntegrityError) else 400, detail=str(e))
     if not success:
         raise HTTPException(status_code=404, detail="Professeur non trouvé")
     return {"message": "Professeur supprimé"}
 
 # Étudiants routes
 @router.get("/etudiants", response_model=List[dict])
-def get_etudiants():
-    """Récupère tous les étudiants"""
-    etudiants = data_loader.load_etudiants()
-    return [e.to_dict() for e in etudiants]
+def get_etudiants(numero: Optional[str] = None, email: Optional[str] = None,
+                  created_after: Optional[datetime] = None, created_before: Optional[datetime] = None):
+    """Récupère tous les étudiants (ou celui d'un numéro / email, par l'index unique), filtrables par date de création"""
+    if numero is not None or email is not None:
+        etudiant = data_loader.get_etudiant_by_numero(numero) if numero is not None else data_loader.get_etudiant_by_email(email)
+        return [etudiant] if etudiant else []
+    return _load("etudiants", created_after, created_before)
 
 @router.get("/etudiants/{etudiant_id}")
 def get_etudiant(etudiant_id: int):
@@ -70,11 +107,44 @@ def get_etudiant(etudiant_id: int):
         raise HTTPException(status_code=404, detail="Étudiant non trouvé")
     return etudiant.to_dict()
 
+@router.get("/etudiants/{etudiant_id}/notes", response_model=List[dict])
+def get_etudiant_notes(etudiant_id: int):
+    """Récupère les notes d'un étudiant"""
+    return data_loader.get_notes_by_etudiant(etudiant_id)
+
+@router.get("/etudiants/{etudiant_id}/moyenne")
+def get_etudiant_moyenne(etudiant_id: int):
+    """Calcule la moyenne d'un étudiant à partir de ses seules notes (simple et pondérée par les coefficients)"""
+    etudiant = data_loader.get_etudiant_by_id(etudiant_id)
+    if not etudiant:
+        raise HTTPException(status_code=404, detail="Étudiant non trouvé")
+    # Notes de l'étudiant (index de clé étrangère) jointes aux coefficients de leurs évaluations :
+    # O(notes de l'étudiant), sans le moteur de cohorte reconstruit après chaque écriture de note
+    notes = data_loader.get_notes_by_etudiant(etudiant_id)
+    evaluations = [e for e in (data_loader.store.get("evaluations.json", evaluation_id)
+                               for evaluation_id in {n.get('evaluation_id') for n in notes}) if e]
+    return {
+        "etudiant_id": etudiant_id,
+        "moyenne": etudiant.calculer_moyenne(notes),
+        "moyenne_ponderee": etudiant.calculer_moyenne(notes, evaluations),
+    }
+
+@router.get("/etudiants/{etudiant_id}/bulletin")
+def get_etudiant_bulletin(etudiant_id: int):
+    """Bulletin complet d'un étudiant (cours, professeurs, évaluations, notes, moyennes) en un seul appel"""
+    bulletin = TranscriptCache.for_store(data_loader.store).get(etudiant_id)
+    if bulletin is None:
+        raise HTTPException(status_code=404, detail="Étudiant non trouvé")
+    return bulletin
+
 @router.post("/etudiants")
 def create_etudiant(nom: str, email: str, numero_etudiant: str, date_naissance: str):
     """Crée un nouvel étudiant"""
     etudiant = Etudiant(nom=nom, email=email, numero_etudiant=numero_etudiant, date_naissance=date_naissance)
-    saved_etudiant = data_saver.save_etudiant(etudiant)
+    try:
+        saved_etudiant = data_saver.save_etudiant(etudiant)
+    except IntegrityError as e:
+        raise _integrity_error(e)
     return {"message": "Étudiant créé", "id": saved_etudiant.id, "data": saved_etudiant.to_dict()}
 
 @router.put("/etudiants/{etudiant_id}")
@@ -88,23 +158,32 @@ def update_etudiant(etudiant_id: int, nom: Optional[str] = None, email: Optional
     if email: etudiant.email = email
     if numero_etudiant: etudiant.numero_etudiant = numero_etudiant
     
-    saved_etudiant = data_saver.save_etudiant(etudiant)
+    try:
+        saved_etudiant = data_saver.save_etudiant(etudiant)
+    except IntegrityError as e:
+        raise _integrity_error(e)
     return {"message": "Étudiant mis à jour", "data": saved_etudiant.to_dict()}
 
 @router.delete("/etudiants/{etudiant_id}")
-def delete_etudiant(etudiant_id: int):
-    """Supprime un étudiant"""
-    success = data_saver.delete_etudiant(etudiant_id)
+def delete_etudiant(etudiant_id: int, mode: Optional[str] = None):
+    """Supprime un étudiant (mode : cascade, restrict ou nullify)"""
+    try:
+        success = data_saver.delete_etudiant(etudiant_id, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=409 if isinstance(e, IntegrityError) else 400, detail=str(e))
     if not success:
         raise HTTPException(status_code=404, detail="Étudiant non trouvé")
     return {"message": "Étudiant supprimé"}
 
 # Cours routes
 @router.get("/cours", response_model=List[dict])
-def get_cours():
-    """Récupère tous les cours"""
-    cours = data_loader.load_cours()
-    return [c.to_dict() for c in cours]
+def get_cours(code: Optional[str] = None, created_after: Optional[datetime] = None,
+              created_before: Optional[datetime] = None):
+    """Récupère tous les cours (ou celui d'un code, par l'index unique), filtrables par date de création"""
+    if code is not None:
+        cours = data_loader.get_cours_by_code(code)
+        return [cours] if cours else []
+    return _load("cours", created_after, created_before)
 
 @router.get("/cours/{cours_id}")
 def get_cours_by_id(cours_id: int):
@@ -114,11 +193,24 @@ def get_cours_by_id(cours_id: int):
         raise HTTPException(status_code=404, detail="Cours non trouvé")
     return cours.to_dict()
 
+@router.get("/cours/{cours_id}/evaluations", response_model=List[dict])
+def get_cours_evaluations(cours_id: int):
+    """Récupère les évaluations d'un cours"""
+    return data_loader.get_evaluations_by_cours(cours_id)
+
+@router.get("/cours/{cours_id}/reviews", response_model=List[dict])
+def get_cours_reviews(cours_id: int):
+    """Récupère les reviews d'un cours"""
+    return data_loader.get_reviews_by_cours(cours_id)
+
 @router.post("/cours")
 def create_cours(nom: str, code: str, description: str, credits: int, professeur_id: Optional[int] = None):
     """Crée un nouveau cours"""
     cours = Cours(nom=nom, code=code, description=description, credits=credits, professeur_id=professeur_id)
-    saved_cours = data_saver.save_cours(cours)
+    try:
+        saved_cours = data_saver.save_cours(cours)
+    except IntegrityError as e:
+        raise _integrity_error(e)
     return {"message": "Cours créé", "id": saved_cours.id, "data": saved_cours.to_dict()}
 
 @router.put("/cours/{cours_id}")
@@ -134,27 +226,80 @@ def update_cours(cours_id: int, nom: Optional[str] = None, code: Optional[str] =
     if credits: cours.credits = credits
     if professeur_id is not None: cours.professeur_id = professeur_id
     
-    saved_cours = data_saver.save_cours(cours)
+    try:
+        saved_cours = data_saver.save_cours(cours)
+    except IntegrityError as e:
+        raise _integrity_error(e)
     return {"message": "Cours mis à jour", "data": saved_cours.to_dict()}
 
 @router.delete("/cours/{cours_id}")
-def delete_cours(cours_id: int):
-    """Supprime un cours"""
-    success = data_saver.delete_cours(cours_id)
+def delete_cours(cours_id: int, mode: Optional[str] = None):
+    """Supprime un cours (mode : cascade, restrict ou nullify)"""
+    try:
+        success = data_saver.delete_cours(cours_id, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=409 if isinstance(e, IntegrityError) else 400, detail=str(e))
     if not success:
         raise HTTPException(status_code=404, detail="Cours non trouvé")
     return {"message": "Cours supprimé"}
 
 # Notes routes
 @router.get("/notes", response_model=List[dict])
-def get_notes():
-    """Récupère toutes les notes"""
-    notes = data_loader.load_notes()
-    return [n.to_dict() for n in notes]
+def get_notes(created_after: Optional[datetime] = None, created_before: Optional[datetime] = None):
+    """Récupère toutes les notes, ou celles créées dans [created_after, created_before["""
+    return _load("notes", created_after, created_before)
+
+@router.get("/evaluations/{evaluation_id}/notes", response_model=List[dict])
+def get_evaluation_notes(evaluation_id: int):
+    """Récupère les notes d'une évaluation"""
+    return data_loader.get_notes_by_evaluation(evaluation_id)
 
 @router.post("/notes")
 def create_note(etudiant_id: int, evaluation_id: int, valeur: float, commentaire: Optional[str] = None):
     """Crée une nouvelle note"""
     note = Note(etudiant_id=etudiant_id, evaluation_id=evaluation_id, valeur=valeur, commentaire=commentaire)
-    saved_note = data_saver.save_note(note)
-    return {"message": "Note créée", "id": saved_note.id, "data": saved_note.to_dict()}
\ No newline at end of file
+    try:
+        saved_note = data_saver.save_note(note)
+    except IntegrityError as e:
+        raise _integrity_error(e)
+    return {"message": "Note créée", "id": saved_note.id, "data": saved_note.to_dict()}
+
+# Import en masse
+def _body_lines(request: Request) -> Iterator[str]:
+    """Lignes du corps de la requête, lues morceau par morceau depuis le thread de l'import.
+
+    Le corps n'est jamais chargé en entier : chaque morceau de request.stream()
+    est demandé à la boucle d'événements (anyio.from_thread) au fur et à
+    mesure que le lecteur de lignes (iter_rows) avance.
+    """
+    chunks = request.stream().__aiter__()
+
+    async def next_chunk() -> Optional[bytes]:
+        try:
+            return await chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while True:
+        chunk = from_thread.run(next_chunk)
+        if chunk is None:
+            break
+        *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+@router.post("/import/{collection}")
+async def import_collection(collection: str, request: Request, format: str = "jsonl"):
+    """Importe un fichier CSV ou JSONL (corps de la requête) en une seule écriture"""
+    if collection not in ENTITY_CLASSES:
+        raise HTTPException(status_code=404, detail="Collection inconnue")
+    if format not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="Format attendu : csv ou jsonl")
+    rows = iter_rows(_body_lines(request), format)
+    report = await run_in_threadpool(data_saver.bulk_save, collection, rows)
+    return {"message": f"{report['importes']} enregistrement(s) importé(s)", **report}
\ No newline at end of file
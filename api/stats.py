@@ -1,36 +1,159 @@
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, HTTPException
 from data_manager.data_loader import DataLoader
+from data_manager.write_batcher import WriteBatcher
+from data_manager.aggregates import Aggregates
+from data_manager.grades import GradeEngine
 
 router = APIRouter()
 data_loader = DataLoader("data/")
 
 @router.get("/stats")
 def get_stats():
-    """Récupère les statistiques du système"""
+    """Récupère les statistiques du système (agrégats tenus à jour à chaque écriture)"""
     try:
-        professeurs = data_loader.load_professeurs()
-        etudiants = data_loader.load_etudiants()
-        cours = data_loader.load_cours()
-        notes = data_loader.load_notes()
-        
-        stats = {
-            "nb_professeurs": len(professeurs),
-            "nb_etudiants": len(etudiants),
-            "nb_cours": len(cours),
-            "nb_notes": len(notes),
-        }
-        
-        if notes:
-            moyenne = sum(note.valeur for note in notes) / len(notes)
-            stats["moyenne_generale"] = round(moyenne, 2)
-        else:
-            stats["moyenne_generale"] = 0
-        
-        return stats
-    
+        return Aggregates.for_store(data_loader.store).summary()
     except Exception as e:
         return {"error": f"Erreur lors du calcul des statistiques: {str(e)}"}
 
+@router.get("/stats/notes")
+def get_notes_stats(etudiant_id: Optional[int] = None, evaluation_id: Optional[int] = None,
+                    cours_id: Optional[int] = None):
+    """Somme, nombre et moyenne des notes, au total ou pour un étudiant / une évaluation / un cours"""
+    aggregates = Aggregates.for_store(data_loader.store)
+    somme, nombre = aggregates.totals(etudiant_id, evaluation_id, cours_id)
+    return {
+        "etudiant_id": etudiant_id,
+        "evaluation_id": evaluation_id,
+        "cours_id": cours_id,
+        "somme": round(somme, 2),
+        "nombre": nombre,
+        "moyenne": round(somme / nombre, 2) if nombre else 0,
+    }
+
+@router.get("/stats/moyennes/etudiants")
+def get_moyennes_etudiants(cours_id: Optional[int] = None):
+    """Moyenne pondérée (coefficients des évaluations) de chaque étudiant, éventuellement dans un cours"""
+    engine = GradeEngine.for_store(data_loader.store)
+    if cours_id is None:
+        return [{"etudiant_id": etudiant_id, **moyenne} for etudiant_id, moyenne in sorted(engine.par_etudiant().items())]
+    return [{"etudiant_id": etudiant_id, "cours_id": cours_id, **moyenne}
+            for (etudiant_id, cours), moyenne in sorted(engine.par_etudiant_et_cours().items()) if cours == cours_id]
+
+@router.get("/stats/moyennes/cours")
+def get_moyennes_cours():
+    """Moyenne pondérée de chaque cours"""
+    engine = GradeEngine.for_store(data_loader.store)
+    return [{"cours_id": cours_id, **moyenne} for cours_id, moyenne in sorted(engine.par_cours().items())]
+
+@router.get("/stats/moyennes/evaluations")
+def get_moyennes_evaluations():
+    """Moyenne de chaque évaluation"""
+    engine = GradeEngine.for_store(data_loader.store)
+    return [{"evaluation_id": evaluation_id, **moyenne} for evaluation_id, moyenne in sorted(engine.par_evaluation().items())]
+
+@router.get("/stats/evaluations/{evaluation_id}/distribution")
+def get_distribution_evaluation(evaluation_id: int):
+    """Médiane, quartiles, déciles et histogramme 0–20 des notes d'une évaluation"""
+    if data_loader.store.get("evaluations.json", evaluation_id) is None:
+        raise HTTPException(status_code=404, detail="Évaluation non trouvée")
+    distribution = Aggregates.for_store(data_loader.store).distribution(evaluation_id=evaluation_id)
+    return {"evaluation_id": evaluation_id, **distribution.summary()}
+
+@router.get("/stats/cours/{cours_id}/distribution")
+def get_distribution_cours(cours_id: int):
+    """Distribution des notes de toutes les évaluations d'un cours (fusion, sans relire les notes)"""
+    if data_loader.store.get("cours.json", cours_id) is None:
+        raise HTTPException(status_code=404, detail="Cours non trouvé")
+    distribution = Aggregates.for_store(data_loader.store).distribution(cours_id=cours_id)
+    return {"cours_id": cours_id, **distribution.summary()}
+
+@router.get("/stats/distribution")
+def get_distribution(evaluations: Optional[str] = None):
+    """Distribution de toutes les notes, ou d'une liste d'évaluations (ex: ?evaluations=1,4,7)"""
+    aggregates = Aggregates.for_store(data_loader.store)
+    if evaluations:
+        try:
+            ids = [int(i) for i in evaluations.split(",") if i.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="evaluations doit être une liste d'ID séparés par des virgules")
+        return {"evaluations": ids, **aggregates.distribution(evaluation_ids=ids).summary()}
+    return aggregates.distribution().summary()
+
+def _cours_id(cours: str) -> int:
+    """ID d'un cours désigné par son ID ou son code (ex: 3 ou INFO101)"""
+    record = data_loader.store.get("cours.json", int(cours)) if cours.isdigit() else data_loader.get_cours_by_code(cours)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Cours non trouvé")
+    return record['id']
+
+@router.get("/stats/cours/{cours}/classement")
+def get_classement_cours(cours: str, limit: int = 10):
+    """Meilleures moyennes pondérées d'un cours (ID ou code), ex aequo au même rang"""
+    cours_id = _cours_id(cours)
+    top = Aggregates.for_store(data_loader.store).top(cours_id=cours_id, k=max(1, min(limit, 1000)))
+    return {"cours_id": cours_id, "classement": [
+        {"rang": t["rang"], "etudiant_id": t["membre"], "moyenne": t["score"]} for t in top]}
+
+@router.get("/stats/cours/{cours}/classement/{etudiant_id}")
+def get_rang_cours(cours: str, etudiant_id: int):
+    """Rang d'un étudiant dans un cours (ID ou code)"""
+    cours_id = _cours_id(cours)
+    rang = Aggregates.for_store(data_loader.store).rank(etudiant_id, cours_id=cours_id)
+    if rang is None:
+        raise HTTPException(status_code=404, detail="Aucune note de cet étudiant dans ce cours")
+    return {"cours_id": cours_id, "etudiant_id": etudiant_id, "rang": rang["rang"], "sur": rang["sur"], "moyenne": rang["score"]}
+
+@router.get("/stats/evaluations/{evaluation_id}/classement")
+def get_classement_evaluation(evaluation_id: int, limit: int = 10):
+    """Meilleures notes d'une évaluation, ex aequo au même rang"""
+    top = Aggregates.for_store(data_loader.store).top(evaluation_id=evaluation_id, k=max(1, min(limit, 1000)))
+    return {"evaluation_id": evaluation_id, "classement": [
+        {"rang": t["rang"], "etudiant_id": t["membre"], "note": t["score"]} for t in top]}
+
+@router.get("/stats/evaluations/{evaluation_id}/classement/{etudiant_id}")
+def get_rang_evaluation(evaluation_id: int, etudiant_id: int):
+    """Rang d'un étudiant dans une évaluation"""
+    rang = Aggregates.for_store(data_loader.store).rank(etudiant_id, evaluation_id=evaluation_id)
+    if rang is None:
+        raise HTTPException(status_code=404, detail="Aucune note de cet étudiant pour cette évaluation")
+    return {"evaluation_id": evaluation_id, "etudiant_id": etudiant_id, "rang": rang["rang"], "sur": rang["sur"], "note": rang["score"]}
+
+@router.get("/stats/reviews")
+def get_reviews_stats():
+    """Résumé de toutes les reviews : nombre, moyenne, étoiles, ratio de positives (note >= 4)"""
+    return Aggregates.for_store(data_loader.store).reviews()
+
+@router.get("/stats/reviews/cours")
+def get_reviews_par_cours():
+    """Résumé des reviews de chaque cours"""
+    par_cours = Aggregates.for_store(data_loader.store).reviews_par("cours")
+    return [{"cours_id": cours_id, **resume} for cours_id, resume in sorted(par_cours.items(), key=lambda item: str(item[0]))]
+
+@router.get("/stats/reviews/cours/{cours}")
+def get_reviews_cours(cours: str):
+    """Résumé des reviews d'un cours (ID ou code)"""
+    cours_id = _cours_id(cours)
+    return {"cours_id": cours_id, **Aggregates.for_store(data_loader.store).reviews(cours_id=cours_id)}
+
+@router.get("/stats/reviews/professeurs")
+def get_reviews_par_professeur():
+    """Résumé des reviews de chaque professeur, tous ses cours confondus"""
+    par_professeur = Aggregates.for_store(data_loader.store).reviews_par("professeur")
+    return [{"professeur_id": prof_id, **resume} for prof_id, resume in sorted(par_professeur.items(), key=lambda item: str(item[0]))]
+
+@router.get("/stats/reviews/professeurs/{prof_id}")
+def get_reviews_professeur(prof_id: int):
+    """Résumé des reviews des cours d'un professeur"""
+    if data_loader.store.get("professeurs.json", prof_id) is None:
+        raise HTTPException(status_code=404, detail="Professeur non trouvé")
+    return {"professeur_id": prof_id, **Aggregates.for_store(data_loader.store).reviews(professeur_id=prof_id)}
+
+@router.get("/stats/ecritures")
+def get_write_stats():
+    """Statistiques du regroupement des écritures (taille des lots, latence de commit)"""
+    return WriteBatcher.for_path("data/").metrics()
+
 @router.get("/health")
 def health_check():
     """Vérification de l'état de santé de l'API"""
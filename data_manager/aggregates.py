@@ -0,0 +1,344 @@
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+from .distribution import GradeSketch
+from .rankings import Rankings
+
+COLLECTIONS = ["professeurs.json", "etudiants.json", "cours.json", "evaluations.json", "notes.json", "reviews.json"]
+DIMENSIONS = ("global", "etudiant", "evaluation", "cours")
+
+
+def _valeur(note: Dict[str, Any]) -> Optional[float]:
+    valeur = note.get('valeur')
+    if isinstance(valeur, (int, float)) and not isinstance(valeur, bool):
+        return float(valeur)
+    return None
+
+
+def _bump(table: Dict[Any, list], key, valeur: float, sign: int):
+    totals = table.setdefault(key, [0.0, 0])
+    totals[0] += sign * valeur
+    totals[1] += sign
+    if totals[1] <= 0:
+        del table[key]  # Plus aucune note : pas d'erreur d'arrondi résiduelle
+
+
+class _ReviewTotals:
+    """Nombre, somme, étoiles (1 à 5) et nombre de reviews positives (note >= 4)"""
+
+    def __init__(self):
+        self.nombre = 0
+        self.somme = 0
+        self.etoiles = [0] * 5
+        self.positives = 0
+
+    def add(self, note: int, sign: int = 1):
+        self.nombre += sign
+        self.somme += sign * note
+        self.etoiles[note - 1] += sign
+        if note >= 4:  # Même seuil que Review.est_positive
+            self.positives += sign
+
+    def merge(self, other: "_ReviewTotals", sign: int = 1):
+        self.nombre += sign * other.nombre
+        self.somme += sign * other.somme
+        self.etoiles = [a + sign * b for a, b in zip(self.etoiles, other.etoiles)]
+        self.positives += sign * other.positives
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "nombre": self.nombre,
+            "moyenne": round(self.somme / self.nombre, 2) if self.nombre else None,
+            "etoiles": {str(i + 1): count for i, count in enumerate(self.etoiles)},
+            "ratio_positives": round(self.positives / self.nombre, 3) if self.nombre else None,
+        }
+
+
+def _note_review(review: Optional[Dict[str, Any]]) -> Optional[int]:
+    note = (review or {}).get('note')
+    return note if type(note) is int and 1 <= note <= 5 else None
+
+
+class _State:
+    """Compteurs par collection, sommes/nombres des valeurs de notes par dimension,
+    distribution des valeurs par évaluation, classements, et reviews par cours
+    et par professeur"""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {filename: 0 for filename in COLLECTIONS}
+        self.sums: Dict[str, Dict[Any, list]] = {dimension: {} for dimension in DIMENSIONS}
+        self.evaluation_cours: Dict[Any, Any] = {}
+        self.sketches: Dict[Any, GradeSketch] = {}
+        self.evaluation_coefficient: Dict[Any, float] = {}
+        self.rankings = Rankings()
+        self.reviews: Dict[str, Dict[Any, _ReviewTotals]] = {"cours": {}, "professeur": {}}
+        self.cours_professeur: Dict[Any, Any] = {}
+
+    def add_note(self, note: Dict[str, Any], sign: int = 1):
+        valeur = _valeur(note)
+        if valeur is None:
+            return
+        _bump(self.sums["global"], None, valeur, sign)
+        _bump(self.sums["etudiant"], note.get('etudiant_id'), valeur, sign)
+        _bump(self.sums["evaluation"], note.get('evaluation_id'), valeur, sign)
+        sketch = self.sketches.setdefault(note.get('evaluation_id'), GradeSketch())
+        sketch.add(valeur, sign)
+        if not sketch.total:
+            del self.sketches[note.get('evaluation_id')]
+        cours_id = self.evaluation_cours.get(note.get('evaluation_id'))
+        if cours_id is not None:
+            _bump(self.sums["cours"], cours_id, valeur, sign)
+        self.rankings.add_note(note.get('etudiant_id'), note.get('evaluation_id'), valeur, sign, cours_id,
+                               self.evaluation_coefficient.get(note.get('evaluation_id'), 1.0))
+
+    def add_evaluation(self, evaluation: Dict[str, Any]):
+        if evaluation.get('cours_id') is not None:
+            self.evaluation_cours[evaluation.get('id')] = evaluation.get('cours_id')
+        self.evaluation_coefficient[evaluation.get('id')] = float(evaluation.get('coefficient') or 1.0)
+
+    def move_evaluation(self, evaluation_id, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        """Reporte les totaux d'une évaluation qui change de cours (O(1)) ou de coefficient"""
+        old_cours, new_cours = (old or {}).get('cours_id'), (new or {}).get('cours_id')
+        old_coefficient = self.evaluation_coefficient.get(evaluation_id, 1.0)
+        new_coefficient = float(new.get('coefficient') or 1.0) if new else 1.0
+        if old_cours != new_cours or old_coefficient != new_coefficient:
+            self.rankings.move_evaluation(evaluation_id, old_cours, new_cours, old_coefficient, new_coefficient)
+        if new:
+            self.evaluation_coefficient[evaluation_id] = new_coefficient
+        else:
+            self.evaluation_coefficient.pop(evaluation_id, None)
+        totals = self.sums["evaluation"].get(evaluation_id)
+        if totals is not None and old_cours != new_cours:
+            for cours_id, sign in ((old_cours, -1), (new_cours, 1)):
+                if cours_id is not None:
+                    table = self.sums["cours"].setdefault(cours_id, [0.0, 0])
+                    table[0] += sign * totals[0]
+                    table[1] += sign * totals[1]
+                    if table[1] <= 0:
+                        del self.sums["cours"][cours_id]
+        if new_cours is None:
+            self.evaluation_cours.pop(evaluation_id, None)
+        else:
+            self.evaluation_cours[evaluation_id] = new_cours
+
+    def add_review(self, review: Dict[str, Any], sign: int = 1):
+        note = _note_review(review)
+        if note is None:
+            return
+        cours_id = review.get('cours_id')
+        self.reviews["cours"].setdefault(cours_id, _ReviewTotals()).add(note, sign)
+        professeur_id = self.cours_professeur.get(cours_id)
+        if professeur_id is not None:
+            self.reviews["professeur"].setdefault(professeur_id, _ReviewTotals()).add(note, sign)
+
+    def move_cours(self, cours_id, new_professeur):
+        """Reporte les reviews d'un cours qui change de professeur (O(1))"""
+        old_professeur = self.cours_professeur.get(cours_id)
+        totals = self.reviews["cours"].get(cours_id)
+        if totals is not None and old_professeur != new_professeur:
+            for professeur_id, sign in ((old_professeur, -1), (new_professeur, 1)):
+                if professeur_id is not None:
+                    self.reviews["professeur"].setdefault(professeur_id, _ReviewTotals()).merge(totals, sign)
+        if new_professeur is None:
+            self.cours_professeur.pop(cours_id, None)
+        else:
+            self.cours_professeur[cours_id] = new_professeur
+
+    def apply(self, event: Dict[str, Any]):
+        filename = f"{event['collection']}.json"
+        op = event["op"]
+        if filename in self.counts and op != "update":
+            self.counts[filename] += 1 if op == "create" else -1
+        if filename == "evaluations.json":
+            self.move_evaluation(event["id"], event.get("avant"), event.get("record") if op != "delete" else None)
+        elif filename == "cours.json":
+            self.move_cours(event["id"], event["record"].get('professeur_id') if op != "delete" else None)
+        elif filename == "reviews.json":
+            if op != "create":
+                self.add_review(event["avant"], -1)
+            if op != "delete":
+                self.add_review(event["record"])
+        elif filename == "notes.json":
+            if op != "create":
+                self.add_note(event["avant"], -1)
+            if op != "delete":
+                self.add_note(event["record"])
+
+
+class Aggregates:
+    """Agrégats maintenus à chaque écriture : /stats et l'agent les lisent en O(1).
+
+    Nombre d'enregistrements par collection, et somme/nombre des valeurs de
+    notes au total, par étudiant, par évaluation et par cours (via le cours de
+    l'évaluation), ainsi que la distribution des valeurs de chaque évaluation
+    (GradeSketch, fusionnée à la demande par cours ou au total) et les
+    classements des étudiants par évaluation et par cours (Leaderboard).
+    Les reviews sont comptées par cours (nombre, moyenne, étoiles, part de
+    positives) et cumulées par professeur via cours.professeur_id.
+    Le registre est construit par un parcours au premier accès puis mis à
+    jour par les événements du store (add_listener), qui portent l'état
+    précédent (`avant`). Si la signature d'une collection a changé sans
+    événement (autre processus, édition manuelle), il est reconstruit.
+    Les notes et reviews archivées (data_manager.archive) n'en font pas partie.
+    """
+
+    _attach_lock = threading.Lock()
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._state: Optional[_State] = None
+        self._signatures: Dict[str, Any] = {}
+        store.add_listener(self._on_events)
+
+    @classmethod
+    def for_store(cls, store) -> "Aggregates":
+        """Registre partagé d'un store (créé et abonné au premier appel)"""
+        with cls._attach_lock:
+            aggregates = getattr(store, "aggregates", None)
+            if aggregates is None:
+                aggregates = store.aggregates = cls(store)
+            return aggregates
+
+    def _current_signatures(self, filenames=COLLECTIONS) -> Dict[str, Any]:
+        # Jetons de version (inchangés par un compactage) : un autre processus ou une
+        # édition manuelle les change sans événement
+        return {filename: self.store.signature(filename) for filename in filenames}
+
+    def _on_events(self, events: List[Dict[str, Any]]):
+        # Appelé sous le verrou d'écriture du store : les signatures lues ici sont celles de cette écriture
+        filenames = {f"{e['collection']}.json" for e in events}
+        signatures = self._current_signatures(filenames)
+        with self._lock:
+            if self._state is None:
+                return
+            if any(self._signatures.get(f) != self.store.signature_before(f) for f in filenames):
+                self._state = None  # Écriture d'un autre processus pas encore vue : reconstruit à la lecture
+                return
+            for event in events:
+                self._state.apply(event)
+            self._signatures.update(signatures)
+
+    def _build(self) -> _State:
+        """Parcours complet (une fois, puis après une écriture faite hors de ce processus).
+
+        Les écritures du processus attendent la fin du parcours : aucune n'est
+        à la fois lue ici et appliquée ensuite par son événement.
+        """
+        with self.store.without_writes(), self.store.snapshot():
+            signatures = self._current_signatures()
+            state = _State()
+            for filename in COLLECTIONS:
+                state.counts[filename] = self.store.count(filename)
+            for evaluation in self.store.iter_records("evaluations.json"):
+                state.add_evaluation(evaluation)
+            for note in self.store.iter_records("notes.json"):
+                state.add_note(note)
+            for cours in self.store.iter_records("cours.json"):
+                state.move_cours(cours.get('id'), cours.get('professeur_id'))
+            for review in self.store.iter_records("reviews.json"):
+                state.add_review(review)
+            with self._lock:
+                self._state, self._signatures = state, signatures
+        return state
+
+    def _fresh(self) -> _State:
+        signatures = self._current_signatures()
+        with self._lock:
+            if self._state is not None and self._signatures == signatures:
+                return self._state
+        return self._build()
+
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+
+    # Lecture
+
+    def counts(self) -> Dict[str, int]:
+        """Nombre d'enregistrements par collection : {"nb_notes": ..., ...}"""
+        state = self._fresh()
+        with self._lock:
+            return {f"nb_{filename[:-5]}": count for filename, count in state.counts.items()}
+
+    def totals(self, etudiant_id: int = None, evaluation_id: int = None, cours_id: int = None) -> Tuple[float, int]:
+        """(somme, nombre) des valeurs de notes, au total ou pour une seule dimension"""
+        if etudiant_id is not None:
+            dimension, key = "etudiant", etudiant_id
+        elif evaluation_id is not None:
+            dimension, key = "evaluation", evaluation_id
+        elif cours_id is not None:
+            dimension, key = "cours", cours_id
+        else:
+            dimension, key = "global", None
+        state = self._fresh()
+        with self._lock:
+            total, count = state.sums[dimension].get(key, (0.0, 0))
+        return (total if count else 0.0), count
+
+    def moyenne(self, etudiant_id: int = None, evaluation_id: int = None, cours_id: int = None) -> float:
+        total, count = self.totals(etudiant_id, evaluation_id, cours_id)
+        return round(total / count, 2) if count else 0.0
+
+    def distribution(self, evaluation_id: int = None, cours_id: int = None,
+                     evaluation_ids: Iterable[int] = None) -> GradeSketch:
+        """Distribution des notes d'une évaluation, d'un cours, d'une liste d'évaluations ou de toutes.
+
+        Fusion des distributions par évaluation : aucune note n'est relue.
+        """
+        state = self._fresh()
+        with self._lock:
+            if evaluation_id is not None:
+                selected = [evaluation_id]
+            elif cours_id is not None:
+                selected = [e for e, c in state.evaluation_cours.items() if c == cours_id]
+            elif evaluation_ids is not None:
+                selected = list(evaluation_ids)
+            else:
+                selected = list(state.sketches)
+            return GradeSketch.merged(state.sketches[e] for e in selected if e in state.sketches)
+
+    def _leaderboard(self, state: _State, cours_id, evaluation_id):
+        if cours_id is not None:
+            return state.rankings.cours.get(cours_id)
+        return state.rankings.evaluations.get(evaluation_id)
+
+    def top(self, cours_id: int = None, evaluation_id: int = None, k: int = 10) -> List[Dict[str, Any]]:
+        """Meilleurs étudiants d'un cours (moyenne pondérée) ou d'une évaluation (note)"""
+        state = self._fresh()
+        with self._lock:
+            leaderboard = self._leaderboard(state, cours_id, evaluation_id)
+            return leaderboard.top(k) if leaderboard else []
+
+    def rank(self, etudiant_id: int, cours_id: int = None, evaluation_id: int = None) -> Optional[Dict[str, Any]]:
+        """Rang d'un étudiant dans un cours ou une évaluation : {rang, sur, score}, None s'il n'y est pas classé"""
+        state = self._fresh()
+        with self._lock:
+            leaderboard = self._leaderboard(state, cours_id, evaluation_id)
+            return leaderboard.rank(etudiant_id) if leaderboard else None
+
+    def reviews(self, cours_id: int = None, professeur_id: int = None) -> Dict[str, Any]:
+        """Nombre, moyenne, étoiles et ratio de reviews positives d'un cours,
+        d'un professeur (tous ses cours) ou de l'ensemble"""
+        state = self._fresh()
+        with self._lock:
+            if cours_id is not None:
+                totals = state.reviews["cours"].get(cours_id) or _ReviewTotals()
+            elif professeur_id is not None:
+                totals = state.reviews["professeur"].get(professeur_id) or _ReviewTotals()
+            else:
+                totals = _ReviewTotals()
+                for cours_totals in state.reviews["cours"].values():
+                    totals.merge(cours_totals)
+            return totals.summary()
+
+    def reviews_par(self, dimension: str = "cours") -> Dict[Any, Dict[str, Any]]:
+        """Résumé des reviews de chaque cours (dimension="cours") ou professeur ("professeur")"""
+        state = self._fresh()
+        with self._lock:
+            return {key: totals.summary() for key, totals in state.reviews[dimension].items() if totals.nombre}
+
+    def summary(self) -> Dict[str, Any]:
+        """Compteurs de toutes les collections et moyenne générale des notes"""
+        stats = self.counts()
+        stats["moyenne_generale"] = self.moyenne()
+        return stats
@@ -0,0 +1,227 @@
+import gzip
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Iterator, Optional, TextIO
+from .schema import TIME_FIELD, date_key, date_bound
+
+try:
+    import lzma
+except ImportError:  # Python compilé sans lzma : seule la compression gzip est disponible
+    lzma = None
+
+try:
+    import fcntl
+except ImportError:  # Windows : archivage protégé uniquement dans le processus
+    fcntl = None
+
+ARCHIVE_DIR = "archive"
+INDEX_FILE = "index.json"
+ARCHIVABLE = {"notes.json", "reviews.json"}
+EXTENSIONS = {"gzip": ".jsonl.gz", "lzma": ".jsonl.xz"}
+
+
+def _open_segment(path: str, compression: str, mode: str) -> TextIO:
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "lzma" and lzma is not None:
+        return lzma.open(path, mode + "t", encoding="utf-8")
+    raise ValueError(f"Compression non disponible: {compression} (gzip ou lzma)")
+
+
+def _filename(collection: str) -> str:
+    return collection if collection.endswith(".json") else f"{collection}.json"
+
+
+class Archive:
+    """Archives froides des notes et reviews des années passées (data/archive/).
+
+    archive_before() déplace les enregistrements créés avant une date dans un
+    segment compressé (gzip ou lzma) qui n'est plus jamais réécrit, décrit dans
+    un petit index (index.json : période, nombre, plage d'ID). Les fichiers
+    chauds ne contiennent plus ces enregistrements : load() et les index du
+    store les ignorent. Les requêtes historiques et les exports relisent les
+    segments par décompression en flux, en ne lisant que ceux de la période.
+
+    Le retrait des fichiers chauds passe par store.apply : le flux de
+    changements voit des suppressions.
+    """
+
+    def __init__(self, store, compression: str = None):
+        self.store = store
+        self.directory = os.path.join(store.data_path, ARCHIVE_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.compression = compression or os.environ.get("ARCHIVE_COMPRESSION", "gzip")
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(os.path.join(self.directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    # Index
+
+    def _index(self) -> List[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)["segments"]
+        except FileNotFoundError:
+            return []
+
+    def _save_index(self, segments: List[Dict[str, Any]]):
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({"segments": segments}, f, indent=2, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def segments(self, collection: str = None, after=None, before=None) -> List[Dict[str, Any]]:
+        """Segments d'une collection (ou de toutes) qui recouvrent la période [after, before["""
+        after, before = date_bound(after), date_bound(before)
+        selected = []
+        for segment in self._index():
+            if collection is not None and segment["collection"] != _filename(collection):
+                continue
+            if after is not None and date_key(segment["fin"]) < after:
+                continue
+            if before is not None and date_key(segment["debut"]) >= before:
+                continue
+            selected.append(segment)
+        return selected
+
+    # Archivage
+
+    def _archived_ids(self, filename: str, first, last) -> set:
+        """ID déjà archivés sur une période (reprise après un archivage interrompu)"""
+        return {record.get('id') for record in self.iter_records(filename, first, None)
+                if date_key(record.get(TIME_FIELD)) <= last}
+
+    def archive_before(self, collection: str, cutoff, compression: str = None) -> Optional[Dict[str, Any]]:
+        """Déplace les enregistrements créés avant `cutoff` dans un nouveau segment.
+
+        Le segment et l'index sont écrits (os.replace) avant le retrait des
+        fichiers chauds : une interruption laisse au pire des doublons, ignorés
+        à la lecture et au prochain archivage. Un enregistrement modifié entre
+        la lecture et le retrait reste dans les fichiers chauds.
+        Retourne la description du segment, ou None s'il n'y a rien à archiver.
+        """
+        filename = _filename(collection)
+        if filename not in ARCHIVABLE:
+            raise ValueError(f"Collection non archivable: {collection} (notes ou reviews)")
+        compression = compression or self.compression
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Compression inconnue: {compression} (gzip ou lzma)")
+        if date_bound(cutoff) is None:
+            raise ValueError("Une date limite est requise")
+
+        with self._file_lock():
+            records = self.store.created_between(filename, before=cutoff)
+            if not records:
+                return None
+            first, last = date_key(records[0].get(TIME_FIELD)), date_key(records[-1].get(TIME_FIELD))
+            index = self._index()
+            already = self._archived_ids(filename, first, last) if self.segments(filename, first) else set()
+            fresh = [r for r in records if r.get('id') not in already]
+
+            segment = None
+            if fresh:
+                name = f"{filename[:-5]}-{len(index) + 1:05d}{EXTENSIONS[compression]}"
+                path = os.path.join(self.directory, name)
+                with _open_segment(path + ".tmp", compression, "w") as f:
+                    for record in fresh:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                os.replace(path + ".tmp", path)
+                ids = [r.get('id') for r in fresh]
+                segment = {
+                    "collection": filename,
+                    "fichier": name,
+                    "compression": compression,
+                    "debut": fresh[0].get(TIME_FIELD),
+                    "fin": fresh[-1].get(TIME_FIELD),
+                    "nombre": len(fresh),
+                    "id_min": min(ids),
+                    "id_max": max(ids),
+                    "octets": os.path.getsize(path),
+                    "cree_le": datetime.now().isoformat(),
+                }
+                index.append(segment)
+                self._save_index(index)
+
+            # Retrait des fichiers chauds : seulement les enregistrements inchangés depuis la lecture
+            unchanged = [r.get('id') for r in records if self.store.get(filename, r.get('id')) == r]
+            if unchanged:
+                self.store.apply({filename: {"delete": unchanged}})
+            return segment
+
+    # Lecture historique
+
+    def iter_records(self, collection: str, after=None, before=None,
+                     where: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        """Enregistrements archivés de [after, before[ (décompression en flux, segment par segment)"""
+        filename = _filename(collection)
+        after, before = date_bound(after), date_bound(before)
+        for segment in self.segments(filename, after, before):
+            with _open_segment(os.path.join(self.directory, segment["fichier"]), segment["compression"], "r") as f:
+                for line in f:
+                    record = json.loads(line)
+                    created = date_key(record.get(TIME_FIELD))
+                    if after is not None and (created is None or created < after):
+                        continue
+                    if before is not None and (created is None or created >= before):
+                        continue
+                    if where and any(record.get(k) != v for k, v in where.items()):
+                        continue
+                    yield record
+
+    def iter_history(self, collection: str, after=None, before=None,
+                     where: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        """Archives puis fichiers chauds de la période ; la version chaude d'un ID l'emporte"""
+        filename = _filename(collection)
+        for record in self.iter_records(filename, after, before, where):
+            if self.store.get(filename, record.get('id')) is None:
+                yield record
+        for record in self.store.created_between(filename, after, before):
+            if not where or all(record.get(k) == v for k, v in where.items()):
+                yield record
+
+    def export(self, collection: str, out: TextIO, after=None, before=None, include_hot: bool = False) -> int:
+        """Écrit la période en JSONL dans `out` (mémoire constante), retourne le nombre de lignes"""
+        records = (self.iter_history if include_hot else self.iter_records)(collection, after, before)
+        count = 0
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+        return count
+
+
+if __name__ == "__main__":
+    import sys
+    from .entity_store import EntityStore
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if "--list" in sys.argv:
+        archive = Archive(EntityStore.for_path(args[0] if args else "data/"))
+        for segment in archive.segments():
+            print(f"{segment['fichier']}: {segment['nombre']} enregistrement(s) du {segment['debut']} au {segment['fin']} ({segment['octets']} octets)")
+        sys.exit(0)
+    if len(args) < 2:
+        print("Usage: python -m data_manager.archive <notes|reviews> <date limite ISO> [data/] [--lzma]")
+        print("       python -m data_manager.archive --list [data/]")
+        sys.exit(1)
+    archive = Archive(EntityStore.for_path(args[2] if len(args) > 2 else "data/"),
+                      "lzma" if "--lzma" in sys.argv else None)
+    segment = archive.archive_before(args[0], args[1])
+    if segment is None:
+        print(f"Aucun enregistrement créé avant {args[1]}")
+    else:
+        print(f"{segment['nombre']} enregistrement(s) archivé(s) dans {segment['fichier']} ({segment['octets']} octets)")
@@ -0,0 +1,141 @@
+import csv
+import json
+from datetime import datetime
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from entities.professeur import Professeur
+from entities.etudiant import Etudiant
+from entities.cours import Cours
+from entities.evaluation import Evaluation
+from entities.note import Note
+from entities.review import Review
+from .schema import UNIQUE_KEYS, unique_key
+from .integrity import missing_references
+
+ENTITY_CLASSES = {
+    "professeurs": Professeur,
+    "etudiants": Etudiant,
+    "cours": Cours,
+    "evaluations": Evaluation,
+    "notes": Note,
+    "reviews": Review,
+}
+
+# Conversion des colonnes CSV (toujours des chaînes) vers les types des entités
+INT_FIELDS = {"id", "professeur_id", "etudiant_id", "cours_id", "evaluation_id", "credits", "note"}
+FLOAT_FIELDS = {"valeur", "coefficient"}
+VALIDATION_BATCH_SIZE = 1000
+
+
+def collection_name(collection: str) -> str:
+    """'notes' ou 'notes.json' -> 'notes'"""
+    return collection[:-5] if collection.endswith(".json") else collection
+
+
+class RowError(Exception):
+    """Ligne illisible, signalée dans le rapport d'import sans arrêter la lecture"""
+
+
+def iter_rows(stream: Iterable[str], format: str = "jsonl") -> Iterator[Any]:
+    """Lit un flux CSV (avec en-tête) ou JSONL ligne par ligne (fichier texte ou
+    itérable de lignes, ex: corps d'une requête lu par morceaux).
+
+    Une ligne JSON invalide produit un RowError au lieu d'interrompre le flux.
+    """
+    if format == "csv":
+        for row in csv.DictReader(stream):
+            yield {k: v for k, v in row.items() if k and v not in (None, "")}
+    elif format == "jsonl":
+        for line in stream:
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield RowError(f"JSON invalide: {e}")
+                    continue
+                yield row if isinstance(row, dict) else RowError("Chaque ligne doit être un objet JSON")
+    else:
+        raise ValueError(f"Format d'import inconnu: {format} (csv ou jsonl)")
+
+
+def _coerce(row: Dict[str, Any]) -> Dict[str, Any]:
+    data = dict(row)
+    for field, value in row.items():
+        if isinstance(value, str):
+            if field in INT_FIELDS:
+                data[field] = int(value)
+            elif field in FLOAT_FIELDS:
+                data[field] = float(value)
+    return data
+
+
+def validate_record(collection: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Valide une ligne via la classe de l'entité (setters des propriétés).
+
+    Lève ValueError si la ligne est invalide, retourne le dictionnaire normalisé.
+    """
+    entity_class = ENTITY_CLASSES[collection_name(collection)]
+    entity = entity_class.from_dict(_coerce(row))
+    for name, attr in vars(entity_class).items():
+        if isinstance(attr, property) and attr.fset is not None:
+            setattr(entity, name, getattr(entity, name))
+    record = entity.to_dict()
+    if not row.get("date_creation"):
+        record["date_creation"] = datetime.now().isoformat()
+    return record
+
+
+def _check_store(store, filename: str, record: Dict[str, Any], seen: Dict[str, Dict[Any, int]], line: int):
+    """Clés étrangères et valeurs uniques d'une ligne, par les index du store (O(1) chacune)"""
+    errors = missing_references(store, filename, record)
+    if errors:
+        raise ValueError(", ".join(errors))
+    for field in UNIQUE_KEYS.get(filename, []):
+        if record.get(field) is None:
+            continue
+        key = unique_key(record[field])
+        if key in seen[field]:
+            raise ValueError(f"{field} '{record[field]}' en double (ligne {seen[field][key]})")
+        existing = store.find_unique(filename, field, record[field])
+        if existing is not None:
+            raise ValueError(f"{field} '{record[field]}' déjà utilisé (ID {existing.get('id')})")
+    for field in UNIQUE_KEYS.get(filename, []):
+        if record.get(field) is not None:
+            seen[field][unique_key(record[field])] = line
+
+
+def validate_rows(collection: str, rows: Iterable[Dict[str, Any]],
+                  batch_size: int = VALIDATION_BATCH_SIZE, store=None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Valide les lignes par lots ; retourne (enregistrements valides, erreurs par ligne).
+
+    Les ID éventuellement présents dans les lignes sont ignorés : bulk_save
+    attribue un bloc d'ID neufs. Avec un `store`, les clés étrangères et les
+    valeurs uniques (dans le store et entre lignes du fichier) sont aussi vérifiées.
+    """
+    valid: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    batch: List[Tuple[int, Any]] = []
+    filename = f"{collection_name(collection)}.json"
+    seen = {field: {} for field in UNIQUE_KEYS.get(filename, [])}
+
+    def flush():
+        for line, row in batch:
+            try:
+                record = validate_record(collection, row)
+                if store is not None:
+                    _check_store(store, filename, record, seen, line)
+                valid.append(record)
+            except (ValueError, TypeError, AttributeError) as e:
+                errors.append({"ligne": line, "erreur": str(e)})
+        batch.clear()
+
+    for line, row in enumerate(rows, start=1):
+        if isinstance(row, RowError):
+            errors.append({"ligne": line, "erreur": str(row)})
+            continue
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    errors.sort(key=lambda error: error["ligne"])
+    return valid, errors
+
@@ -0,0 +1,227 @@
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Tuple
+from .id_sequence import IdSequence
+
+try:
+    import fcntl
+except ImportError:  # Windows : journal protégé uniquement dans le processus
+    fcntl = None
+
+CHANGES_DIR = "changes"
+_UNKNOWN = object()  # Signature d'avant écriture non fournie : ne correspond à aucune autre
+_SEGMENT = re.compile(r"^changes-(\d+)\.jsonl$")
+
+
+def collection_of(filename: str) -> str:
+    """'notes.json' -> 'notes'"""
+    return filename[:-5] if filename.endswith(".json") else filename
+
+
+def describe_writes(get: Callable, changes: Dict[str, Dict[str, list]]) -> List[Dict[str, Any]]:
+    """Événements create/update/delete d'écritures pas encore appliquées.
+
+    L'état précédent est lu par get(collection, id) (ex: store.get, O(1)) ; il est
+    joint à l'événement (`avant`) pour les mises à jour et les suppressions.
+    Une écriture qui ne change rien ne produit pas d'événement.
+    """
+    events = []
+    for filename, change in changes.items():
+        collection = collection_of(filename)
+        for record in change.get("put", ()):
+            old = get(filename, record.get('id'))
+            if old == record:
+                continue
+            event = {"collection": collection, "op": "update" if old is not None else "create",
+                     "id": record.get('id'), "record": record}
+            if old is not None:
+                event["avant"] = old
+            events.append(event)
+        for item_id in change.get("delete", ()):
+            old = get(filename, item_id)
+            if old is not None:
+                events.append({"collection": collection, "op": "delete", "id": item_id, "avant": old})
+    return events
+
+
+def describe_replace(filename: str, old_records: List[Dict[str, Any]],
+                     new_records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Événements d'un remplacement complet de collection (différence par ID)"""
+    new_ids = {r.get('id') for r in new_records}
+    removed = [r for r in old_records if r.get('id') not in new_ids]
+    changes = {filename: {"put": new_records, "delete": [r.get('id') for r in removed]}}
+    old_by_id = {r.get('id'): r for r in old_records}
+    return describe_writes(lambda _, item_id: old_by_id.get(item_id), changes)
+
+
+class ChangeNotifier:
+    """Abonnements aux écritures d'un store (partagé par les backends JSON et SQLite).
+
+    Les stores tiennent `_write_lock` pendant chaque écriture et sa notification.
+    Pendant la notification, `signature_before` donne la signature qu'avait chaque
+    collection écrite juste avant l'écriture (lue sous ses verrous).
+    """
+
+    def add_listener(self, callback: Callable[[List[Dict[str, Any]]], None]) -> Callable[[], None]:
+        """Appelle `callback(evenements)` après chaque écriture ; retourne la fonction de désabonnement"""
+        self._listeners.append(callback)
+        return lambda: self._listeners.remove(callback) if callback in self._listeners else None
+
+    @contextmanager
+    def without_writes(self):
+        """Bloque les écritures du processus pendant le bloc : une lecture complète faite
+        ici est cohérente avec les événements déjà reçus (aucune écriture en cours de notification)"""
+        with self._write_lock:
+            yield
+
+    def signature_before(self, filename: str):
+        """Signature d'une collection juste avant l'écriture en cours de notification.
+
+        Un cache dont la signature enregistrée est différente a manqué une écriture
+        (autre processus) : il doit se reconstruire au lieu d'adopter la nouvelle.
+        """
+        return self._signatures_before.get(filename, _UNKNOWN)
+
+    def _notify(self, events: List[Dict[str, Any]], before: Dict[str, Any] = None):
+        if not events:
+            return
+        self._signatures_before = before or {}
+        try:
+            for callback in list(self._listeners):
+                try:
+                    callback(events)
+                except Exception as e:
+                    print(f"Erreur dans un abonné aux changements: {e}")
+        finally:
+            self._signatures_before = {}
+
+
+class ChangeFeed:
+    """Flux séquencé des changements d'un dossier de données (change data capture).
+
+    Chaque événement reçoit un numéro de séquence croissant, partagé entre
+    processus, puis est diffusé aux abonnés du processus (`subscribe`) et ajouté
+    à un journal JSONL découpé en segments (data/changes/changes-<premier numéro>.jsonl).
+    Un segment est fermé au-delà de CHANGE_LOG_MAX_BYTES et seuls les
+    CHANGE_LOG_MAX_FILES plus récents sont conservés. Un consommateur reprend
+    avec `read_since(dernier numéro traité)`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = None, max_files: int = None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes or int(os.environ.get("CHANGE_LOG_MAX_BYTES", 10 * 1024 * 1024))
+        self.max_files = max_files or int(os.environ.get("CHANGE_LOG_MAX_FILES", 10))
+        self._sequence = IdSequence(os.path.join(directory, "sequence"), seed=self.last_seq)
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[List[Dict[str, Any]]], None]] = []
+
+    @classmethod
+    def attach(cls, store) -> "ChangeFeed":
+        """Crée le flux d'un store et l'abonne à ses écritures"""
+        feed = cls(os.path.join(store.data_path, CHANGES_DIR))
+        store.add_listener(feed.publish)
+        store.change_feed = feed
+        return feed
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        """Segments du journal (premier numéro, chemin), du plus ancien au plus récent"""
+        segments = []
+        for name in os.listdir(self.directory):
+            match = _SEGMENT.match(name)
+            if match:
+                segments.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(os.path.join(self.directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def last_seq(self) -> int:
+        """Dernier numéro écrit dans le journal (0 si vide)"""
+        segments = self._segments()
+        if not segments:
+            return 0
+        last = segments[-1][0] - 1
+        with open(segments[-1][1], 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    last = json.loads(line)["seq"]
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        return last
+
+    def _active_segment(self, first_seq: int) -> str:
+        """Segment où écrire, avec rotation et suppression des plus anciens"""
+        segments = self._segments()
+        if segments and os.path.getsize(segments[-1][1]) < self.max_bytes:
+            return segments[-1][1]
+        path = os.path.join(self.directory, f"changes-{first_seq:012d}.jsonl")
+        segments.append((first_seq, path))
+        for _, old_path in segments[:-self.max_files]:
+            os.remove(old_path)
+        return path
+
+    def publish(self, events: List[Dict[str, Any]]):
+        """Numérote des événements, les ajoute au journal puis les diffuse aux abonnés"""
+        if not events:
+            return
+        with self._file_lock():
+            seqs = self._sequence.reserve(len(events))
+            date = datetime.now().isoformat()
+            sequenced = [{"seq": seq, "date": date, **event} for seq, event in zip(seqs, events)]
+            with open(self._active_segment(seqs[0]), 'a', encoding='utf-8') as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in sequenced))
+        for callback in list(self._subscribers):
+            try:
+                callback(sequenced)
+            except Exception as e:
+                print(f"Erreur dans un abonné au flux de changements: {e}")
+
+    def subscribe(self, callback: Callable[[List[Dict[str, Any]]], None]) -> Callable[[], None]:
+        """Abonne `callback(evenements)` aux changements du processus ; retourne le désabonnement"""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback) if callback in self._subscribers else None
+
+    def oldest_seq(self) -> int:
+        """Premier numéro encore disponible dans le journal"""
+        segments = self._segments()
+        return segments[0][0] if segments else self.last_seq() + 1
+
+    def read_since(self, since: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Événements de numéro > since, dans l'ordre, au plus `limit`"""
+        segments = self._segments()
+        start = 0
+        for i, (first_seq, _) in enumerate(segments):
+            if first_seq <= since + 1:
+                start = i
+        events = []
+        for _, path in segments[start:]:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            event = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # Ligne en cours d'écriture
+                        if event.get("seq", 0) > since:
+                            events.append(event)
+                            if len(events) >= limit:
+                                return events
+            except FileNotFoundError:
+                continue  # Segment supprimé par une rotation pendant la lecture
+        return events
@@ -0,0 +1,321 @@
+import array
+import json
+import math
+import mmap
+import os
+import threading
+from typing import List, Dict, Any, Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel : repli sur des boucles Python
+    np = None
+
+# Colonnes à largeur fixe des notes (codes du module array : q = int64, d = float64)
+COLUMNS = [("id", "q"), ("etudiant_id", "q"), ("evaluation_id", "q"), ("valeur", "d")]
+COLUMNAR_DIR = "notes.columnar"
+FORMAT_VERSION = 2  # 2 : valeur non numérique = NaN, ID absent = MISSING_ID (1 : 0 et 0.0)
+MISSING_ID = -1
+_ABSENT = "__absent__"
+_INT64_RANGE = (-2 ** 63, 2 ** 63)
+
+
+def _encode(name: str, code: str, value):
+    """Valeur stockée dans la colonne + indique si la valeur d'origine doit être conservée à part.
+
+    Une valeur non numérique est stockée en NaN et un ID non entier en
+    MISSING_ID : les calculs les écartent comme sur les enregistrements.
+    """
+    if code == "d":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value), type(value) is not float
+        return math.nan, True
+    if type(value) is int and _INT64_RANGE[0] <= value < _INT64_RANGE[1]:
+        return value, False
+    return MISSING_ID, True
+
+
+def _encode_rows(records: List[Dict[str, Any]]):
+    """Colonnes fixes (array par colonne) et lignes de extra.jsonl (octets) de notes"""
+    columns = {name: array.array(code) for name, code in COLUMNS}
+    lines = []
+    for record in records:
+        side = {}
+        for name, code in COLUMNS:
+            if name not in record:
+                side.setdefault(_ABSENT, []).append(name)
+            value, keep = _encode(name, code, record.get(name))
+            columns[name].append(value)
+            if keep and name in record:
+                side[name] = record[name]
+        for key, value in record.items():
+            if key not in columns:
+                side[key] = value
+        lines.append((json.dumps(side, ensure_ascii=False) + "\n").encode('utf-8'))
+    return columns, b"".join(lines)
+
+
+def _write_meta(directory: str, rows: int, extra_bytes: int, source: Any):
+    # meta.json en dernier : il valide l'ensemble des fichiers (lignes au-delà de rows ignorées)
+    meta_tmp = os.path.join(directory, "meta.json.tmp")
+    with open(meta_tmp, 'w', encoding='utf-8') as f:
+        json.dump({"format": FORMAT_VERSION, "rows": rows, "extra_bytes": extra_bytes,
+                   "columns": dict(COLUMNS), "source": source}, f)
+    os.replace(meta_tmp, os.path.join(directory, "meta.json"))
+
+
+def write_columnar(records: List[Dict[str, Any]], directory: str, source: Any = None):
+    """Écrit les notes au format colonne : un fichier binaire par colonne fixe,
+    plus extra.jsonl (une ligne par note) pour commentaire, date_creation et
+    toute valeur non représentable dans les colonnes (conversion sans perte)."""
+    os.makedirs(directory, exist_ok=True)
+    columns, extra = _encode_rows(records)
+    for name, _ in COLUMNS:
+        tmp_path = os.path.join(directory, f"{name}.bin.tmp")
+        with open(tmp_path, 'wb') as f:
+            columns[name].tofile(f)
+        os.replace(tmp_path, os.path.join(directory, f"{name}.bin"))
+    extra_tmp = os.path.join(directory, "extra.jsonl.tmp")
+    with open(extra_tmp, 'wb') as f:
+        f.write(extra)
+    os.replace(extra_tmp, os.path.join(directory, "extra.jsonl"))
+    _write_meta(directory, len(records), len(extra), source)
+
+
+def append_columnar(records: List[Dict[str, Any]], directory: str, source: Any = None) -> bool:
+    """Ajoute des notes à la fin des colonnes existantes, en O(nouvelles notes).
+
+    Les fichiers sont écrits à partir de la fin validée par meta.json (une
+    fin laissée par un ajout interrompu est écrasée), puis meta.json est
+    remplacé. Retourne False si le format colonne est absent ou trop ancien.
+    """
+    meta = read_meta(directory)
+    if meta is None or meta.get("format") != FORMAT_VERSION:
+        return False
+    columns, extra = _encode_rows(records)
+    for name, code in COLUMNS:
+        with open(os.path.join(directory, f"{name}.bin"), 'r+b') as f:
+            f.seek(meta["rows"] * columns[name].itemsize)
+            columns[name].tofile(f)
+            f.truncate()
+    with open(os.path.join(directory, "extra.jsonl"), 'r+b') as f:
+        f.seek(meta["extra_bytes"])
+        f.write(extra)
+        f.truncate()
+    _write_meta(directory, meta["rows"] + len(records), meta["extra_bytes"] + len(extra), source)
+    return True
+
+
+def read_meta(directory: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(directory, "meta.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class ColumnarNotes:
+    """Notes au format colonne, ouvertes en mémoire partagée (mmap, sans copie)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        meta = read_meta(directory)
+        if meta is None:
+            raise FileNotFoundError(f"Format colonne absent: {directory}")
+        self.meta = meta
+        self._maps = []
+        self.columns: Dict[str, memoryview] = {}
+        rows = meta["rows"]
+        for name, code in COLUMNS:
+            with open(os.path.join(directory, f"{name}.bin"), 'rb') as f:
+                if rows == 0 or os.fstat(f.fileno()).st_size == 0:
+                    self.columns[name] = memoryview(array.array(code))
+                    continue
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.append(mm)
+            self.columns[name] = memoryview(mm).cast(code)[:rows]
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def array(self, name: str):
+        """Colonne sous forme de tableau NumPy (vue sans copie) si NumPy est disponible"""
+        column = self.columns[name]
+        if np is None:
+            return column
+        return np.frombuffer(column, dtype=np.int64 if column.format == "q" else np.float64)
+
+    def _selected_values(self, etudiant_id: int = None, evaluation_id: int = None):
+        """Valeurs numériques (NaN écartés), avec filtre optionnel étudiant/évaluation"""
+        valeurs = self.array("valeur")
+        if np is not None:
+            mask = ~np.isnan(valeurs)
+            if etudiant_id is not None:
+                mask &= self.array("etudiant_id") == etudiant_id
+            if evaluation_id is not None:
+                mask &= self.array("evaluation_id") == evaluation_id
+            return valeurs[mask]
+        etudiants = self.columns["etudiant_id"]
+        evaluations = self.columns["evaluation_id"]
+        return [v for i, v in enumerate(valeurs)
+                if v == v
+                and (etudiant_id is None or etudiants[i] == etudiant_id)
+                and (evaluation_id is None or evaluations[i] == evaluation_id)]
+
+    def somme_et_nombre(self, etudiant_id: int = None, evaluation_id: int = None):
+        """Somme et nombre des valeurs numériques, avec filtre optionnel étudiant/évaluation"""
+        selection = self._selected_values(etudiant_id, evaluation_id)
+        return float(sum(selection)), len(selection)
+
+    def moyenne(self, etudiant_id: int = None, evaluation_id: int = None) -> float:
+        total, count = self.somme_et_nombre(etudiant_id, evaluation_id)
+        return round(total / count, 2) if count else 0.0
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Reconstruit les notes au format JSON d'origine (conversion sans perte)"""
+        with open(os.path.join(self.directory, "extra.jsonl"), 'r', encoding='utf-8') as extra:
+            for i, line in zip(range(len(self)), extra):
+                side = json.loads(line)
+                absent = side.pop(_ABSENT, [])
+                record = {name: self.columns[name][i] for name, _ in COLUMNS if name not in absent}
+                record.update(side)
+                yield record
+
+    def close(self):
+        """Libère les mmaps ; une colonne encore vue par NumPy (moteur en cours
+        d'utilisation) reste ouverte jusqu'au ramasse-miettes"""
+        for column in self.columns.values():
+            try:
+                column.release()
+            except BufferError:
+                pass
+        for mm in self._maps:
+            try:
+                mm.close()
+            except BufferError:
+                pass
+
+
+def _source(store) -> Any:
+    """Signature de notes.json telle qu'enregistrée dans meta.json"""
+    return json.loads(json.dumps(store.signature("notes.json")))
+
+
+class ColumnarCache:
+    """Format colonne des notes d'un store, tenu à jour par ses événements.
+
+    Les créations de notes sont ajoutées à la fin des colonnes pendant
+    l'écriture (append_columnar). Une modification, une suppression ou une
+    écriture d'un autre processus rend le format périmé : il est reconstruit
+    en arrière-plan, comme un compactage, et les lectures se replient sur
+    les enregistrements en attendant. La lecture ne réécrit donc jamais les
+    colonnes ; elle rouvre au plus les mmaps. Les notes précédentes ne sont
+    pas fermées : un autre thread peut encore les lire, et leurs mmaps
+    (fichiers remplacés, pas réécrits) sont libérés par le ramasse-miettes.
+    """
+
+    _attach_lock = threading.Lock()
+
+    def __init__(self, store):
+        self.store = store
+        self.directory = os.path.join(store.data_path, COLUMNAR_DIR)
+        self._lock = threading.Lock()
+        self._notes: Optional[ColumnarNotes] = None
+        self._rebuilding = False
+        store.add_listener(self._on_events)
+
+    @classmethod
+    def for_store(cls, store) -> "ColumnarCache":
+        with cls._attach_lock:
+            cache = getattr(store, "columnar", None)
+            if cache is None:
+                cache = store.columnar = cls(store)
+            return cache
+
+    def _on_events(self, events: List[Dict[str, Any]]):
+        # Appelé sous le verrou d'écriture du store : la signature lue ici est celle de cette écriture
+        notes = [e for e in events if e['collection'] == "notes"]
+        if not notes:
+            return
+        with self._lock:
+            if self._notes is None or self._rebuilding:
+                return  # Rien d'ouvert, ou la reconstruction en cours relira la nouvelle version
+            meta = read_meta(self.directory)
+            creations = [e["record"] for e in notes if e["op"] == "create"]
+            if (meta is None or len(creations) < len(notes)
+                    or meta["rows"] + len(creations) != self.store.count("notes.json")
+                    or not append_columnar(creations, self.directory, _source(self.store))):
+                self._schedule_rebuild()
+
+    def _schedule_rebuild(self):
+        """Reconstruit les colonnes dans un thread d'arrière-plan (appelé sous self._lock)"""
+        if self._rebuilding:
+            return
+        self._rebuilding = True
+        threading.Thread(target=self.rebuild, daemon=True).start()
+
+    def rebuild(self):
+        """Réécrit les colonnes depuis les enregistrements (version figée du store)"""
+        try:
+            with self.store.snapshot():
+                source = _source(self.store)
+                write_columnar(self.store.load("notes.json"), self.directory, source)
+        except Exception as e:
+            print(f"Erreur lors de la reconstruction du format colonne: {e}")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def notes(self) -> Optional[ColumnarNotes]:
+        """Notes au format colonne à jour, ou None si une reconstruction est nécessaire"""
+        source = _source(self.store)
+        with self._lock:
+            if self._notes is not None and self._notes.meta.get("source") == source:
+                return self._notes
+            meta = read_meta(self.directory)
+            if meta is None or meta.get("source") != source or meta.get("format") != FORMAT_VERSION:
+                self._schedule_rebuild()
+                return None
+            # Pas de close() sur l'instance précédente : libérée avec son dernier lecteur
+            self._notes = ColumnarNotes(self.directory)
+            return self._notes
+
+
+def load_columnar_notes(store) -> Optional[ColumnarNotes]:
+    """Retourne les notes au format colonne si NOTES_COLUMNAR=1 (backend JSON).
+
+    None tant que le format colonne est périmé : l'appelant lit alors les
+    enregistrements (store.load) pendant sa reconstruction en arrière-plan.
+    """
+    from .entity_store import EntityStore
+    if os.environ.get("NOTES_COLUMNAR", "0") != "1" or not isinstance(store, EntityStore):
+        return None
+    return ColumnarCache.for_store(store).notes()
+
+
+def convert_json_to_columnar(data_path: str = "data/") -> int:
+    from .entity_store import EntityStore
+    store = EntityStore.for_path(data_path)
+    records = store.load("notes.json")
+    write_columnar(records, os.path.join(data_path, COLUMNAR_DIR), _source(store))
+    return len(records)
+
+
+def convert_columnar_to_json(data_path: str = "data/") -> int:
+    from .entity_store import EntityStore
+    columnar = ColumnarNotes(os.path.join(data_path, COLUMNAR_DIR))
+    records = list(columnar.records())
+    columnar.close()
+    EntityStore.for_path(data_path).write_all("notes.json", records)
+    return len(records)
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    path = args[0] if args else "data/"
+    if "--to-json" in sys.argv:
+        print(f"{convert_columnar_to_json(path)} note(s) restaurée(s) dans notes.json")
+    else:
+        print(f"{convert_json_to_columnar(path)} note(s) converties au format colonne")
@@ -0,0 +1,99 @@
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de coordination entre processus
+    fcntl = None
+
+COORDINATION_DIR = ".coordination"
+GENERATIONS_FILE = "generations"
+NB_SLOTS = 64
+_SLOT = struct.Struct("q")
+
+
+class StoreCoordinator:
+    """Coordination des processus (workers uvicorn, Streamlit) écrivant le même dossier.
+
+    - lock(collection) : verrou fcntl exclusif autour d'un cycle lecture-modification-écriture
+    - compteur de génération par collection, dans un petit fichier partagé en mmap :
+      chaque écriture l'incrémente, et un cache est à jour tant que sa génération
+      n'a pas changé (une lecture mémoire au lieu d'un stat des fichiers).
+
+    Les collections sont réparties sur NB_SLOTS compteurs : deux collections du
+    même compteur provoquent au pire un rechargement inutile.
+    """
+
+    def __init__(self, data_path: str = "data/"):
+        self.directory = os.path.join(data_path, COORDINATION_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self._held = threading.local()
+        path = os.path.join(self.directory, GENERATIONS_FILE)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < NB_SLOTS * _SLOT.size:
+                os.ftruncate(self._fd, NB_SLOTS * _SLOT.size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._generations = mmap.mmap(self._fd, NB_SLOTS * _SLOT.size)
+        # Identifie ce fichier de générations : des compteurs recréés à zéro ne
+        # valident pas des jetons enregistrés avant (caches sur disque)
+        self.identity = os.fstat(self._fd).st_ino
+
+    @classmethod
+    def create(cls, data_path: str = "data/"):
+        """Coordinateur si DATA_COORDINATION=1 et fcntl disponible, sinon None"""
+        if os.environ.get("DATA_COORDINATION", "0") != "1":
+            return None
+        if fcntl is None:
+            print("DATA_COORDINATION ignoré : fcntl n'est pas disponible sur ce système")
+            return None
+        return cls(data_path)
+
+    @staticmethod
+    def _slot(filename: str) -> int:
+        return zlib.crc32(filename.encode()) % NB_SLOTS * _SLOT.size
+
+    def generation(self, filename: str) -> int:
+        """Génération courante d'une collection (lecture en mémoire partagée, sans appel système)"""
+        return _SLOT.unpack_from(self._generations, self._slot(filename))[0]
+
+    def bump(self, filename: str) -> int:
+        """Signale une écriture aux autres processus, retourne la nouvelle génération"""
+        offset = self._slot(filename)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            generation = _SLOT.unpack_from(self._generations, offset)[0] + 1
+            _SLOT.pack_into(self._generations, offset, generation)
+            return generation
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def lock(self, filename: str):
+        """Verrou exclusif inter-processus d'une collection (réentrant dans un même thread)"""
+        held = self._held.__dict__.setdefault("locks", {})
+        if filename in held:
+            held[filename][1] += 1
+            try:
+                yield
+            finally:
+                held[filename][1] -= 1
+            return
+        path = os.path.join(self.directory, filename.replace("/", "_") + ".lock")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            held[filename] = [fd, 1]
+            try:
+                yield
+            finally:
+                del held[filename]
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
@@ -1,21 +1,39 @@
-import json
-import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator, Callable
+from entities.professeur import Professeur
+from entities.etudiant import Etudiant
+from entities.cours import Cours
+from entities.evaluation import Evaluation
+from entities.note import Note
+from entities.review import Review
+from .entity_store import EntityStore
 
 class DataLoader:
     def __init__(self, data_path: str = "data/"):
         self.data_path = data_path
+        self.store = EntityStore.for_path(data_path)
     
     def load_json_file(self, filename: str) -> List[Dict[str, Any]]:
-        """Charge un fichier JSON et retourne la liste des données"""
-        file_path = os.path.join(self.data_path, filename)
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return []
-        except json.JSONDecodeError:
-            return []
+        """Charge un fichier JSON (via le cache partagé) et retourne la liste des données"""
+        return self.store.load(filename)
+    
+    def iter_collection(self, name: str, predicate: Optional[Callable] = None, **where) -> Iterator[Dict[str, Any]]:
+        """Parcourt une collection élément par élément (mémoire constante).
+        
+        Exemple : iter_collection("notes", lambda n: n["valeur"] < 10, evaluation_id=3)
+        """
+        filename = name if name.endswith(".json") else f"{name}.json"
+        return self.store.iter_records(filename, predicate, where)
+    
+    def get_created_between(self, name: str, after=None, before=None) -> List[Dict[str, Any]]:
+        """Enregistrements créés dans [after, before[ (dates ISO ou datetime), du plus ancien au plus récent.
+
+        Exemple : get_created_between("notes", after="2024-09-01")
+        """
+        filename = name if name.endswith(".json") else f"{name}.json"
+        return self.store.created_between(filename, after, before)
+    
+    def iter_notes(self, predicate: Optional[Callable] = None, **where) -> Iterator[Dict[str, Any]]:
+        return self.iter_collection("notes", predicate, **where)
     
     def load_professeurs(self) -> List[Dict[str, Any]]:
         return self.load_json_file("professeurs.json")
@@ -44,4 +62,60 @@ class DataLoader:
             "evaluations": self.load_evaluations(),
             "notes": self.load_notes(),
             "reviews": self.load_reviews()
-        }
\ No newline at end of file
+        }
+    
+    def _get_by_id(self, filename: str, entity_class, item_id: int):
+        """Récupère un objet par son ID grâce à l'index du cache"""
+        data = self.store.get(filename, item_id)
+        return entity_class.from_dict(data) if data else None
+    
+    def get_professeur_by_id(self, prof_id: int) -> Optional[Professeur]:
+        return self._get_by_id("professeurs.json", Professeur, prof_id)
+    
+    def get_etudiant_by_id(self, etudiant_id: int) -> Optional[Etudiant]:
+        return self._get_by_id("etudiants.json", Etudiant, etudiant_id)
+    
+    def get_cours_by_id(self, cours_id: int) -> Optional[Cours]:
+        return self._get_by_id("cours.json", Cours, cours_id)
+    
+    def get_evaluation_by_id(self, evaluation_id: int) -> Optional[Evaluation]:
+        return self._get_by_id("evaluations.json", Evaluation, evaluation_id)
+    
+    def get_note_by_id(self, note_id: int) -> Optional[Note]:
+        return self._get_by_id("notes.json", Note, note_id)
+    
+    def get_review_by_id(self, review_id: int) -> Optional[Review]:
+        return self._get_by_id("reviews.json", Review, review_id)
+    
+    def get_etudiant_by_numero(self, numero_etudiant: str) -> Optional[Dict[str, Any]]:
+        """Étudiant par numéro (index unique, O(1))"""
+        return self.store.find_unique("etudiants.json", "numero_etudiant", numero_etudiant)
+    
+    def get_etudiant_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return self.store.find_unique("etudiants.json", "email", email)
+    
+    def get_professeur_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return self.store.find_unique("professeurs.json", "email", email)
+    
+    def get_cours_by_code(self, code: str) -> Optional[Dict[str, Any]]:
+        """Cours par code (index unique, O(1))"""
+        return self.store.find_unique("cours.json", "code", code)
+    
+    # Requêtes par clé étrangère (index secondaires du store)
+    def get_notes_by_etudiant(self, etudiant_id: int) -> List[Dict[str, Any]]:
+        return self.store.find_by("notes.json", "etudiant_id", etudiant_id)
+    
+    def get_notes_by_evaluation(self, evaluation_id: int) -> List[Dict[str, Any]]:
+        return self.store.find_by("notes.json", "evaluation_id", evaluation_id)
+    
+    def get_evaluations_by_cours(self, cours_id: int) -> List[Dict[str, Any]]:
+        return self.store.find_by("evaluations.json", "cours_id", cours_id)
+    
+    def get_cours_by_professeur(self, prof_id: int) -> List[Dict[str, Any]]:
+        return self.store.find_by("cours.json", "professeur_id", prof_id)
+    
+    def get_reviews_by_cours(self, cours_id: int) -> List[Dict[str, Any]]:
+        return self.store.find_by("reviews.json", "cours_id", cours_id)
+    
+    def get_reviews_by_etudiant(self, etudiant_id: int) -> List[Dict[str, Any]]:
+        return self.store.find_by("reviews.json", "etudiant_id", etudiant_id)
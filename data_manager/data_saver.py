@@ -1,20 +1,23 @@
-import json
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional
 from datetime import datetime
+from .entity_store import EntityStore
+from .write_batcher import WriteBatcher
+from .bulk_import import validate_rows, collection_name, ENTITY_CLASSES
+from .integrity import IntegrityError, delete_with_dependents
 
 class DataSaver:
     def __init__(self, data_path: str = "data/"):
         self.data_path = data_path
         # Créer le dossier s'il n'existe pas
         os.makedirs(data_path, exist_ok=True)
+        self.store = EntityStore.for_path(data_path)
+        self.batcher = WriteBatcher.for_path(data_path)
     
     def save_json_file(self, filename: str, data: List[Dict[str, Any]]) -> bool:
         """Sauvegarde des données dans un fichier JSON"""
-        file_path = os.path.join(self.data_path, filename)
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self.store.write_all(filename, data)
             return True
         except Exception as e:
             print(f"Erreur lors de la sauvegarde de {filename}: {e}")
@@ -39,122 +42,85 @@ class DataSaver:
         return self.save_json_file("reviews.json", data)
     
     def _load_json_file(self, filename: str) -> List[Dict[str, Any]]:
-        """Charge un fichier JSON"""
-        file_path = os.path.join(self.data_path, filename)
+        """Charge un fichier JSON (via le cache partagé)"""
+        return self.store.load(filename)
+    
+    def _save_entity(self, filename: str, entity) -> object:
+        """Insère ou met à jour un objet (écriture regroupée par le WriteBatcher).
+        
+        Lève IntegrityError si une clé étrangère pointe vers un enregistrement absent
+        ou si une valeur unique (email, numéro, code) est déjà utilisée (vérifiées
+        par le batcher au moment de l'écriture).
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return []
+            if hasattr(entity, 'id') and entity.id:
+                if self.store.get(filename, entity.id) is not None:
+                    self.batcher.submit(filename, entity.to_dict())
+            else:
+                entity_dict = entity.to_dict()
+                entity_dict['date_creation'] = datetime.now().isoformat()
+                entity.id = self.batcher.submit(filename, entity_dict)['id']
+        except IntegrityError:
+            raise
         except Exception as e:
-            print(f"Erreur lors du chargement de {filename}: {e}")
-            return []
+            print(f"Erreur lors de la sauvegarde de {filename}: {e}")
+        return entity
     
     def save_professeur(self, professeur) -> object:
         """Sauvegarde un professeur individuel"""
-        professeurs = self._load_json_file("professeurs.json")
-        
-        if hasattr(professeur, 'id') and professeur.id:
-            for i, p in enumerate(professeurs):
-                if p.get('id') == professeur.id:
-                    professeurs[i] = professeur.to_dict()
-                    break
-        else:
-            new_id = (max([p.get('id', 0) for p in professeurs]) if professeurs else 0) + 1
-            professeur.id = new_id
-            professeur_dict = professeur.to_dict()
-            professeur_dict['date_creation'] = datetime.now().isoformat()
-            professeurs.append(professeur_dict)
-        
-        self.save_professeurs(professeurs)
-        return professeur
+        return self._save_entity("professeurs.json", professeur)
     
     def save_etudiant(self, etudiant) -> object:
         """Sauvegarde un étudiant individuel"""
-        etudiants = self._load_json_file("etudiants.json")
-        
-        if hasattr(etudiant, 'id') and etudiant.id:
-            for i, e in enumerate(etudiants):
-                if e.get('id') == etudiant.id:
-                    etudiants[i] = etudiant.to_dict()
-                    break
-        else:
-            new_id = (max([e.get('id', 0) for e in etudiants]) if etudiants else 0) + 1
-            etudiant.id = new_id
-            etudiant_dict = etudiant.to_dict()
-            etudiant_dict['date_creation'] = datetime.now().isoformat()
-            etudiants.append(etudiant_dict)
-        
-        self.save_etudiants(etudiants)
-        return etudiant
+        return self._save_entity("etudiants.json", etudiant)
     
     def save_cours(self, cours) -> object:
         """Sauvegarde un cours individuel"""
-        cours_list = self._load_json_file("cours.json")
-        
-        if hasattr(cours, 'id') and cours.id:
-            for i, c in enumerate(cours_list):
-                if c.get('id') == cours.id:
-                    cours_list[i] = cours.to_dict()
-                    break
-        else:
-            new_id = (max([c.get('id', 0) for c in cours_list]) if cours_list else 0) + 1
-            cours.id = new_id
-            cours_dict = cours.to_dict()
-            cours_dict['date_creation'] = datetime.now().isoformat()
-            cours_list.append(cours_dict)
-        
-        self.save_json_file("cours.json", cours_list)
-        return cours
+        return self._save_entity("cours.json", cours)
     
     def save_note(self, note) -> object:
         """Sauvegarde une note individuelle"""
-        notes = self._load_json_file("notes.json")
-        
-        if hasattr(note, 'id') and note.id:
-            for i, n in enumerate(notes):
-                if n.get('id') == note.id:
-                    notes[i] = note.to_dict()
-                    break
-        else:
-            new_id = (max([n.get('id', 0) for n in notes]) if notes else 0) + 1
-            note.id = new_id
-            note_dict = note.to_dict()
-            note_dict['date_creation'] = datetime.now().isoformat()
-            notes.append(note_dict)
-        
-        self.save_notes(notes)
-        return note
-    
-    def delete_professeur(self, prof_id: int) -> bool:
-        """Supprime un professeur"""
-        professeurs = self._load_json_file("professeurs.json")
-        original_count = len(professeurs)
-        professeurs = [p for p in professeurs if p.get('id') != prof_id]
-        
-        if len(professeurs) < original_count:
-            self.save_professeurs(professeurs)
-            return True
-        return False
+        return self._save_entity("notes.json", note)
     
-    def delete_etudiant(self, etudiant_id: int) -> bool:
-        """Supprime un étudiant"""
-        etudiants = self._load_json_file("etudiants.json")
-        original_count = len(etudiants)
-        etudiants = [e for e in etudiants if e.get('id') != etudiant_id]
+    def bulk_save(self, collection: str, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Importe des enregistrements en masse : validation par lots via les entités,
+        un bloc d'ID réservé en une fois et une seule écriture pour tout l'import.
         
-        if len(etudiants) < original_count:
-            self.save_etudiants(etudiants)
-            return True
-        return False
+        Les lignes invalides sont listées dans le rapport sans bloquer les autres.
+        """
+        if collection_name(collection) not in ENTITY_CLASSES:
+            raise ValueError(f"Collection inconnue: {collection}")
+        filename = f"{collection_name(collection)}.json"
+        valid, errors = validate_rows(collection, records, store=self.store)
+        ids = []
+        if valid:
+            try:
+                ids = list(self.store.reserve_ids(filename, len(valid)))
+                for record, new_id in zip(valid, ids):
+                    record['id'] = new_id
+                self.store.put_many(filename, valid, durable=True)
+            except Exception as e:
+                print(f"Erreur lors de l'import dans {filename}: {e}")
+                return {"importes": 0, "ids": [], "erreurs": errors + [{"ligne": None, "erreur": str(e)}]}
+        return {"importes": len(valid), "ids": ids, "erreurs": errors}
     
-    def delete_cours(self, cours_id: int) -> bool:
-        """Supprime un cours"""
-        cours_list = self._load_json_file("cours.json")
-        original_count = len(cours_list)
-        cours_list = [c for c in cours_list if c.get('id') != cours_id]
+    def delete_with_dependents(self, filename: str, item_id: int, mode: Optional[str] = None) -> Optional[Dict[str, int]]:
+        """Supprime un enregistrement et ses dépendants (cascade, restrict ou nullify,
+        par défaut selon schema.ON_DELETE) en une seule écriture.
         
-        if len(cours_list) < original_count:
-            self.save_json_file("cours.json", cours_list)
-            return True
-        return False
\ No newline at end of file
+        Retourne le nombre de suppressions par collection (None si l'ID n'existe pas),
+        lève IntegrityError si des dépendants bloquent la suppression.
+        """
+        return delete_with_dependents(self.store, filename, item_id, mode)
+    
+    def delete_professeur(self, prof_id: int, mode: Optional[str] = None) -> bool:
+        """Supprime un professeur (ses cours sont détachés par défaut)"""
+        return self.delete_with_dependents("professeurs.json", prof_id, mode) is not None
+    
+    def delete_etudiant(self, etudiant_id: int, mode: Optional[str] = None) -> bool:
+        """Supprime un étudiant (et par défaut ses notes et reviews)"""
+        return self.delete_with_dependents("etudiants.json", etudiant_id, mode) is not None
+    
+    def delete_cours(self, cours_id: int, mode: Optional[str] = None) -> bool:
+        """Supprime un cours (et par défaut ses évaluations, leurs notes et ses reviews)"""
+        return self.delete_with_dependents("cours.json", cours_id, mode) is not None
@@ -0,0 +1,97 @@
+from bisect import bisect_right
+from typing import List, Dict, Any, Iterable, Optional
+
+NOTE_MIN, NOTE_MAX = 0.0, 20.0
+RESOLUTION = 100  # Valeurs retenues au centième de point
+DECILES = [i / 10 for i in range(1, 10)]
+
+
+class GradeSketch:
+    """Distribution des valeurs de notes (0–20), fusionnable et mise à jour en flux.
+
+    Les valeurs sont comptées sur une grille fixe au centième (au plus 2001
+    cases) : la mémoire ne dépend pas du nombre de notes, deux distributions
+    se fusionnent en additionnant leurs compteurs (évaluations -> cours ->
+    total) et, contrairement à un t-digest ou un KLL, une note modifiée ou
+    supprimée se retire exactement. Les quantiles sont exacts au centième près.
+    """
+
+    def __init__(self, counts: Dict[int, int] = None):
+        self.counts: Dict[int, int] = dict(counts or {})
+        self.total = sum(self.counts.values())
+
+    @staticmethod
+    def _key(valeur: float) -> int:
+        return round(min(max(valeur, NOTE_MIN), NOTE_MAX) * RESOLUTION)
+
+    def add(self, valeur: float, count: int = 1):
+        """Ajoute (count > 0) ou retire (count < 0) une valeur"""
+        key = self._key(valeur)
+        remaining = self.counts.get(key, 0) + count
+        if remaining > 0:
+            self.counts[key] = remaining
+        else:
+            self.counts.pop(key, None)
+        self.total = max(self.total + count, 0)
+
+    def merge(self, other: "GradeSketch") -> "GradeSketch":
+        """Ajoute les compteurs d'une autre distribution (en place), retourne self"""
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        return self
+
+    @classmethod
+    def merged(cls, sketches: Iterable["GradeSketch"]) -> "GradeSketch":
+        result = cls()
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
+
+    def quantiles(self, qs: List[float]) -> List[Optional[float]]:
+        """Quantiles (interpolation linéaire entre rangs, comme numpy.quantile)"""
+        if not self.total:
+            return [None for _ in qs]
+        keys = sorted(self.counts)
+        cumulative = []
+        seen = 0
+        for key in keys:
+            seen += self.counts[key]
+            cumulative.append(seen)
+
+        def value_at(rank: int) -> float:  # rank à partir de 0
+            return keys[bisect_right(cumulative, rank)] / RESOLUTION
+
+        results = []
+        for q in qs:
+            position = min(max(q, 0.0), 1.0) * (self.total - 1)
+            low = int(position)
+            value = value_at(low)
+            if position > low:
+                value += (value_at(low + 1) - value) * (position - low)
+            results.append(round(value, 2))
+        return results
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles([q])[0]
+
+    def histogram(self) -> List[Dict[str, Any]]:
+        """Nombre de notes par point, de [0, 1[ à [19, 20] (20 inclus dans la dernière case)"""
+        bins = [0] * int(NOTE_MAX - NOTE_MIN)
+        for key, count in self.counts.items():
+            bins[min(key // RESOLUTION, len(bins) - 1)] += count
+        return [{"de": i, "a": i + 1, "nombre": count} for i, count in enumerate(bins)]
+
+    def summary(self) -> Dict[str, Any]:
+        """Nombre, extrêmes, médiane, quartiles, déciles et histogramme"""
+        q1, mediane, q3, *deciles = self.quantiles([0.25, 0.5, 0.75] + DECILES)
+        keys = self.counts.keys()
+        return {
+            "nombre": self.total,
+            "min": min(keys) / RESOLUTION if keys else None,
+            "max": max(keys) / RESOLUTION if keys else None,
+            "mediane": mediane,
+            "quartiles": [q1, mediane, q3],
+            "deciles": deciles,
+            "histogramme": self.histogram(),
+        }
@@ -0,0 +1,731 @@
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager, nullcontext, ExitStack
+from contextvars import ContextVar
+from heapq import merge
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Callable
+from .journal import Journal
+from .id_sequence import IdSequence
+from .coordination import StoreCoordinator
+from .schema import FOREIGN_KEYS, UNIQUE_KEYS, TIME_FIELD, unique_key, date_key, date_bound
+from .integrity import DuplicateKeyError
+from .json_stream import iter_json_array, matches
+from .changes import ChangeNotifier, ChangeFeed, describe_writes, describe_replace
+
+JOURNAL_SUFFIX = ".journal.jsonl"
+SEQUENCE_SUFFIX = ".seq"
+
+# Versions figées par le bloc `EntityStore.snapshot()` en cours : {(store, collection): version}
+_pinned_versions: ContextVar[Optional[Dict[Tuple[int, str], "_Collection"]]] = ContextVar(
+    "pinned_versions", default=None)
+
+
+@contextmanager
+def _unpinned():
+    """Suspend le snapshot en cours : une écriture part toujours de la dernière version"""
+    token = _pinned_versions.set(None)
+    try:
+        yield
+    finally:
+        _pinned_versions.reset(token)
+
+
+_REMOVED = object()  # Clé retirée dans la couche de changements d'une version
+
+
+def _should_fold(changes: int, size: int) -> bool:
+    """Une couche de changements est repliée dans une nouvelle base au-delà de √n
+    entrées : une écriture coûte O(√n) amorti au lieu d'une copie en O(n)"""
+    return changes > 32 and changes * changes > size
+
+
+class _Layered:
+    """Dictionnaire persistant : une base partagée entre les versions, jamais
+    modifiée, plus une couche de changements propre à la version ({clé: valeur
+    ou _REMOVED}). `copy` ne copie que la couche (repliée dans une nouvelle
+    base quand elle devient trop grande). Itération dans l'ordre de la base,
+    puis des clés ajoutées.
+    """
+
+    __slots__ = ("base", "delta", "size")
+
+    def __init__(self, base: Dict[Any, Any] = None):
+        self.base = {} if base is None else base
+        self.delta: Dict[Any, Any] = {}
+        self.size = len(self.base)
+
+    def copy(self) -> "_Layered":
+        clone = _Layered.__new__(_Layered)
+        if _should_fold(len(self.delta), len(self.base)):
+            clone.base, clone.delta = dict(self.items()), {}
+        else:
+            clone.base, clone.delta = self.base, dict(self.delta)
+        clone.size = self.size
+        return clone
+
+    def get(self, key, default=None):
+        if key in self.delta:
+            value = self.delta[key]
+            return default if value is _REMOVED else value
+        return self.base.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, _REMOVED)
+        if value is _REMOVED:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _REMOVED) is not _REMOVED
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.size += 1
+        self.delta[key] = value
+
+    def pop(self, key, default=None):
+        value = self.get(key, _REMOVED)
+        if value is _REMOVED:
+            return default
+        self.size -= 1
+        if key in self.base:
+            self.delta[key] = _REMOVED
+        else:
+            del self.delta[key]
+        return value
+
+    def __delitem__(self, key):
+        if self.pop(key, _REMOVED) is _REMOVED:
+            raise KeyError(key)
+
+    def _merged(self) -> Dict[Any, Any]:
+        """Base et couche fusionnées dans un dict (copie en C, pour un parcours complet)"""
+        if not self.delta:
+            return self.base
+        merged = self.base | self.delta
+        for key, value in self.delta.items():
+            if value is _REMOVED:
+                del merged[key]
+        return merged
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        return iter(self._merged().items())
+
+    def values(self) -> Iterator[Any]:
+        return iter(self._merged().values())
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._merged())
+
+
+class _Timeline:
+    """Index trié (date_creation, id) persistant, sur le même principe que _Layered :
+    listes parallèles de base partagées (requêtes par intervalle en O(log n + k))
+    plus, par version, les entrées ajoutées (triées) et les IDs retirés de la base.
+    """
+
+    __slots__ = ("dates", "ids", "added", "removed")
+
+    def __init__(self, dated: List[Tuple[Any, Any]] = ()):
+        self.dates = [key for key, _ in dated]
+        self.ids = [item_id for _, item_id in dated]
+        self.added: List[Tuple[Any, Any]] = []
+        self.removed = set()
+
+    def copy(self) -> "_Timeline":
+        if _should_fold(len(self.added) + len(self.removed), len(self.ids)):
+            return _Timeline(list(self._entries()))
+        clone = _Timeline.__new__(_Timeline)
+        clone.dates, clone.ids = self.dates, self.ids
+        clone.added, clone.removed = list(self.added), set(self.removed)
+        return clone
+
+    def add(self, key, item_id):
+        # Après les entrées de même date : ordre d'insertion, comme dans la base
+        position = bisect_right(self.added, key, key=lambda entry: entry[0])
+        self.added.insert(position, (key, item_id))
+
+    def discard(self, key, item_id):
+        position = bisect_left(self.added, key, key=lambda entry: entry[0])
+        while position < len(self.added) and self.added[position][0] == key:
+            if self.added[position][1] == item_id:
+                del self.added[position]
+                return
+            position += 1
+        self.removed.add(item_id)  # Entrée de la base
+
+    def _entries(self, after=None, before=None) -> Iterator[Tuple[Any, Any]]:
+        """Entrées (date, id) dans [after, before[, fusion de la base et des ajouts"""
+        start = bisect_left(self.dates, after) if after is not None else 0
+        end = bisect_left(self.dates, before) if before is not None else len(self.dates)
+        base = zip(self.dates[start:end], self.ids[start:end])
+        if self.removed:
+            base = ((key, item_id) for key, item_id in base if item_id not in self.removed)
+        if not self.added:
+            return base
+        low = bisect_left(self.added, after, key=lambda entry: entry[0]) if after is not None else 0
+        high = bisect_left(self.added, before, key=lambda entry: entry[0]) if before is not None else len(self.added)
+        return merge(base, self.added[low:high], key=lambda entry: entry[0])
+
+    def between(self, after=None, before=None) -> List[Any]:
+        return [item_id for _, item_id in self._entries(after, before)]
+
+
+class _Collection:
+    """Version en mémoire d'une collection : index {id: enregistrement} ordonné
+    index secondaires {clé étrangère: {valeur: {id: None}}} et index uniques
+    {champ: {valeur normalisée: id}}, plus un index trié sur date_creation
+    (requêtes par intervalle en O(log n + k)).
+
+    Une version publiée n'est plus modifiée : une écriture travaille sur une
+    copie (`copy`) qui remplace la version courante une fois persistée. Les
+    index sont des structures persistantes (_Layered, _Timeline) : la copie
+    partage les données de la version précédente et ne duplique que ce que
+    l'écriture touche, au lieu de tout recopier en O(n).
+    """
+
+    def __init__(self, by_id: Dict[Any, Dict[str, Any]], signature: Optional[Tuple],
+                 indexed_fields: List[str] = (), version: int = 0, unique_fields: List[str] = ()):
+        self.by_id = _Layered(by_id)
+        self.signature = signature
+        self.version = version
+        indexes: Dict[str, Dict[Any, Dict[Any, None]]] = {field: {} for field in indexed_fields}
+        unique: Dict[str, Dict[Any, Any]] = {field: {} for field in unique_fields}
+        for item_id, record in by_id.items():
+            for field, index in indexes.items():
+                index.setdefault(record.get(field), {})[item_id] = None
+            for field, index in unique.items():
+                if record.get(field) is not None:
+                    index[unique_key(record[field])] = item_id
+        self.indexes = {field: _Layered({value: _Layered(ids) for value, ids in index.items()})
+                        for field, index in indexes.items()}
+        self.unique = {field: _Layered(index) for field, index in unique.items()}
+        self._owned = {field: set() for field in indexed_fields}  # Listes d'IDs propres à cette version
+        self.timeline = _Timeline(sorted((key, item_id) for item_id, key in
+                                         ((i, date_key(r.get(TIME_FIELD))) for i, r in by_id.items())
+                                         if key is not None))
+
+    def copy(self) -> "_Collection":
+        """Nouvelle version modifiable, qui partage les données de celle-ci (O(√n) amorti)"""
+        clone = _Collection.__new__(_Collection)
+        clone.by_id = self.by_id.copy()
+        clone.signature = self.signature
+        clone.version = self.version + 1
+        clone.indexes = {field: index.copy() for field, index in self.indexes.items()}
+        clone.unique = {field: index.copy() for field, index in self.unique.items()}
+        clone._owned = {field: set() for field in self.indexes}
+        clone.timeline = self.timeline.copy()
+        return clone
+
+    def _bucket(self, field: str, value) -> _Layered:
+        """Liste d'IDs modifiable d'une valeur indexée (copiée si partagée)"""
+        index = self.indexes[field]
+        bucket = index.get(value)
+        owned = self._owned[field]
+        if bucket is None:
+            bucket = index[value] = _Layered()
+            owned.add(value)
+        elif value not in owned:
+            bucket = index[value] = bucket.copy()
+            owned.add(value)
+        return bucket
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        return list(self.by_id.values())
+
+    def _index(self, item_id, record: Dict[str, Any]):
+        key = date_key(record.get(TIME_FIELD))
+        if key is not None:
+            self.timeline.add(key, item_id)
+        for field in self.indexes:
+            self._bucket(field, record.get(field))[item_id] = None
+        for field, index in self.unique.items():
+            if record.get(field) is not None:
+                index[unique_key(record[field])] = item_id
+
+    def _unindex(self, item_id, record: Dict[str, Any]):
+        key = date_key(record.get(TIME_FIELD))
+        if key is not None:
+            self.timeline.discard(key, item_id)
+        for field, index in self.indexes.items():
+            value = record.get(field)
+            if value in index:
+                ids = self._bucket(field, value)
+                ids.pop(item_id, None)
+                if not ids:
+                    del index[value]
+        for field, index in self.unique.items():
+            key = unique_key(record.get(field))
+            if index.get(key) == item_id:
+                del index[key]
+
+    def check_unique(self, record: Dict[str, Any]):
+        """Lève DuplicateKeyError si une valeur unique appartient déjà à un autre enregistrement (O(1))"""
+        for field, index in self.unique.items():
+            if record.get(field) is None:
+                continue
+            owner = index.get(unique_key(record[field]))
+            if owner is not None and owner != record.get('id'):
+                raise DuplicateKeyError(f"{field} '{record[field]}' déjà utilisé (ID {owner})")
+
+    def set(self, record: Dict[str, Any]):
+        """Insère ou remplace un enregistrement en maintenant les index"""
+        item_id = record.get('id')
+        old = self.by_id.get(item_id)
+        if old is not None:
+            self._unindex(item_id, old)
+        self.by_id[item_id] = record
+        self._index(item_id, record)
+
+    def remove(self, item_id) -> bool:
+        record = self.by_id.pop(item_id, None)
+        if record is None:
+            return False
+        self._unindex(item_id, record)
+        return True
+
+    def find_unique(self, field: str, value) -> Optional[Dict[str, Any]]:
+        """Enregistrement portant une valeur unique (index si disponible)"""
+        index = self.unique.get(field)
+        if index is None:
+            return next((r for r in self.by_id.values() if unique_key(r.get(field)) == unique_key(value)), None)
+        item_id = index.get(unique_key(value))
+        return self.by_id.get(item_id) if item_id is not None else None
+
+    def created_between(self, after=None, before=None) -> List[Dict[str, Any]]:
+        """Enregistrements créés dans [after, before[ (bornes optionnelles), triés par date"""
+        return [self.by_id[i] for i in self.timeline.between(date_bound(after), date_bound(before))]
+
+    def find(self, field: str, value) -> List[Dict[str, Any]]:
+        """Enregistrements dont `field` vaut `value` (index si disponible)"""
+        index = self.indexes.get(field)
+        if index is None:
+            return [r for r in self.by_id.values() if r.get(field) == value]
+        return [self.by_id[i] for i in index.get(value, ())]
+
+
+class EntityStore(ChangeNotifier):
+    """Cache mémoire des collections JSON, partagé par tout le processus.
+
+    Chaque fichier n'est relu que si sa date de modification ou sa taille change.
+    Les lectures ne prennent aucun verrou : une écriture construit une nouvelle
+    version de la collection (copie sur écriture), l'écrit dans un fichier
+    temporaire renommé atomiquement, puis la publie. Un lecteur ne voit donc
+    jamais de fichier à moitié écrit, et `snapshot()` fige la version lue
+    pendant toute une requête.
+    En mode journal (variable DATA_JOURNAL=1), chaque écriture unitaire est une
+    ligne ajoutée à `<collection>.journal.jsonl`, repliée dans le fichier JSON
+    par un compactage en arrière-plan.
+    Avec DATA_COORDINATION=1 (plusieurs processus sur le même dossier), chaque
+    écriture prend un verrou fcntl sur sa collection et incrémente un compteur
+    de génération partagé : le cache se valide par ce compteur au lieu d'un stat.
+    Chaque écriture produit des événements create/update/delete transmis aux
+    abonnés (`add_listener`), dont le flux de changements séquencé (changes.py).
+    """
+
+    _instances: Dict[str, "EntityStore"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, data_path: str = "data/", journal: bool = None):
+        self.data_path = data_path
+        if journal is None:
+            journal = os.environ.get("DATA_JOURNAL", "0") == "1"
+        self.journal_enabled = journal
+        self.journal_max_bytes = int(os.environ.get("DATA_JOURNAL_MAX_BYTES", 1024 * 1024))
+        self.journal_max_age = float(os.environ.get("DATA_JOURNAL_MAX_AGE", 60))
+        self._collections: Dict[str, _Collection] = {}
+        self._journals: Dict[str, Journal] = {}
+        self._sequences: Dict[str, IdSequence] = {}
+        self._compacting = set()
+        self._compacted: Dict[str, Tuple] = {}  # {collection: (signature après compactage, signature avant)}
+        self._lock = threading.RLock()
+        self._write_lock = self._lock  # Tenu par apply / write_all jusqu'à la notification
+        self.coordinator = StoreCoordinator.create(data_path)
+        self._listeners = []
+        self._signatures_before: Dict[str, Any] = {}
+        self.change_feed: Optional[ChangeFeed] = None
+
+    @classmethod
+    def for_path(cls, data_path: str = "data/") -> "EntityStore":
+        """Retourne le store partagé associé à un dossier de données.
+
+        Le backend est choisi par la variable STORAGE_BACKEND (json ou sqlite) ;
+        DATA_SHARDING=1 découpe les notes et les reviews en shards.
+        """
+        key = os.path.abspath(data_path)
+        with cls._instances_lock:
+            store = cls._instances.get(key)
+            if store is None:
+                if os.environ.get("STORAGE_BACKEND", "json") == "sqlite":
+                    from .sqlite_store import SqliteStore
+                    store = SqliteStore(data_path)
+                elif os.environ.get("DATA_SHARDING", "0") == "1":
+                    from .sharding import ShardedStore
+                    store = ShardedStore(data_path)
+                else:
+                    store = cls(data_path)
+                if os.environ.get("CHANGE_FEED", "1") == "1":
+                    ChangeFeed.attach(store)
+                cls._instances[key] = store
+            return store
+
+    def _file_path(self, filename: str) -> str:
+        return os.path.join(self.data_path, filename)
+
+    def _sidecar_path(self, filename: str, suffix: str) -> str:
+        """Chemin d'un fichier annexe (ex: notes.json -> notes.seq)"""
+        base = filename[:-5] if filename.endswith(".json") else filename
+        return self._file_path(base + suffix)
+
+    def _journal(self, filename: str) -> Journal:
+        journal = self._journals.get(filename)
+        if journal is None:
+            journal = Journal(self._sidecar_path(filename, JOURNAL_SUFFIX))
+            self._journals[filename] = journal
+        return journal
+
+    def _sequence(self, filename: str) -> IdSequence:
+        with self._lock:
+            sequence = self._sequences.get(filename)
+            if sequence is None:
+                sequence = IdSequence(self._sidecar_path(filename, SEQUENCE_SUFFIX),
+                                      seed=lambda: self.max_id(filename))
+                self._sequences[filename] = sequence
+            return sequence
+
+    def next_id(self, filename: str) -> int:
+        """Attribue un nouvel ID à une collection sans parcourir ses enregistrements"""
+        return self._sequence(filename).next_id()
+
+    def reserve_ids(self, filename: str, count: int) -> range:
+        """Réserve un bloc d'IDs consécutifs (insertions en masse)"""
+        return self._sequence(filename).reserve(count)
+
+    def max_id(self, filename: str) -> int:
+        """Plus grand ID présent dans une collection (parcours complet)"""
+        return max([i for i in self._current(filename).by_id if isinstance(i, int)], default=0)
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _signature(self, filename: str) -> Optional[Tuple]:
+        """Signature (mtime, taille) du fichier et de son journal éventuel"""
+        signature = self._stat(self._file_path(filename))
+        if self.journal_enabled:
+            return (signature, self._stat(self._journal(filename).path))
+        return signature
+
+    def _freshness(self, filename: str):
+        """Jeton comparé à celui du cache : génération partagée ou signature des fichiers"""
+        if self.coordinator is not None:
+            return self.coordinator.generation(filename)
+        return self._signature(filename)
+
+    def _publish(self, filename: str):
+        """Annonce une écriture aux autres processus, retourne le nouveau jeton du cache"""
+        if self.coordinator is not None:
+            return self.coordinator.bump(filename)
+        return self._signature(filename)
+
+    def _exclusive(self, filename: str):
+        """Verrou inter-processus d'un cycle lecture-modification-écriture (à prendre après self._lock)"""
+        if self.coordinator is not None:
+            return self.coordinator.lock(filename)
+        return nullcontext()
+
+    def signature(self, filename: str) -> Optional[Tuple]:
+        """Jeton de version d'une collection : change à chaque écriture, pas au compactage.
+
+        Avec un coordinateur, c'est la génération partagée (qui ne change pas au
+        compactage), qualifiée par le fichier des générations. Sinon c'est la
+        signature des fichiers ; juste après un compactage fait par ce processus,
+        la signature d'avant est conservée, le contenu n'ayant pas changé.
+        """
+        if self.coordinator is not None:
+            return (self.coordinator.identity, self.coordinator.generation(filename))
+        signature = self._signature(filename)
+        compacted = self._compacted.get(filename)
+        if compacted is not None and compacted[0] == signature:
+            return compacted[1]
+        return signature
+
+    def _read_file(self, filename: str) -> Dict[Any, Dict[str, Any]]:
+        """Lit le snapshot JSON puis rejoue le journal par-dessus"""
+        try:
+            with open(self._file_path(filename), 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            records = []
+        by_id = {r.get('id'): r for r in records}
+        if self.journal_enabled:
+            self._journal(filename).replay(by_id)
+        return by_id
+
+    def _write_snapshot(self, filename: str, records: List[Dict[str, Any]], durable: bool = False):
+        """Réécrit le fichier JSON complet (format lisible par les loaders).
+
+        Écriture dans un fichier temporaire puis renommage atomique : un lecteur
+        voit l'ancienne ou la nouvelle version, jamais un fichier tronqué.
+        """
+        path = self._file_path(filename)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(records, f, indent=2, ensure_ascii=False)
+                if durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @contextmanager
+    def snapshot(self):
+        """Fige, pour la durée du bloc, la version de chaque collection lue.
+
+        Toutes les lectures du bloc (dans le même contexte, y compris le thread
+        d'une route FastAPI) voient la même version d'une collection, même si
+        une écriture en publie une nouvelle entre-temps. Aucun verrou n'est pris.
+        """
+        token = _pinned_versions.set({})
+        try:
+            yield self
+        finally:
+            _pinned_versions.reset(token)
+
+    def _collection(self, filename: str) -> _Collection:
+        """Version de la collection visible par l'appelant (figée dans un snapshot)"""
+        pinned = _pinned_versions.get()
+        if pinned is None:
+            return self._current(filename)
+        key = (id(self), filename)
+        coll = pinned.get(key)
+        if coll is None:
+            coll = pinned[key] = self._current(filename)
+        return coll
+
+    def _current(self, filename: str) -> _Collection:
+        """Dernière version publiée de la collection, rechargée si le fichier a changé"""
+        signature = self._freshness(filename)
+        coll = self._collections.get(filename)
+        if coll is not None and coll.signature == signature:
+            return coll
+
+        with self._lock:
+            signature = self._freshness(filename)  # Une écriture a pu publier pendant l'attente
+            coll = self._collections.get(filename)
+            if coll is None or coll.signature != signature:
+                version = coll.version + 1 if coll is not None else 0
+                coll = _Collection(self._read_file(filename), signature, FOREIGN_KEYS.get(filename, []),
+                                   version, UNIQUE_KEYS.get(filename, []))
+                self._collections[filename] = coll
+            return coll
+
+    def load(self, filename: str) -> List[Dict[str, Any]]:
+        """Retourne une copie de la liste des enregistrements d'une collection"""
+        return self._collection(filename).records
+
+    def iter_records(self, filename: str, predicate: Optional[Callable] = None,
+                     where: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        """Parcourt une collection sans la charger en mémoire si elle n'est pas en cache"""
+        if _pinned_versions.get() is not None:
+            coll = self._collection(filename)
+        else:
+            coll = self._collections.get(filename)
+            if coll is not None and coll.signature != self._freshness(filename):
+                coll = None
+        if coll is not None:
+            if where and len(where) == 1 and next(iter(where)) in coll.indexes:
+                field, value = next(iter(where.items()))
+                records = coll.find(field, value)
+            else:
+                records = coll.records
+            return (r for r in records if matches(r, predicate, where))
+        if self.journal_enabled and self._journal(filename).size():
+            # Le journal doit être rejoué : passage par le cache
+            return (r for r in self.load(filename) if matches(r, predicate, where))
+        return iter_json_array(self._file_path(filename), predicate, where)
+
+    def get(self, filename: str, item_id: int) -> Optional[Dict[str, Any]]:
+        """Récupère un enregistrement par son ID en O(1)"""
+        return self._collection(filename).by_id.get(item_id)
+
+    def find_by(self, filename: str, field: str, value) -> List[Dict[str, Any]]:
+        """Enregistrements liés par une clé étrangère, via l'index secondaire (O(k))"""
+        return self._collection(filename).find(field, value)
+
+    def find_unique(self, filename: str, field: str, value) -> Optional[Dict[str, Any]]:
+        """Enregistrement portant une valeur unique (ex: code de cours), par l'index unique en O(1)"""
+        return self._collection(filename).find_unique(field, value)
+
+    def created_between(self, filename: str, after=None, before=None) -> List[Dict[str, Any]]:
+        """Enregistrements dont date_creation est dans [after, before[ (ISO ou datetime),
+        par l'index trié : O(log n + k)"""
+        return self._collection(filename).created_between(after, before)
+
+    def count(self, filename: str) -> int:
+        """Nombre d'enregistrements d'une collection"""
+        return len(self._collection(filename).by_id)
+
+    def write_all(self, filename: str, records: List[Dict[str, Any]]):
+        """Remplace entièrement une collection (et vide son journal)"""
+        with self._lock, self._exclusive(filename), _unpinned():
+            events = describe_replace(filename, self.load(filename), records) if self._listeners else []
+            before = {filename: self.signature(filename)} if events else {}
+            self._write_all(filename, records)
+            self._notify(events, before)
+
+    def _write_all(self, filename: str, records: List[Dict[str, Any]]):
+        self._replace_file(filename, records)
+        self._sequence(filename).ensure_at_least(self.max_id(filename))
+
+    def _replace_file(self, filename: str, records: List[Dict[str, Any]]):
+        with self._lock, self._exclusive(filename):
+            self._write_snapshot(filename, records)
+            if self.journal_enabled:
+                self._journal(filename).reset()
+            self.refresh(filename, records)
+
+    def put(self, filename: str, record: Dict[str, Any]):
+        """Insère ou remplace un enregistrement (clé : son ID)"""
+        self.put_many(filename, [record])
+
+    def put_many(self, filename: str, records: List[Dict[str, Any]], durable: bool = False):
+        """Insère ou remplace plusieurs enregistrements en une seule écriture"""
+        self.apply({filename: {"put": records}}, durable)
+
+    def delete(self, filename: str, item_id: int) -> bool:
+        """Supprime un enregistrement, retourne False s'il n'existe pas"""
+        with self._lock, self._exclusive(filename), _unpinned():
+            if self.get(filename, item_id) is None:
+                return False
+            self.apply({filename: {"delete": [item_id]}})
+            return True
+
+    @contextmanager
+    def exclusive(self, filenames):
+        """Réserve des collections pour un cycle lecture-modification-écriture.
+
+        Les écritures du processus et les verrous inter-processus des collections
+        sont tenus pendant tout le bloc, dont les lectures voient la dernière
+        version (hors snapshot) : ce qui y est lu ne peut pas changer avant les
+        apply du bloc.
+        """
+        with self._lock, ExitStack() as locks, _unpinned():
+            for filename in sorted(filenames):
+                locks.enter_context(self._exclusive(filename))
+            yield self
+
+    def apply(self, changes: Dict[str, Dict[str, list]], durable: bool = False):
+        """Applique ensemble des écritures sur plusieurs collections.
+
+        changes = {collection: {"put": [enregistrements], "delete": [ids]}}. Toutes
+        les nouvelles versions sont construites avant la première écriture, puis
+        publiées ensemble une fois toutes les collections persistées.
+        """
+        with self._lock, ExitStack() as locks, _unpinned():
+            for filename in sorted(changes):
+                locks.enter_context(self._exclusive(filename))
+            events = describe_writes(self.get, changes) if self._listeners else []
+            before = {filename: self.signature(filename) for filename in changes} if events else {}
+            self._apply(changes, durable)
+            self._notify(events, before)
+
+    def _apply(self, changes: Dict[str, Dict[str, list]], durable: bool = False):
+        """Écrit des changements par collection physique, sans produire d'événements"""
+        filenames = sorted(changes)
+        with ExitStack() as locks:
+            for filename in filenames:
+                locks.enter_context(self._exclusive(filename))
+            versions = {}
+            for filename in filenames:
+                coll = self._current(filename).copy()
+                entries = []
+                for record in changes[filename].get("put", ()):
+                    coll.check_unique(record)
+                    coll.set(record)
+                    entries.append(("put", record.get('id'), record))
+                for item_id in changes[filename].get("delete", ()):
+                    if coll.remove(item_id):
+                        entries.append(("delete", item_id, None))
+                versions[filename] = (coll, entries)
+            for filename, (coll, entries) in versions.items():
+                if entries:
+                    self._persist(filename, coll, entries, durable)
+            for filename, (coll, entries) in versions.items():
+                if entries:
+                    self._collections[filename] = coll
+
+    def _persist(self, filename: str, coll: _Collection, entries: List[Tuple], durable: bool = False):
+        """Persiste des écritures : lignes de journal ou une réécriture complète"""
+        if self.journal_enabled:
+            journal = self._journal(filename)
+            journal.append_many(entries, durable)
+            coll.signature = self._publish(filename)
+            if journal.size() >= self.journal_max_bytes or journal.age() >= self.journal_max_age:
+                self._schedule_compaction(filename)
+        else:
+            self._write_snapshot(filename, coll.records, durable)
+            coll.signature = self._publish(filename)
+
+    def _schedule_compaction(self, filename: str):
+        """Lance le compactage d'une collection dans un thread d'arrière-plan"""
+        if filename in self._compacting:
+            return
+        self._compacting.add(filename)
+        threading.Thread(target=self.compact, args=(filename,), daemon=True).start()
+
+    def compact(self, filename: str):
+        """Replie le journal d'une collection dans son fichier JSON"""
+        try:
+            with self._lock, self._exclusive(filename):
+                coll = self._current(filename)
+                before = self.signature(filename)
+                self._write_snapshot(filename, coll.records)
+                self._journal(filename).reset()
+                if self.coordinator is None:
+                    coll.signature = self._signature(filename)
+                    self._compacted[filename] = (coll.signature, before)
+                # Avec un coordinateur, la génération reste la même : le contenu n'a pas
+                # changé, les caches des autres processus restent valides
+        except Exception as e:
+            print(f"Erreur lors du compactage de {filename}: {e}")
+        finally:
+            self._compacting.discard(filename)
+
+    def compact_all(self):
+        """Compacte tous les journaux connus (ex: à l'arrêt du processus)"""
+        for filename in list(self._journals):
+            if self._journal(filename).size():
+                self.compact(filename)
+
+    def refresh(self, filename: str, records: List[Dict[str, Any]]):
+        """Met à jour le cache après une écriture faite par ce processus"""
+        with self._lock:
+            by_id = {r.get('id'): r for r in records}
+            previous = self._collections.get(filename)
+            self._collections[filename] = _Collection(by_id, self._publish(filename),
+                                                      FOREIGN_KEYS.get(filename, []),
+                                                      previous.version + 1 if previous else 0,
+                                                      UNIQUE_KEYS.get(filename, []))
+
+    def invalidate(self, filename: str = None):
+        """Oublie une collection (ou toutes) pour forcer sa relecture"""
+        with self._lock:
+            if filename is None:
+                self._collections.clear()
+            else:
+                self._collections.pop(filename, None)
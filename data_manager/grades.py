@@ -0,0 +1,181 @@
+import threading
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from .columnar import load_columnar_notes, MISSING_ID
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel : repli sur un seul parcours Python
+    np = None
+
+_NONE = MISSING_ID  # ID absent (note sans évaluation connue, évaluation sans cours), comme au format colonne
+
+
+def _int(value) -> int:
+    return value if type(value) is int else _NONE
+
+
+def _numeric(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class GradeEngine:
+    """Moyennes pondérées par le coefficient des évaluations, pour toute une cohorte.
+
+    Les notes sont chargées une fois en tableaux (étudiant, évaluation, valeur,
+    puis coefficient et cours de l'évaluation) ; les moyennes de tous les
+    étudiants, cours ou évaluations sortent d'une seule réduction groupée
+    (np.unique + np.bincount), en O(notes) au lieu d'un parcours des notes par
+    entité. Sans NumPy, un seul parcours Python accumule les mêmes sommes.
+    Une note dont l'évaluation est inconnue compte avec un coefficient 1.
+    """
+
+    def __init__(self, notes, evaluations: Iterable[Dict[str, Any]]):
+        evaluations = list(evaluations)
+        coefficients = {e.get('id'): float(e.get('coefficient') or 1.0) for e in evaluations}
+        cours = {e.get('id'): _int(e.get('cours_id')) for e in evaluations}
+        self._cache: Dict[str, Dict] = {}
+        if hasattr(notes, 'array'):
+            # Notes au format colonne (mmap) : colonnes lues sans copie. Une valeur non
+            # numérique y est un NaN, écarté comme par _numeric sur les enregistrements
+            columns = [notes.array(name) for name in ("etudiant_id", "evaluation_id", "valeur")]
+            if np is not None:
+                numeric = ~np.isnan(columns[2])
+                if not numeric.all():
+                    columns = [column[numeric] for column in columns]
+            else:
+                kept = [i for i, valeur in enumerate(columns[2]) if valeur == valeur]
+                if len(kept) < len(columns[2]):
+                    columns = [[column[i] for i in kept] for column in columns]
+        else:
+            notes = [n for n in notes if _numeric(n.get('valeur'))]
+            columns = [[_int(n.get('etudiant_id')) for n in notes],
+                       [_int(n.get('evaluation_id')) for n in notes],
+                       [float(n['valeur']) for n in notes]]
+        if np is not None:
+            self.etudiants = np.asarray(columns[0], dtype=np.int64)
+            self.evaluations = np.asarray(columns[1], dtype=np.int64)
+            self.valeurs = np.asarray(columns[2], dtype=np.float64)
+            ids = np.array(sorted(coefficients), dtype=np.int64)
+            position = np.clip(np.searchsorted(ids, self.evaluations), 0, max(len(ids) - 1, 0))
+            known = (ids[position] == self.evaluations) if len(ids) else np.zeros(len(self.evaluations), dtype=bool)
+            by_id = [coefficients[i] for i in ids.tolist()] or [1.0]
+            self.coefficients = np.where(known, np.array(by_id)[position], 1.0)
+            self.cours = np.where(known, np.array([cours[i] for i in ids.tolist()] or [_NONE])[position], _NONE)
+        else:
+            self.etudiants, self.evaluations, self.valeurs = (list(c) for c in columns)
+            self.coefficients = [coefficients.get(e, 1.0) for e in self.evaluations]
+            self.cours = [cours.get(e, _NONE) for e in self.evaluations]
+
+    def __len__(self) -> int:
+        return len(self.valeurs)
+
+    def _grouped(self, *keys) -> Dict[Any, Dict[str, Any]]:
+        """{clé: {moyenne, nombre_notes}} pour toutes les valeurs de la clé, en une passe"""
+        if np is not None:
+            if len(self.valeurs) == 0:
+                return {}
+            stacked = np.stack(keys, axis=1)
+            groups, inverse = np.unique(stacked, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            poids = np.bincount(inverse, weights=self.coefficients, minlength=len(groups))
+            sommes = np.bincount(inverse, weights=self.coefficients * self.valeurs, minlength=len(groups))
+            nombres = np.bincount(inverse, minlength=len(groups))
+            results = {}
+            for group, somme, poid, nombre in zip(groups.tolist(), sommes.tolist(), poids.tolist(), nombres.tolist()):
+                key = group[0] if len(group) == 1 else tuple(group)
+                results[key] = {"moyenne": round(somme / poid, 2), "nombre_notes": nombre}
+            return results
+        totals: Dict[Any, list] = {}
+        for i, valeur in enumerate(self.valeurs):
+            key = keys[0][i] if len(keys) == 1 else tuple(k[i] for k in keys)
+            total = totals.setdefault(key, [0.0, 0.0, 0])
+            total[0] += self.coefficients[i] * valeur
+            total[1] += self.coefficients[i]
+            total[2] += 1
+        return {key: {"moyenne": round(somme / poids, 2), "nombre_notes": nombre}
+                for key, (somme, poids, nombre) in totals.items()}
+
+    def _cached(self, name: str, *keys) -> Dict[Any, Dict[str, Any]]:
+        results = self._cache.get(name)
+        if results is None:
+            results = self._cache[name] = self._grouped(*keys)
+        return results
+
+    def par_etudiant(self) -> Dict[int, Dict[str, Any]]:
+        """Moyenne pondérée de chaque étudiant sur toutes ses notes"""
+        return self._cached("etudiant", self.etudiants)
+
+    def par_evaluation(self) -> Dict[int, Dict[str, Any]]:
+        """Moyenne de chaque évaluation (un seul coefficient : moyenne simple)"""
+        return self._cached("evaluation", self.evaluations)
+
+    def par_cours(self) -> Dict[int, Dict[str, Any]]:
+        """Moyenne pondérée de chaque cours, sur les notes de ses évaluations"""
+        return {k: v for k, v in self._cached("cours", self.cours).items() if k != _NONE}
+
+    def par_etudiant_et_cours(self) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """Moyenne pondérée de chaque étudiant dans chaque cours : {(etudiant_id, cours_id): ...}"""
+        return {k: v for k, v in self._cached("etudiant_cours", self.etudiants, self.cours).items()
+                if k[1] != _NONE}
+
+    def moyenne(self, etudiant_id: int = None, evaluation_id: int = None, cours_id: int = None) -> float:
+        """Moyenne pondérée d'un étudiant, d'une évaluation ou d'un cours (0.0 sans note).
+
+        Même signature que ColumnarNotes.moyenne : utilisable par les méthodes
+        calculer_moyenne des entités.
+        """
+        if etudiant_id is not None and cours_id is not None:
+            result = self.par_etudiant_et_cours().get((etudiant_id, cours_id))
+        elif etudiant_id is not None:
+            result = self.par_etudiant().get(etudiant_id)
+        elif evaluation_id is not None:
+            result = self.par_evaluation().get(evaluation_id)
+        elif cours_id is not None:
+            result = self.par_cours().get(cours_id)
+        else:
+            result = self._cached("global", [0] * len(self) if np is None else np.zeros(len(self), dtype=np.int64)).get(0)
+        return result["moyenne"] if result else 0.0
+
+    # Moteur partagé d'un store
+
+    _attach_lock = threading.Lock()
+
+    @classmethod
+    def for_store(cls, store) -> "GradeEngine":
+        """Moteur des notes actuelles du store, reconstruit après une écriture des notes ou des évaluations"""
+        with cls._attach_lock:
+            cache = getattr(store, "grades", None)
+            if cache is None:
+                cache = store.grades = _EngineCache(store)
+        return cache.engine()
+
+
+class _EngineCache:
+    """Dernier moteur construit pour un store, et ce qui le rend périmé"""
+
+    WATCHED = ("notes.json", "evaluations.json")
+
+    def __init__(self, store):
+        self.store = store
+        self._writes = 0
+        self._key = None
+        self._engine: Optional[GradeEngine] = None
+        self._lock = threading.Lock()
+        store.add_listener(self._on_events)
+
+    def _on_events(self, events: List[Dict[str, Any]]):
+        if any(f"{e['collection']}.json" in self.WATCHED for e in events):
+            self._writes += 1
+
+    def _current_key(self):
+        return (self._writes, tuple(self.store.signature(f) for f in self.WATCHED))
+
+    def engine(self) -> GradeEngine:
+        key = self._current_key()
+        with self._lock:
+            if self._engine is None or self._key != key:
+                with self.store.snapshot():
+                    notes = load_columnar_notes(self.store) or self.store.load("notes.json")
+                    self._engine = GradeEngine(notes, self.store.load("evaluations.json"))
+                self._key = key
+            return self._engine
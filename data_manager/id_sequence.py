@@ -0,0 +1,68 @@
+import os
+import threading
+from typing import Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrou limité au processus
+    fcntl = None
+
+
+class IdSequence:
+    """Séquence d'IDs persistante d'une collection.
+
+    La dernière valeur attribuée est stockée dans un petit fichier annexe
+    (ex: data/notes.seq). La réservation est atomique, y compris entre
+    processus (verrou fcntl sur le fichier annexe).
+    """
+
+    def __init__(self, path: str, seed: Callable[[], int]):
+        self.path = path
+        self._seed = seed  # Retourne le plus grand ID existant si le fichier annexe est absent
+        self._lock = threading.Lock()
+
+    def _update(self, compute: Callable[[int], int]) -> int:
+        """Lit la dernière valeur, écrit compute(valeur) et retourne l'ancienne valeur.
+
+        La graine (fichier annexe absent ou vide) est calculée hors des verrous de
+        la séquence : seed() lit le store, dont les écritures prennent leurs
+        verrous avant celui de la séquence. Si un autre appel a écrit le fichier
+        entre-temps, sa valeur l'emporte sur la graine.
+        """
+        seed = None
+        while True:
+            with self._lock:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    if fcntl:
+                        fcntl.flock(fd, fcntl.LOCK_EX)
+                    content = os.read(fd, 64).strip()
+                    if content or seed is not None:
+                        last = int(content) if content else seed
+                        new_last = compute(last)
+                        if new_last != last or not content:
+                            os.lseek(fd, 0, os.SEEK_SET)
+                            os.ftruncate(fd, 0)
+                            os.write(fd, str(new_last).encode())
+                            os.fsync(fd)
+                        return last
+                finally:
+                    if fcntl:
+                        fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+            seed = self._seed()
+
+    def reserve(self, count: int = 1) -> range:
+        """Réserve un bloc de `count` IDs consécutifs"""
+        if count < 1:
+            raise ValueError("Le nombre d'IDs à réserver doit être positif")
+        last = self._update(lambda value: value + count)
+        return range(last + 1, last + count + 1)
+
+    def next_id(self) -> int:
+        """Réserve et retourne un seul ID"""
+        return self.reserve(1)[0]
+
+    def ensure_at_least(self, value: int):
+        """Avance la séquence si des IDs plus grands ont été écrits directement"""
+        self._update(lambda last: max(last, value))
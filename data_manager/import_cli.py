@@ -0,0 +1,28 @@
+import os
+import sys
+from typing import List
+
+from .bulk_import import iter_rows
+from .data_saver import DataSaver
+
+
+def main(argv: List[str]) -> int:
+    """Importe un fichier CSV ou JSONL et affiche le rapport ; retourne le code de sortie.
+
+    python -m data_manager.import_cli <collection> <fichier.csv|fichier.jsonl> [data/]
+    """
+    if len(argv) < 2:
+        print("Usage: python -m data_manager.import_cli <collection> <fichier.csv|fichier.jsonl> [data/]")
+        return 1
+    collection, path = argv[0], argv[1]
+    file_format = "csv" if path.endswith(".csv") else "jsonl"
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        report = DataSaver(argv[2] if len(argv) > 2 else "data/").bulk_save(collection, iter_rows(f, file_format))
+    print(f"{report['importes']} enregistrement(s) importé(s) depuis {os.path.basename(path)}, {len(report['erreurs'])} erreur(s)")
+    for error in report["erreurs"]:
+        print(f"  ligne {error['ligne']}: {error['erreur']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
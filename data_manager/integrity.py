@@ -0,0 +1,113 @@
+from typing import List, Dict, Any, Optional
+from .schema import FOREIGN_KEYS, REFERENCES, ON_DELETE, dependents
+
+DELETE_MODES = ("cascade", "restrict", "nullify")
+
+
+class IntegrityError(ValueError):
+    """Clé étrangère vers un enregistrement absent, ou suppression refusée (restrict)"""
+
+
+class DuplicateKeyError(IntegrityError):
+    """Valeur unique (email, numéro étudiant, code de cours) déjà utilisée"""
+
+
+def missing_references(store, filename: str, record: Dict[str, Any]) -> List[str]:
+    """Clés étrangères de `record` qui ne pointent vers aucun enregistrement (un get O(1) chacune)"""
+    errors = []
+    for field in FOREIGN_KEYS.get(filename, []):
+        value = record.get(field)
+        if value is not None and store.get(REFERENCES[field], value) is None:
+            errors.append(f"{field}={value} introuvable dans {REFERENCES[field]}")
+    return errors
+
+
+def check_references(store, filename: str, record: Dict[str, Any]):
+    """Lève IntegrityError si une clé étrangère de `record` est invalide.
+
+    Pour que la vérification tienne jusqu'à l'écriture, l'appeler avec l'écriture
+    dans store.exclusive(referenced_collections(filename)) : une suppression
+    (delete_with_dependents) réserve les mêmes collections et ne peut pas retirer
+    le parent entre les deux.
+    """
+    errors = missing_references(store, filename, record)
+    if errors:
+        raise IntegrityError(", ".join(errors))
+
+
+def referenced_collections(filename: str) -> List[str]:
+    """Collection d'un enregistrement et celles que ses clés étrangères référencent"""
+    collections = [filename]
+    for field in FOREIGN_KEYS.get(filename, []):
+        if REFERENCES[field] not in collections:
+            collections.append(REFERENCES[field])
+    return collections
+
+
+def plan_delete(store, filename: str, item_id: int, mode: Optional[str] = None) -> Dict[str, Dict[str, list]]:
+    """Calcule les écritures d'une suppression et de ses dépendants.
+
+    Les dépendants sont trouvés par les index de clés étrangères (O(k) par
+    niveau). `mode` (cascade, restrict ou nullify) remplace l'action par défaut
+    de schema.ON_DELETE pour toutes les relations parcourues.
+    Retourne {collection: {"put": [...], "delete": [ids]}} pour store.apply.
+    """
+    if mode is not None and mode not in DELETE_MODES:
+        raise ValueError(f"Mode de suppression inconnu: {mode} ({', '.join(DELETE_MODES)})")
+    deletes: Dict[str, Dict[Any, None]] = {}
+    puts: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+    pending = [(filename, item_id)]
+    while pending:
+        parent, parent_id = pending.pop()
+        if parent_id in deletes.setdefault(parent, {}):
+            continue
+        deletes[parent][parent_id] = None
+        for child, field in dependents(parent):
+            rows = store.find_by(child, field, parent_id)
+            if not rows:
+                continue
+            action = mode or ON_DELETE.get((child, field), "restrict")
+            if action == "restrict":
+                raise IntegrityError(f"Suppression refusée : {len(rows)} enregistrement(s) de {child} "
+                                     f"référencent {parent} (ID {parent_id})")
+            for row in rows:
+                if action == "cascade":
+                    pending.append((child, row.get('id')))
+                else:
+                    updated = puts.setdefault(child, {}).setdefault(row.get('id'), dict(row))
+                    updated[field] = None
+    changes = {}
+    for name in set(deletes) | set(puts):
+        removed = deletes.get(name, {})
+        changes[name] = {
+            "put": [r for i, r in puts.get(name, {}).items() if i not in removed],
+            "delete": list(removed),
+        }
+    return changes
+
+
+def affected_collections(filename: str) -> List[str]:
+    """Collections qu'une suppression dans `filename` peut modifier (dépendants, récursivement)"""
+    affected = [filename]
+    for parent in affected:
+        for child, _ in dependents(parent):
+            if child not in affected:
+                affected.append(child)
+    return affected
+
+
+def delete_with_dependents(store, filename: str, item_id: int, mode: Optional[str] = None) -> Optional[Dict[str, int]]:
+    """Supprime un enregistrement et traite ses dépendants en une seule écriture.
+
+    Le plan est calculé sous le verrou d'écriture des collections concernées
+    (store.exclusive) : aucun dépendant ne peut être ajouté entre le calcul
+    et l'écriture. Retourne le nombre d'enregistrements supprimés par
+    collection, ou None si l'enregistrement n'existe pas. Lève IntegrityError
+    en mode restrict.
+    """
+    with store.exclusive(affected_collections(filename)):
+        if store.get(filename, item_id) is None:
+            return None
+        changes = plan_delete(store, filename, item_id, mode)
+        store.apply(changes)
+    return {name: len(change["delete"]) for name, change in changes.items() if change["delete"]}
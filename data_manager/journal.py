@@ -0,0 +1,80 @@
+import json
+import os
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+
+class Journal:
+    """Journal append-only (JSONL) des modifications d'une collection.
+
+    Chaque ligne décrit une opération : {"op": "put", "id": 3, "record": {...}}
+    ou {"op": "delete", "id": 3}. Le journal est rejoué par-dessus le dernier
+    snapshot JSON puis vidé lors du compactage.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.first_entry_at: Optional[float] = None  # Date de la plus ancienne entrée non compactée
+
+    def append(self, op: str, item_id: Any, record: Dict[str, Any] = None):
+        """Ajoute une opération à la fin du journal"""
+        self.append_many([(op, item_id, record)])
+
+    def append_many(self, entries: List[Tuple[str, Any, Optional[Dict[str, Any]]]], durable: bool = False):
+        """Ajoute plusieurs opérations (op, id, enregistrement) en une seule écriture"""
+        lines = []
+        for op, item_id, record in entries:
+            entry = {"op": op, "id": item_id}
+            if record is not None:
+                entry["record"] = record
+            lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("".join(lines))
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        if self.first_entry_at is None:
+            self.first_entry_at = time.time()
+
+    def replay(self, by_id: Dict[Any, Dict[str, Any]]) -> int:
+        """Applique les opérations du journal sur un index {id: enregistrement}"""
+        count = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Ligne tronquée par une écriture interrompue : on l'ignore
+                        continue
+                    if entry.get("op") == "put":
+                        by_id[entry["id"]] = entry["record"]
+                    elif entry.get("op") == "delete":
+                        by_id.pop(entry["id"], None)
+                    count += 1
+        except FileNotFoundError:
+            return 0
+        if count and self.first_entry_at is None:
+            self.first_entry_at = time.time()
+        return count
+
+    def size(self) -> int:
+        """Taille du journal en octets"""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def age(self) -> float:
+        """Ancienneté (en secondes) de la plus ancienne entrée non compactée"""
+        if self.first_entry_at is None:
+            return 0.0
+        return time.time() - self.first_entry_at
+
+    def reset(self):
+        """Vide le journal après compactage"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.first_entry_at = None
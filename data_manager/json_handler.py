@@ -1,69 +1,93 @@
-import json
 import os
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Callable
+from .entity_store import EntityStore
+from .integrity import IntegrityError, check_references, referenced_collections
 
 class JsonHandler:
     def __init__(self, base_path: str = "data/"):
         self.base_path = base_path
         os.makedirs(base_path, exist_ok=True)
+        self.store = EntityStore.for_path(base_path)
     
     def read_json(self, filename: str) -> List[Dict[str, Any]]:
-        """Lit un fichier JSON et retourne les données"""
-        filepath = os.path.join(self.base_path, filename)
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        """Lit un fichier JSON (via le cache partagé) et retourne les données"""
+        return self.store.load(filename)
+    
+    def iter_json(self, filename: str, predicate: Optional[Callable] = None, **where) -> Iterator[Dict[str, Any]]:
+        """Parcourt un fichier JSON élément par élément, avec filtres optionnels"""
+        return self.store.iter_records(filename, predicate, where)
     
     def write_json(self, filename: str, data: List[Dict[str, Any]]) -> bool:
         """Écrit des données dans un fichier JSON"""
-        filepath = os.path.join(self.base_path, filename)
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self.store.write_all(filename, data)
             return True
         except Exception as e:
             print(f"Erreur écriture {filename}: {e}")
             return False
     
     def add_item(self, filename: str, item: Dict[str, Any]) -> Optional[int]:
-        """Ajoute un élément au fichier JSON et retourne son ID"""
-        data = self.read_json(filename)
+        """Ajoute un élément au fichier JSON et retourne son ID.
         
-        # Générer un nouvel ID
-        max_id = max([item.get('id', 0) for item in data]) if data else 0
-        item['id'] = max_id + 1
+        Lève IntegrityError si une clé étrangère pointe vers un enregistrement absent
+        ou si une valeur unique (email, numéro, code) est déjà utilisée. Un ID déjà
+        réservé par l'appelant (store.next_id, ex: numéro dérivé de l'ID) est conservé.
+        """
+        # Générer un nouvel ID (séquence persistante, sans parcours du fichier)
+        if item.get('id') is None:
+            item['id'] = self.store.next_id(filename)
         
-        data.append(item)
-        
-        if self.write_json(filename, data):
+        try:
+            # Vérification et écriture sous les verrous des collections référencées
+            with self.store.exclusive(referenced_collections(filename)):
+                check_references(self.store, filename, item)
+                self.store.put(filename, {'id': item['id'], **item})
             return item['id']
-        return None
+        except IntegrityError:
+            raise
+        except Exception as e:
+            print(f"Erreur écriture {filename}: {e}")
+            return None
+    
+    def add_many(self, filename: str, items: List[Dict[str, Any]]) -> List[int]:
+        """Ajoute plusieurs éléments en une seule écriture et retourne leurs ID"""
+        if not items:
+            return []
+        ids = list(self.store.reserve_ids(filename, len(items)))
+        records = [{'id': new_id, **item} for item, new_id in zip(items, ids)]
+        for item, new_id in zip(items, ids):
+            item['id'] = new_id
+        try:
+            self.store.put_many(filename, records)
+            return ids
+        except Exception as e:
+            print(f"Erreur écriture {filename}: {e}")
+            return []
     
     def get_by_id(self, filename: str, item_id: int) -> Optional[Dict[str, Any]]:
         """Récupère un élément par son ID"""
-        data = self.read_json(filename)
-        for item in data:
-            if item.get('id') == item_id:
-                return item
-        return None
+        return self.store.get(filename, item_id)
     
     def update_by_id(self, filename: str, item_id: int, updates: Dict[str, Any]) -> bool:
         """Met à jour un élément par son ID"""
-        data = self.read_json(filename)
-        for i, item in enumerate(data):
-            if item.get('id') == item_id:
-                data[i].update(updates)
-                return self.write_json(filename, data)
-        return False
+        try:
+            with self.store.exclusive(referenced_collections(filename)):
+                item = self.store.get(filename, item_id)
+                if item is None:
+                    return False
+                check_references(self.store, filename, updates)
+                self.store.put(filename, {**item, **updates})
+            return True
+        except IntegrityError:
+            raise
+        except Exception as e:
+            print(f"Erreur écriture {filename}: {e}")
+            return False
     
     def delete_by_id(self, filename: str, item_id: int) -> bool:
         """Supprime un élément par son ID"""
-        data = self.read_json(filename)
-        original_length = len(data)
-        data = [item for item in data if item.get('id') != item_id]
-        
-        if len(data) < original_length:
-            return self.write_json(filename, data)
-        return False
\ No newline at end of file
+        try:
+            return self.store.delete(filename, item_id)
+        except Exception as e:
+            print(f"Erreur écriture {filename}: {e}")
+            return False
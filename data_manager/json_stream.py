@@ -0,0 +1,80 @@
+import json
+from typing import Iterator, Dict, Any, Callable, Optional
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+
+
+def matches(record: Dict[str, Any], predicate: Optional[Callable] = None, where: Dict[str, Any] = None) -> bool:
+    """Vérifie un enregistrement contre des filtres d'égalité et un prédicat"""
+    if where:
+        for field, value in where.items():
+            if record.get(field) != value:
+                return False
+    return predicate is None or predicate(record)
+
+
+def iter_json_array(path: str, predicate: Optional[Callable] = None, where: Dict[str, Any] = None,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Parcourt un fichier contenant un tableau JSON élément par élément.
+
+    Le fichier est lu par blocs de `chunk_size` caractères : la mémoire utilisée
+    ne dépend que de la taille d'un élément, pas de celle du fichier. Les filtres
+    (`where` = égalités champ/valeur, `predicate`) sont appliqués pendant la
+    lecture ; arrêter l'itération arrête la lecture du fichier.
+    """
+    decoder = json.JSONDecoder()
+    try:
+        f = open(path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            """Ajoute un bloc au buffer (en oubliant la partie déjà lue)"""
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        def skip(chars: str) -> str:
+            """Avance après les caractères ignorés, retourne le suivant ('' en fin de fichier)"""
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not fill():
+                    return ""
+
+        if skip(_WHITESPACE) != "[":
+            return
+        pos += 1
+
+        while True:
+            char = skip(_WHITESPACE + ",")
+            if char in ("]", ""):
+                return
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Élément coupé par la fin du bloc : on lit la suite
+                    if eof or not fill():
+                        return
+                    continue
+                if (end == len(buffer) or buffer[end] not in _WHITESPACE + ",]") and not eof and fill():
+                    # Un nombre coupé en fin de bloc est décodé trop tôt : on relit
+                    continue
+                pos = end
+                break
+            if matches(item, predicate, where):
+                yield item
@@ -0,0 +1,143 @@
+from typing import List, Dict, Any, Optional
+from .distribution import NOTE_MAX, RESOLUTION
+
+_SIZE = int(NOTE_MAX * RESOLUTION) + 1  # Scores possibles : 0.00 à 20.00
+
+
+class Leaderboard:
+    """Classement d'étudiants par score (0–20, au centième), avec rang et top-k en O(log n).
+
+    Un arbre de Fenwick compte les étudiants par score, du plus haut au plus
+    bas : le rang d'un étudiant est 1 + le nombre de scores strictement
+    supérieurs (ex aequo au même rang), et le k-ième score se trouve par
+    descente dans l'arbre. Un changement de score coûte deux mises à jour.
+    """
+
+    def __init__(self):
+        self.tree = [0] * (_SIZE + 1)
+        self.scores: Dict[Any, int] = {}
+        self.members: Dict[int, set] = {}
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    @staticmethod
+    def _position(key: int) -> int:
+        return _SIZE - key  # 1 pour 20.00, _SIZE pour 0.00
+
+    def _update(self, key: int, delta: int):
+        i = self._position(key)
+        while i <= _SIZE:
+            self.tree[i] += delta
+            i += i & -i
+
+    def _before(self, key: int) -> int:
+        """Nombre de scores strictement supérieurs à key"""
+        i, total = self._position(key) - 1, 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _key_at(self, order: int) -> int:
+        """Score du order-ième étudiant (0 = meilleur)"""
+        i, remaining, step = 0, order + 1, 1 << _SIZE.bit_length()
+        while step:
+            if i + step <= _SIZE and self.tree[i + step] < remaining:
+                i += step
+                remaining -= self.tree[i]
+            step >>= 1
+        return _SIZE - (i + 1)
+
+    def set(self, member, score: float):
+        key = round(min(max(score, 0.0), NOTE_MAX) * RESOLUTION)
+        old = self.scores.get(member)
+        if old == key:
+            return
+        if old is not None:
+            self.remove(member)
+        self.scores[member] = key
+        self.members.setdefault(key, set()).add(member)
+        self._update(key, 1)
+
+    def remove(self, member):
+        key = self.scores.pop(member, None)
+        if key is None:
+            return
+        self._update(key, -1)
+        self.members[key].discard(member)
+        if not self.members[key]:
+            del self.members[key]
+
+    def rank(self, member) -> Optional[Dict[str, Any]]:
+        key = self.scores.get(member)
+        if key is None:
+            return None
+        return {"rang": self._before(key) + 1, "sur": len(self.scores), "score": key / RESOLUTION}
+
+    def top(self, k: int = 10) -> List[Dict[str, Any]]:
+        """Les k premiers (les ex aequo du k-ième sont inclus), du meilleur au moins bon"""
+        results = []
+        order = 0
+        while order < min(k, len(self.scores)):
+            key = self._key_at(order)
+            tied = sorted(self.members[key], key=str)
+            results.extend({"rang": order + 1, "membre": member, "score": key / RESOLUTION} for member in tied)
+            order += len(tied)
+        return results
+
+
+def _leaderboard(boards: Dict[Any, Leaderboard], key) -> Leaderboard:
+    """Classement d'une clé, créé seulement s'il manque (setdefault en allouerait un par note)"""
+    leaderboard = boards.get(key)
+    if leaderboard is None:
+        leaderboard = boards[key] = Leaderboard()
+    return leaderboard
+
+
+class Rankings:
+    """Classements des étudiants par évaluation (leur note) et par cours (moyenne pondérée).
+
+    Tenus à jour note par note avec les mêmes règles que GradeEngine : plusieurs
+    notes d'un étudiant dans une évaluation sont moyennées, et la moyenne d'un
+    cours pondère chaque note par le coefficient de son évaluation.
+    """
+
+    def __init__(self):
+        self.evaluation_totals: Dict[Any, Dict[Any, list]] = {}  # {evaluation: {etudiant: [somme, nombre]}}
+        self.cours_totals: Dict[Any, Dict[Any, list]] = {}  # {cours: {etudiant: [somme pondérée, poids, nombre]}}
+        self.evaluations: Dict[Any, Leaderboard] = {}
+        self.cours: Dict[Any, Leaderboard] = {}
+
+    def _add_cours(self, cours_id, etudiant_id, somme: float, poids: float, nombre: int):
+        totals = self.cours_totals.setdefault(cours_id, {}).setdefault(etudiant_id, [0.0, 0.0, 0])
+        totals[0] += somme
+        totals[1] += poids
+        totals[2] += nombre
+        leaderboard = _leaderboard(self.cours, cours_id)
+        if totals[2] <= 0 or totals[1] <= 0:
+            del self.cours_totals[cours_id][etudiant_id]
+            leaderboard.remove(etudiant_id)
+        else:
+            leaderboard.set(etudiant_id, totals[0] / totals[1])
+
+    def add_note(self, etudiant_id, evaluation_id, valeur: float, sign: int, cours_id, coefficient: float):
+        totals = self.evaluation_totals.setdefault(evaluation_id, {}).setdefault(etudiant_id, [0.0, 0])
+        totals[0] += sign * valeur
+        totals[1] += sign
+        leaderboard = _leaderboard(self.evaluations, evaluation_id)
+        if totals[1] <= 0:
+            del self.evaluation_totals[evaluation_id][etudiant_id]
+            leaderboard.remove(etudiant_id)
+        else:
+            leaderboard.set(etudiant_id, totals[0] / totals[1])
+        if cours_id is not None:
+            self._add_cours(cours_id, etudiant_id, sign * coefficient * valeur, sign * coefficient, sign)
+
+    def move_evaluation(self, evaluation_id, old_cours, new_cours, old_coefficient: float, new_coefficient: float):
+        """Report des notes d'une évaluation qui change de cours ou de coefficient"""
+        for etudiant_id, (somme, nombre) in self.evaluation_totals.get(evaluation_id, {}).items():
+            if old_cours is not None:
+                self._add_cours(old_cours, etudiant_id, -old_coefficient * somme, -old_coefficient * nombre, -nombre)
+            if new_cours is not None:
+                self._add_cours(new_cours, etudiant_id, new_coefficient * somme, new_coefficient * nombre, nombre)
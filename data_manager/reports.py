@@ -0,0 +1,497 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from entities.note import Note
+from .aggregates import COLLECTIONS
+from .grades import GradeEngine
+from .transcripts import build_transcript
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas d'élection entre processus
+    fcntl = None
+
+REPORT_DIR = "reports"
+
+
+class ReportCancelled(Exception):
+    """Levée par un rapport dont l'exécution a été annulée"""
+
+
+def _check(cancel: threading.Event):
+    if cancel.is_set():
+        raise ReportCancelled()
+
+
+def _numeric(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _normalized(signature):
+    """Signature telle que relue depuis un fichier meta (tuples -> listes)"""
+    return json.loads(json.dumps(signature, default=str))
+
+
+def _writes_between(old, new, coordinated: bool) -> int:
+    """Nombre d'écritures entre deux signatures normalisées d'une collection.
+
+    Exact pour les compteurs partagés (version SQLite, [inode, génération] du
+    coordinateur) ; 1 pour une signature de fichiers, qui ne dit pas combien.
+    """
+    if old == new:
+        return 0
+    if isinstance(old, int) and isinstance(new, int) and new > old:
+        return new - old
+    if (coordinated and isinstance(old, list) and isinstance(new, list) and len(old) == len(new) == 2
+            and old[0] == new[0] and isinstance(old[1], int) and isinstance(new[1], int) and new[1] > old[1]):
+        return new[1] - old[1]
+    return 1
+
+
+# Rapports de fin de période (lus dans un snapshot du store)
+
+def rapport_bulletins(store, cancel: threading.Event) -> Dict[str, Any]:
+    """Bulletin de chaque étudiant"""
+    bulletins = {}
+    for etudiant in store.iter_records("etudiants.json"):
+        _check(cancel)
+        built = build_transcript(store, etudiant.get('id'))
+        if built is not None:
+            bulletins[str(etudiant.get('id'))] = built[0]
+    return {"nombre": len(bulletins), "bulletins": bulletins}
+
+
+def rapport_moyennes_cours(store, cancel: threading.Event) -> List[Dict[str, Any]]:
+    """Moyenne pondérée et nombre de notes de chaque cours"""
+    par_cours = GradeEngine.for_store(store).par_cours()
+    _check(cancel)
+    return [{"cours_id": cours.get('id'), "code": cours.get('code'), "nom": cours.get('nom'),
+             "professeur_id": cours.get('professeur_id'),
+             **par_cours.get(cours.get('id'), {"moyenne": None, "nombre_notes": 0})}
+            for cours in store.iter_records("cours.json")]
+
+
+def rapport_taux_reussite(store, cancel: threading.Event) -> Dict[str, Any]:
+    """Part de notes réussies (Note.est_reussie) par évaluation, par cours et au total"""
+    evaluation_cours = {e.get('id'): e.get('cours_id') for e in store.iter_records("evaluations.json")}
+    totals: Dict[str, Dict[Any, list]] = {"evaluations": {}, "cours": {}, "global": {}}
+    for i, note in enumerate(store.iter_records("notes.json")):
+        if i % 1000 == 0:
+            _check(cancel)
+        if not _numeric(note.get('valeur')):
+            continue
+        reussie = Note.from_dict(note).est_reussie()
+        keys = (("evaluations", note.get('evaluation_id')), ("cours", evaluation_cours.get(note.get('evaluation_id'))),
+                ("global", None))
+        for dimension, key in keys:
+            if dimension == "cours" and key is None:
+                continue
+            counts = totals[dimension].setdefault(key, [0, 0])
+            counts[0] += 1
+            counts[1] += reussie
+
+    def resume(nombre: int, reussies: int) -> Dict[str, Any]:
+        return {"nombre_notes": nombre, "reussies": reussies, "taux": round(reussies / nombre, 3) if nombre else None}
+
+    return {
+        "global": resume(*totals["global"].get(None, (0, 0))),
+        "cours": [{"cours_id": k, **resume(*v)} for k, v in sorted(totals["cours"].items(), key=lambda i: str(i[0]))],
+        "evaluations": [{"evaluation_id": k, **resume(*v)}
+                        for k, v in sorted(totals["evaluations"].items(), key=lambda i: str(i[0]))],
+    }
+
+
+REPORTS: Dict[str, Tuple[Callable, Tuple[str, ...]]] = {
+    "bulletins": (rapport_bulletins, ("etudiants.json", "notes.json", "evaluations.json", "cours.json", "professeurs.json")),
+    "moyennes_cours": (rapport_moyennes_cours, ("notes.json", "evaluations.json", "cours.json")),
+    "taux_reussite": (rapport_taux_reussite, ("notes.json", "evaluations.json")),
+}
+
+
+class _Job:
+    """Rapport enregistré : cadence, seuil de changements et dernière exécution"""
+
+    def __init__(self, name: str, func: Callable, sources: Tuple[str, ...],
+                 interval: Optional[float], change_threshold: Optional[int]):
+        self.name = name
+        self.func = func
+        self.sources = sources
+        self.interval = interval
+        self.change_threshold = change_threshold
+        self.changes = 0  # Écritures des sources depuis la dernière version
+        self.seen: Dict[str, Any] = {}  # Signatures normalisées des sources déjà comptées dans changes
+        self.last_run: Optional[float] = None  # time.monotonic() de la dernière version
+        self.future: Optional[Future] = None
+        self.cancel = threading.Event()
+        self.state = "jamais_execute"
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+
+    def running(self) -> bool:
+        return self.future is not None and not self.future.done()
+
+
+class ReportScheduler:
+    """Exécute en arrière-plan les rapports coûteux et les publie en fichiers versionnés.
+
+    Chaque rapport est recalculé à sa cadence (s'il y a eu des écritures depuis
+    la dernière version) ou dès que ses collections sources ont reçu
+    change_threshold écritures. Les exécutions passent par un pool de
+    REPORT_MAX_CONCURRENT threads, lisent un snapshot du store et peuvent être
+    annulées. Le résultat est écrit dans data/reports/<rapport>/<version>.json
+    (les REPORT_KEEP dernières versions sont conservées) : les endpoints servent
+    ce fichier tel quel, sans recalcul. Au redémarrage, une version dont les
+    signatures des sources sont inchangées n'est pas recalculée.
+    Les écritures des autres processus ne produisent pas d'événement ici : à
+    chaque tick, les signatures des sources sont comparées aux dernières
+    comptées, et l'écart est ajouté aux écritures du rapport.
+    Un seul processus par dossier de rapports fait tourner la boucle (verrou
+    fcntl pris par start) : les autres workers de l'API ne font que servir.
+    """
+
+    _attach_lock = threading.Lock()
+
+    def __init__(self, store, directory: str = None, max_concurrent: int = None, keep: int = None,
+                 tick: float = 1.0):
+        self.store = store
+        self.directory = directory or os.environ.get("REPORT_DIR") or os.path.join(store.data_path, REPORT_DIR)
+        self.max_concurrent = max_concurrent or int(os.environ.get("REPORT_MAX_CONCURRENT", 2))
+        self.keep = keep or int(os.environ.get("REPORT_KEEP", 5))
+        self.tick = tick
+        self._jobs: Dict[str, _Job] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._wake = threading.Event()
+        self._leader_fd: Optional[int] = None
+        self._coordinated = getattr(store, "coordinator", None) is not None
+        store.add_listener(self._on_events)
+
+    @classmethod
+    def for_store(cls, store) -> "ReportScheduler":
+        """Planificateur partagé d'un store, avec les rapports de REPORTS enregistrés"""
+        with cls._attach_lock:
+            scheduler = getattr(store, "reports", None)
+            if scheduler is None:
+                scheduler = store.reports = cls(store)
+                interval = float(os.environ.get("REPORT_INTERVAL", 3600)) or None
+                threshold = int(os.environ.get("REPORT_CHANGE_THRESHOLD", 1000)) or None
+                for name, (func, sources) in REPORTS.items():
+                    scheduler.register(name, func, sources, interval, threshold)
+            return scheduler
+
+    def register(self, name: str, func: Callable, sources: Tuple[str, ...] = tuple(COLLECTIONS),
+                 interval: float = None, change_threshold: int = None):
+        """Enregistre un rapport : func(store, cancel) retourne des données sérialisables en JSON"""
+        job = _Job(name, func, tuple(sources), interval, change_threshold)
+        path = self.path(name)
+        if path is not None:
+            # Reprise : la cadence continue depuis la dernière version ; les écritures faites
+            # depuis (signatures des sources de sa meta) sont comptées au premier tick
+            job.last_run = time.monotonic() - max(time.time() - os.path.getmtime(path), 0.0)
+            job.state = "termine"
+            job.seen = dict((self.meta(name) or {}).get("sources") or {})
+        else:
+            job.seen = {filename: _normalized(signature) for filename, signature in self._signatures(job.sources).items()}
+        with self._lock:
+            self._jobs[name] = job
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._jobs)
+
+    def _signatures(self, sources) -> Dict[str, Any]:
+        return {filename: self.store.signature(filename) for filename in sources}
+
+    def _on_events(self, events: List[Dict[str, Any]]):
+        # Sous le verrou d'écriture du store : les signatures lues ici sont celles de cette écriture
+        filenames = [f"{e['collection']}.json" for e in events]
+        signatures = self._signatures({filename for filename in filenames if filename in self._sources()})
+        with self._lock:
+            for job in self._jobs.values():
+                for filename in set(filenames).intersection(job.sources):
+                    # Écriture d'un autre processus pas encore comptée : l'écart sera compté au tick
+                    if job.seen.get(filename) == _normalized(self.store.signature_before(filename)):
+                        job.seen[filename] = _normalized(signatures[filename])
+                        job.changes += filenames.count(filename)
+                if job.change_threshold and job.changes >= job.change_threshold:
+                    self._wake.set()
+
+    def _sources(self) -> set:
+        with self._lock:
+            return {filename for job in self._jobs.values() for filename in job.sources}
+
+    def _count_external_writes(self):
+        """Ajoute aux rapports les écritures des autres processus (écart de signature depuis le dernier comptage)"""
+        with self.store.without_writes():  # Aucun événement local entre la lecture et la comparaison
+            current = {filename: _normalized(signature)
+                       for filename, signature in self._signatures(self._sources()).items()}
+            with self._lock:
+                for job in self._jobs.values():
+                    for filename in job.sources:
+                        if job.seen.get(filename) != current[filename]:
+                            job.changes += _writes_between(job.seen.get(filename), current[filename],
+                                                           self._coordinated)
+                            job.seen[filename] = current[filename]
+
+    # Exécution
+
+    def _due(self) -> List[str]:
+        self._count_external_writes()
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for job in self._jobs.values():
+                if job.running():
+                    continue
+                if job.last_run is None:
+                    due.append(job.name)
+                elif job.change_threshold and job.changes >= job.change_threshold:
+                    due.append(job.name)
+                elif job.interval and job.changes and now - job.last_run >= job.interval:
+                    due.append(job.name)
+        return due
+
+    def submit(self, name: str) -> Future:
+        """Lance un rapport (ou retourne l'exécution déjà en cours) ; KeyError si inconnu"""
+        with self._lock:
+            job = self._jobs[name]
+            if job.running():
+                return job.future
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="report")
+            job.cancel = threading.Event()
+            job.state = "en_attente"
+            job.future = self._executor.submit(self._execute, job, job.cancel)
+            return job.future
+
+    def run(self, name: str) -> Optional[Dict[str, Any]]:
+        """Exécute un rapport et attend sa nouvelle version (None si annulé ou en erreur)"""
+        return self.submit(name).result()
+
+    def _execute(self, job: _Job, cancel: threading.Event) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if cancel.is_set():
+                job.state = "annule"
+                return None
+            job.state = "en_cours"
+            changes = job.changes
+        start = time.perf_counter()
+        try:
+            with self.store.snapshot():
+                signatures = self._signatures(job.sources)
+                data = job.func(self.store, cancel)
+            _check(cancel)
+            duration = time.perf_counter() - start
+            meta = self._write(job.name, data, signatures, duration)
+        except ReportCancelled:
+            with self._lock:
+                job.state = "annule"
+            return None
+        except Exception as e:
+            print(f"❌ Erreur du rapport {job.name}: {e}")
+            with self._lock:
+                job.state, job.error = "erreur", str(e)
+                job.last_run = time.monotonic()  # Nouvel essai à la prochaine échéance, pas à chaque tick
+            return None
+        with self._lock:
+            job.changes = max(job.changes - changes, 0)  # Les écritures pendant le calcul comptent pour la suivante
+            job.last_run = time.monotonic()
+            job.state, job.error, job.duration = "termine", None, duration
+        return meta
+
+    def cancel(self, name: str) -> bool:
+        """Annule l'exécution en attente ou en cours d'un rapport (True si une exécution est annulée)"""
+        with self._lock:
+            job = self._jobs[name]
+            if not job.running():
+                return False
+            job.cancel.set()
+            if job.future.cancel():
+                job.state = "annule"
+            return True
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            for name in self._due():
+                self.submit(name)
+            self._wake.wait(self.tick)
+            self._wake.clear()
+
+    def _elect(self) -> bool:
+        """Prend (sans attendre) le verrou du dossier de rapports : un seul planificateur par dossier"""
+        if fcntl is None or self._leader_fd is not None:
+            return True
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, ".scheduler.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        return True
+
+    def start(self) -> bool:
+        """Démarre la boucle de planification (thread daemon).
+
+        Retourne False si un autre processus fait déjà tourner le planificateur
+        de ce dossier (ex: autre worker uvicorn) : il n'est alors pas démarré.
+        """
+        if not self._elect():
+            print(f"Planificateur de rapports déjà actif dans un autre processus ({self.directory})")
+            return False
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="report-scheduler")
+            self._thread.start()
+        return True
+
+    def stop(self, wait: bool = True):
+        """Arrête la boucle et annule les rapports en attente ou en cours"""
+        self._stopping.set()
+        self._wake.set()
+        with self._lock:
+            names = list(self._jobs)
+        for name in names:
+            self.cancel(name)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)  # Libère le verrou : un autre processus peut prendre le relais
+            self._leader_fd = None
+
+    # Versions sur disque
+
+    def _path(self, name: str, version: int) -> str:
+        return os.path.join(self.directory, name, f"{version:06d}.json")
+
+    def versions(self, name: str) -> List[int]:
+        """Numéros des versions conservées d'un rapport, de la plus ancienne à la plus récente"""
+        try:
+            files = os.listdir(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            return []
+        return sorted(int(f[:-5]) for f in files if f.endswith(".json") and f[:-5].isdigit())
+
+    def path(self, name: str, version: int = None) -> Optional[str]:
+        """Fichier d'une version (la dernière par défaut), None s'il n'existe pas"""
+        if version is None:
+            versions = self.versions(name)
+            if not versions:
+                return None
+            version = versions[-1]
+        path = self._path(name, version)
+        return path if os.path.exists(path) else None
+
+    def _read_json(self, path: Optional[str]) -> Optional[Dict[str, Any]]:
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def read(self, name: str, version: int = None) -> Optional[Dict[str, Any]]:
+        """Contenu complet d'une version (la dernière par défaut)"""
+        return self._read_json(self.path(name, version))
+
+    def meta(self, name: str, version: int = None) -> Optional[Dict[str, Any]]:
+        """En-tête d'une version (numéro, date, durée, signatures des sources) sans lire les données"""
+        path = self.path(name, version)
+        return self._read_json(path[:-5] + ".meta.json" if path else None)
+
+    def _write(self, name: str, data: Any, signatures: Dict[str, Any], duration: float) -> Dict[str, Any]:
+        """Écrit une nouvelle version (numéro suivant, jamais écrasée) et purge les plus anciennes"""
+        os.makedirs(os.path.join(self.directory, name), exist_ok=True)
+        tmp_path = os.path.join(self.directory, name, f".{os.getpid()}.{threading.get_ident()}.tmp")
+        version = (self.versions(name) or [0])[-1] + 1
+        meta = {"rapport": name, "version": version, "genere_le": datetime.now().isoformat(),
+                "duree_s": round(duration, 3), "sources": signatures}
+        while True:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({**meta, "donnees": data}, f, ensure_ascii=False, default=str)
+            try:
+                # Un lien échoue si la version existe (autre processus) : le fichier publié est toujours complet
+                os.link(tmp_path, self._path(name, version))
+                break
+            except FileExistsError:
+                version += 1
+                meta["version"] = version
+            finally:
+                os.remove(tmp_path)
+        meta_path = self._path(name, version)[:-5] + ".meta.json"
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, default=str)
+        os.replace(meta_path + ".tmp", meta_path)
+        for old in self.versions(name)[:-self.keep]:
+            for path in (self._path(name, old), self._path(name, old)[:-5] + ".meta.json"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return meta
+
+    def status(self) -> List[Dict[str, Any]]:
+        """État de chaque rapport : exécution, dernière version, écritures depuis, cadence"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+            states = [(job, job.state, job.error, job.changes, job.duration) for job in jobs]
+        results = []
+        for job, state, error, changes, duration in states:
+            versions = self.versions(job.name)
+            results.append({
+                "rapport": job.name,
+                "description": (job.func.__doc__ or "").strip(),
+                "etat": state,
+                "erreur": error,
+                "derniere_version": versions[-1] if versions else None,
+                "duree_s": round(duration, 3) if duration is not None else None,
+                "ecritures_depuis": changes,
+                "intervalle_s": job.interval,
+                "seuil_ecritures": job.change_threshold,
+            })
+        return results
+
+
+if __name__ == "__main__":
+    import sys
+    from .data_loader import DataLoader
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    scheduler = ReportScheduler.for_store(DataLoader(args[0] if args else "data/").store)
+    if "--watch" in sys.argv:
+        if not scheduler.start():
+            sys.exit(1)
+        print(f"Planificateur de rapports démarré ({scheduler.directory}), Ctrl+C pour arrêter")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            scheduler.stop()
+        sys.exit(0)
+    names = args[1:] or list(REPORTS)
+    unknown = [name for name in names if name not in REPORTS]
+    if unknown:
+        print(f"Rapport(s) inconnu(s): {', '.join(unknown)} (disponibles: {', '.join(REPORTS)})")
+        print("Usage: python -m data_manager.reports [data/] [rapport ...] [--watch]")
+        sys.exit(1)
+    futures = {name: scheduler.submit(name) for name in names}
+    for name, future in futures.items():
+        meta = future.result()
+        if meta is None:
+            print(f"❌ {name}: échec")
+        else:
+            print(f"✅ {name}: version {meta['version']} en {meta['duree_s']} s -> {scheduler.path(name, meta['version'])}")
+    scheduler.stop()
@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import Optional
+
+# Description des collections du système : clés étrangères indexées par le data_manager
+
+FOREIGN_KEYS = {
+    "professeurs.json": [],
+    "etudiants.json": [],
+    "cours.json": ["professeur_id"],
+    "evaluations.json": ["cours_id"],
+    "notes.json": ["etudiant_id", "evaluation_id"],
+    "reviews.json": ["cours_id", "etudiant_id"],
+}
+
+# Champs à valeur unique (comparaison insensible à la casse et aux espaces)
+UNIQUE_KEYS = {
+    "professeurs.json": ["email"],
+    "etudiants.json": ["numero_etudiant", "email"],
+    "cours.json": ["code"],
+}
+
+
+def unique_key(value):
+    """Forme normalisée d'une valeur unique ('  E2024001 ' et 'e2024001' sont égales)"""
+    return value.strip().casefold() if isinstance(value, str) else value
+
+
+# Champ daté indexé (index trié) dans toutes les collections
+TIME_FIELD = "date_creation"
+
+
+def date_key(value) -> Optional[datetime]:
+    """Date comparable d'une valeur ISO (ou datetime), None si illisible"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def date_bound(value) -> Optional[datetime]:
+    """Borne d'un filtre de date (None si absente), ValueError si illisible"""
+    if value is None or value == "":
+        return None
+    key = date_key(value)
+    if key is None:
+        raise ValueError(f"Date invalide: {value} (format ISO attendu, ex: 2024-09-01)")
+    return key
+
+
+# Collection référencée par chaque clé étrangère
+REFERENCES = {
+    "professeur_id": "professeurs.json",
+    "etudiant_id": "etudiants.json",
+    "cours_id": "cours.json",
+    "evaluation_id": "evaluations.json",
+}
+
+# Action par défaut à la suppression de l'enregistrement référencé : cascade, restrict ou nullify
+ON_DELETE = {
+    ("cours.json", "professeur_id"): "nullify",
+    ("evaluations.json", "cours_id"): "cascade",
+    ("notes.json", "etudiant_id"): "cascade",
+    ("notes.json", "evaluation_id"): "cascade",
+    ("reviews.json", "cours_id"): "cascade",
+    ("reviews.json", "etudiant_id"): "cascade",
+}
+
+
+def dependents(filename: str):
+    """(collection, clé étrangère) des enregistrements qui référencent `filename`"""
+    return [(child, field) for child, fields in FOREIGN_KEYS.items()
+            for field in fields if REFERENCES.get(field) == filename]
@@ -0,0 +1,334 @@
+import json
+import os
+import re
+from heapq import merge
+from itertools import chain
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Callable
+from .entity_store import EntityStore
+from .schema import TIME_FIELD, date_key
+
+MANIFEST = "manifest.json"
+LEGACY_SUFFIX = ".avant-sharding"
+
+
+class ShardedStore(EntityStore):
+    """EntityStore dont les notes et les reviews sont réparties en plusieurs fichiers.
+
+    notes/ est découpé par evaluation_id (ou par cours_id avec NOTES_SHARD_KEY=cours_id)
+    et reviews/ par cours_id. Un manifest (ex: data/notes/manifest.json) associe chaque
+    valeur de la clé à son fichier. Une écriture ne touche que son shard, une requête
+    par clé ne lit que le sien, et load("notes.json") retourne toujours la vue fusionnée.
+    Activé avec DATA_SHARDING=1 ; le fichier non découpé existant est importé au
+    premier accès puis renommé en `<collection>.json.avant-sharding`.
+    Avec NOTES_SHARD_KEY=cours_id, une évaluation qui change de cours déplace ses
+    notes vers le shard du nouveau cours dans la même écriture.
+    """
+
+    def __init__(self, data_path: str = "data/", journal: bool = None):
+        super().__init__(data_path, journal)
+        self.shard_keys = {
+            "notes.json": os.environ.get("NOTES_SHARD_KEY", "evaluation_id"),
+            "reviews.json": "cours_id",
+        }
+        self._manifests: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+        self._locations: Dict[str, Dict[Any, str]] = {}  # {id: shard} par collection
+        self._locations_signature: Dict[str, Any] = {}
+        self._moving: Dict[Any, Any] = {}  # {evaluation_id: nouveau cours_id} pendant une écriture qui les déplace
+
+    # Manifest et choix du shard
+
+    def _directory(self, filename: str) -> str:
+        return filename[:-5]
+
+    def _manifest_path(self, filename: str) -> str:
+        return self._file_path(os.path.join(self._directory(filename), MANIFEST))
+
+    def _manifest(self, filename: str) -> Dict[str, Any]:
+        """Manifest {cle, shards: {valeur: fichier}}, créé (et migré) au premier accès"""
+        path = self._manifest_path(filename)
+        signature = self._stat(path)
+        cached = self._manifests.get(filename)
+        if cached is not None and signature is not None and cached[0] == signature:
+            return cached[1]
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                self._manifests[filename] = (signature, manifest)
+            except FileNotFoundError:
+                manifest = self._create_manifest(filename)
+            return manifest
+
+    def _save_manifest(self, filename: str, manifest: Dict[str, Any]):
+        path = self._manifest_path(filename)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        self._manifests[filename] = (self._stat(path), manifest)
+
+    def _create_manifest(self, filename: str) -> Dict[str, Any]:
+        """Crée le dossier des shards et y importe le fichier non découpé s'il existe"""
+        os.makedirs(self._file_path(self._directory(filename)), exist_ok=True)
+        manifest = {"cle": self.shard_keys[filename], "shards": {}}
+        self._manifests[filename] = (None, manifest)
+        legacy_path = self._file_path(filename)
+        if os.path.exists(legacy_path):
+            records = list(super()._read_file(filename).values())
+            self._write_partitions(filename, manifest, records)
+            os.replace(legacy_path, legacy_path + LEGACY_SUFFIX)
+        self._save_manifest(filename, manifest)
+        return manifest
+
+    def _shard_value(self, filename: str, key: str, record: Dict[str, Any]):
+        if filename == "notes.json" and key == "cours_id":
+            # Clé dérivée : cours de l'évaluation de la note (celui en cours d'écriture s'il change)
+            if record.get("evaluation_id") in self._moving:
+                return self._moving[record.get("evaluation_id")]
+            evaluation = self.get("evaluations.json", record.get("evaluation_id"))
+            return evaluation.get("cours_id") if evaluation else None
+        return record.get(key)
+
+    def _shard_name(self, filename: str, key: str, value) -> str:
+        suffix = re.sub(r'\W', '_', str(value)) if value is not None else "none"
+        return f"{self._directory(filename)}/{key.replace('_id', '')}_{suffix}.json"
+
+    def _shard_for(self, filename: str, manifest: Dict[str, Any], value) -> str:
+        """Fichier du shard d'une valeur de clé (ajouté au manifest si nouveau)"""
+        shard = manifest["shards"].get(str(value))
+        if shard is None:
+            shard = self._shard_name(filename, manifest["cle"], value)
+            manifest["shards"][str(value)] = shard
+            self._save_manifest(filename, manifest)
+        return shard
+
+    def _shards(self, filename: str) -> List[str]:
+        return list(self._manifest(filename)["shards"].values())
+
+    def _shards_for_filter(self, filename: str, field: str, value) -> List[str]:
+        """Shards à lire pour un filtre field == value (un seul si c'est la clé)"""
+        manifest = self._manifest(filename)
+        key = manifest["cle"]
+        if field == key and not (filename == "notes.json" and key == "cours_id"):
+            shard = manifest["shards"].get(str(value))
+            return [shard] if shard else []
+        if filename == "notes.json" and key == "cours_id" and field == "evaluation_id":
+            cours_id = self._shard_value(filename, key, {"evaluation_id": value})
+            shard = manifest["shards"].get(str(cours_id))
+            return [shard] if shard else []
+        return list(manifest["shards"].values())
+
+    def _write_partitions(self, filename: str, manifest: Dict[str, Any], records: List[Dict[str, Any]]):
+        """Réécrit tous les shards d'une collection à partir d'une liste complète"""
+        partitions: Dict[str, List[Dict[str, Any]]] = {shard: [] for shard in manifest["shards"].values()}
+        locations = {}
+        for record in records:
+            value = self._shard_value(filename, manifest["cle"], record)
+            shard = manifest["shards"].setdefault(str(value), self._shard_name(filename, manifest["cle"], value))
+            partitions.setdefault(shard, []).append(record)
+            locations[record.get('id')] = shard
+        for shard, partition in partitions.items():
+            self._replace_file(shard, partition)
+        self._locations[filename] = locations
+        self._locations_signature[filename] = self._shards_signature(filename, manifest)
+
+    # Localisation d'un ID
+
+    def _shards_signature(self, filename: str, manifest: Dict[str, Any] = None) -> Tuple:
+        manifest = manifest or self._manifest(filename)
+        return tuple(self._freshness(shard) for shard in manifest["shards"].values())
+
+    def _locate(self, filename: str, item_id) -> Optional[str]:
+        """Shard contenant un ID (table {id: shard} reconstruite si les shards ont changé)"""
+        locations = self._locations.get(filename)
+        shard = locations.get(item_id) if locations is not None else None
+        if shard is not None and super().get(shard, item_id) is not None:
+            return shard
+        signature = self._shards_signature(filename)
+        if locations is None or self._locations_signature.get(filename) != signature:
+            with self._lock:
+                locations = {}
+                for shard in self._shards(filename):
+                    for record_id in self._current(shard).by_id:
+                        locations[record_id] = shard
+                self._locations[filename] = locations
+                self._locations_signature[filename] = signature
+        return locations.get(item_id)
+
+    # Interface EntityStore
+
+    def signature(self, filename: str) -> Optional[Tuple]:
+        if filename not in self.shard_keys:
+            return super().signature(filename)
+        shards = self._manifest(filename)["shards"].values()
+        return (self._stat(self._manifest_path(filename)),
+                tuple(EntityStore.signature(self, shard) for shard in shards))
+
+    def load(self, filename: str) -> List[Dict[str, Any]]:
+        if filename not in self.shard_keys:
+            return super().load(filename)
+        records = []
+        for shard in self._shards(filename):
+            records.extend(super().load(shard))
+        return records
+
+    def iter_records(self, filename: str, predicate: Optional[Callable] = None,
+                     where: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        base_iter = super().iter_records
+        if filename not in self.shard_keys:
+            return base_iter(filename, predicate, where)
+        shards = self._shards(filename)
+        for field, value in (where or {}).items():
+            selected = self._shards_for_filter(filename, field, value)
+            if len(selected) < len(shards):
+                shards = selected
+                break
+        return chain.from_iterable(base_iter(shard, predicate, where) for shard in shards)
+
+    def get(self, filename: str, item_id: int) -> Optional[Dict[str, Any]]:
+        if filename not in self.shard_keys:
+            return super().get(filename, item_id)
+        shard = self._locate(filename, item_id)
+        return super().get(shard, item_id) if shard else None
+
+    def find_by(self, filename: str, field: str, value) -> List[Dict[str, Any]]:
+        if filename not in self.shard_keys:
+            return super().find_by(filename, field, value)
+        records = []
+        for shard in self._shards_for_filter(filename, field, value):
+            records.extend(super().find_by(shard, field, value))
+        return records
+
+    def created_between(self, filename: str, after=None, before=None) -> List[Dict[str, Any]]:
+        if filename not in self.shard_keys:
+            return super().created_between(filename, after, before)
+        base_created_between = super().created_between
+        parts = [base_created_between(shard, after, before) for shard in self._shards(filename)]
+        return list(merge(*parts, key=lambda r: date_key(r.get(TIME_FIELD))))
+
+    def count(self, filename: str) -> int:
+        if filename not in self.shard_keys:
+            return super().count(filename)
+        base_count = super().count
+        return sum(base_count(shard) for shard in self._shards(filename))
+
+    def max_id(self, filename: str) -> int:
+        if filename not in self.shard_keys:
+            return super().max_id(filename)
+        base_max_id = super().max_id
+        return max([base_max_id(shard) for shard in self._shards(filename)], default=0)
+
+    # Clé dérivée : déplacement des notes d'une évaluation qui change de cours
+
+    def _cours_moves(self, evaluations) -> Dict[Any, Tuple[Any, Any]]:
+        """{evaluation_id: (ancien cours_id, nouveau)} des évaluations écrites qui changent de cours"""
+        if self._manifest("notes.json")["cle"] != "cours_id":
+            return {}
+        moves = {}
+        for evaluation in evaluations:
+            old = self.get("evaluations.json", evaluation.get('id'))
+            if old is not None and old.get('cours_id') != evaluation.get('cours_id'):
+                moves[evaluation.get('id')] = (old.get('cours_id'), evaluation.get('cours_id'))
+        return moves
+
+    def _moved_notes(self, moves: Dict[Any, Tuple[Any, Any]], skip=()) -> Dict[str, Dict[str, list]]:
+        """Écritures par shard qui déplacent les notes des évaluations vers le shard de leur nouveau cours"""
+        manifest = self._manifest("notes.json")
+        per_shard: Dict[str, Dict[str, list]] = {}
+        for evaluation_id, (old_cours, new_cours) in moves.items():
+            old_shard = manifest["shards"].get(str(old_cours))
+            if old_shard is None:
+                continue
+            notes = [n for n in super().find_by(old_shard, "evaluation_id", evaluation_id) if n.get('id') not in skip]
+            if not notes:
+                continue
+            new_shard = self._shard_for("notes.json", manifest, new_cours)
+            per_shard.setdefault(old_shard, {"put": [], "delete": []})["delete"].extend(n.get('id') for n in notes)
+            per_shard.setdefault(new_shard, {"put": [], "delete": []})["put"].extend(notes)
+            self._locations.setdefault("notes.json", {}).update((n.get('id'), new_shard) for n in notes)
+        return per_shard
+
+    def apply(self, changes: Dict[str, Dict[str, list]], durable: bool = False):
+        if "evaluations.json" in changes and "notes.json" not in changes:
+            # Des notes peuvent changer de shard : la collection est réservée avec l'écriture
+            changes = {**changes, "notes.json": {}}
+        super().apply(changes, durable)
+
+    def _write_all(self, filename: str, records: List[Dict[str, Any]]):
+        if filename == "evaluations.json":
+            with self._lock, self._exclusive("notes.json"):
+                moves = self._cours_moves(records)
+                super()._write_all(filename, records)
+                if moves:
+                    self._apply({"notes.json": {}}, moves=moves)
+            return
+        if filename not in self.shard_keys:
+            return super()._write_all(filename, records)
+        manifest = self._manifest(filename)
+        self._write_partitions(filename, manifest, records)
+        self._save_manifest(filename, manifest)
+        self._sequence(filename).ensure_at_least(self.max_id(filename))
+
+    def _shard_changes(self, filename: str, change: Dict[str, list]) -> Dict[str, Dict[str, list]]:
+        """Traduit des écritures sur une collection découpée en écritures par shard"""
+        manifest = self._manifest(filename)
+        per_shard: Dict[str, Dict[str, list]] = {}
+        # Emplacements des nouveaux enregistrements, enregistrés après le routage : un
+        # nouveau shard fait reconstruire la table par _locate, depuis les fichiers
+        # qui ne contiennent pas encore les enregistrements précédents du lot
+        placed = {}
+        for record in change.get("put", ()):
+            shard = self._shard_for(filename, manifest, self._shard_value(filename, manifest["cle"], record))
+            old_shard = self._locate(filename, record.get('id'))
+            if old_shard is not None and old_shard != shard:
+                # La clé de shard a changé : l'enregistrement change de fichier
+                per_shard.setdefault(old_shard, {"put": [], "delete": []})["delete"].append(record.get('id'))
+            per_shard.setdefault(shard, {"put": [], "delete": []})["put"].append(record)
+            placed[record.get('id')] = shard
+        self._locations.setdefault(filename, {}).update(placed)
+        for item_id in change.get("delete", ()):
+            shard = self._locate(filename, item_id)
+            if shard is not None:
+                per_shard.setdefault(shard, {"put": [], "delete": []})["delete"].append(item_id)
+                self._locations[filename].pop(item_id, None)
+        return per_shard
+
+    def _apply(self, changes: Dict[str, Dict[str, list]], durable: bool = False, moves=None):
+        if moves is None:
+            moves = self._cours_moves(changes["evaluations.json"].get("put", ())) if "evaluations.json" in changes else {}
+        self._moving = {evaluation_id: new for evaluation_id, (_, new) in moves.items()}
+        try:
+            routed = {}
+            for filename, change in changes.items():
+                if filename in self.shard_keys:
+                    routed.update(self._shard_changes(filename, change))
+                else:
+                    routed[filename] = change
+            if moves:
+                # Les notes écrites dans ce même appel sont déjà routées vers le nouveau shard
+                notes = changes.get("notes.json", {})
+                skip = {r.get('id') for r in notes.get("put", ())} | set(notes.get("delete", ()))
+                for shard, change in self._moved_notes(moves, skip).items():
+                    merged = routed.setdefault(shard, {"put": [], "delete": []})
+                    merged.setdefault("put", []).extend(change["put"])
+                    merged.setdefault("delete", []).extend(change["delete"])
+            super()._apply(routed, durable)
+        finally:
+            self._moving = {}
+        for filename in changes:
+            if filename in self.shard_keys:
+                self._locations_signature[filename] = self._shards_signature(filename)
+
+    def invalidate(self, filename: str = None):
+        super().invalidate(filename)
+        with self._lock:
+            self._manifests.clear()
+            self._locations.clear()
+            self._locations_signature.clear()
+
+
+if __name__ == "__main__":
+    import sys
+
+    store = ShardedStore(sys.argv[1] if len(sys.argv) > 1 else "data/")
+    for name in store.shard_keys:
+        print(f"{name}: {store.count(name)} enregistrement(s) dans {len(store._shards(name))} shard(s)")
@@ -0,0 +1,427 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Optional, Iterator, Callable
+
+from .schema import FOREIGN_KEYS, UNIQUE_KEYS, TIME_FIELD, unique_key, date_bound
+from .integrity import DuplicateKeyError
+from .json_stream import matches
+from .changes import ChangeNotifier, describe_writes, describe_replace
+
+# Colonnes extraites (et indexées) pour chaque collection : clés étrangères
+INDEXED_COLUMNS = FOREIGN_KEYS
+
+# Connexions en transaction de lecture ouvertes par `SqliteStore.snapshot()` : {id(store): connexion}
+_pinned_connections: ContextVar[Optional[Dict[int, sqlite3.Connection]]] = ContextVar(
+    "pinned_connections", default=None)
+
+
+@contextmanager
+def _unpinned():
+    """Suspend le snapshot en cours : une écriture lit et écrit la dernière version"""
+    token = _pinned_connections.set(None)
+    try:
+        yield
+    finally:
+        _pinned_connections.reset(token)
+
+
+class SqliteStore(ChangeNotifier):
+    """Backend SQLite avec la même interface que EntityStore.
+
+    Chaque collection est une table (id, colonnes de clés étrangères indexées,
+    data = enregistrement JSON complet). Base en mode WAL, une connexion par thread.
+    La table versions compte les écritures de chaque collection, tous processus
+    confondus : c'est la signature lue par les caches (agrégats, bulletins).
+    Activé avec STORAGE_BACKEND=sqlite (chemin de la base : SQLITE_PATH).
+    """
+
+    def __init__(self, data_path: str = "data/", db_path: str = None):
+        self.data_path = data_path
+        self.db_path = db_path or os.environ.get("SQLITE_PATH") or os.path.join(data_path, "education.db")
+        self._local = threading.local()
+        self._tables = set()
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()  # Écriture et notification, dans l'ordre des commits
+        self._readers: List[sqlite3.Connection] = []  # Connexions de lecture libres, réutilisées par snapshot()
+        self.max_readers = int(os.environ.get("SQLITE_READERS", 8))
+        self._listeners = []
+        self._signatures_before: Dict[str, Any] = {}
+        self.change_feed = None
+
+    def _open(self, **options) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30, **options)
+        # Normalisation des valeurs uniques identique au backend JSON (strip + casefold Unicode)
+        conn.create_function("unique_key", 1, unique_key, deterministic=True)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, last INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+        return conn
+
+    def _writer(self) -> sqlite3.Connection:
+        """Connexion SQLite propre au thread courant (écritures et lectures hors snapshot)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connexion de lecture : celle du snapshot en cours, sinon celle du thread"""
+        pinned = _pinned_connections.get()
+        if pinned is not None and id(self) in pinned:
+            return pinned[id(self)]
+        return self._writer()
+
+    @staticmethod
+    def _table_name(filename: str) -> str:
+        base = filename[:-5] if filename.endswith(".json") else filename
+        return re.sub(r'\W', '_', base)
+
+    def _table(self, filename: str) -> str:
+        """Nom de la table d'une collection, créée (avec ses index) si besoin"""
+        table = self._table_name(filename)
+        if table in self._tables:
+            return table
+        with self._lock:
+            conn = self._writer()
+            columns = INDEXED_COLUMNS.get(filename, [])
+            column_defs = "".join(f", {c} INTEGER" for c in columns)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY{column_defs}, data TEXT NOT NULL)")
+            for column in columns:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+            for field in UNIQUE_KEYS.get(filename, []):
+                conn.execute(f"DROP INDEX IF EXISTS idx_{table}_unique_{field}")  # Ancien index lower(trim(...))
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ukey_{field} ON {table} ({self._unique_expr(field)})")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{TIME_FIELD} ON {table} (json_extract(data, '$.{TIME_FIELD}'))")
+            self._tables.add(table)
+        return table
+
+    @staticmethod
+    def _unique_expr(field: str) -> str:
+        """Expression indexée d'un champ unique : schema.unique_key, enregistrée sur chaque connexion"""
+        return f"unique_key(json_extract(data, '$.{field}'))"
+
+    def _check_unique(self, filename: str, table: str, records: List[Dict[str, Any]]):
+        """Lève DuplicateKeyError si une valeur unique est déjà prise (index, dans la transaction)"""
+        conn = self._connection()
+        for field in UNIQUE_KEYS.get(filename, []):
+            seen = {}
+            for record in records:
+                if record.get(field) is None:
+                    continue
+                key = unique_key(record[field])
+                owner = seen.get(key)
+                if owner is None:
+                    row = conn.execute(f"SELECT id FROM {table} WHERE {self._unique_expr(field)} = ? AND id != ? LIMIT 1",
+                                       (key, record.get('id'))).fetchone()
+                    owner = row[0] if row else None
+                if owner is not None and owner != record.get('id'):
+                    raise DuplicateKeyError(f"{field} '{record[field]}' déjà utilisé (ID {owner})")
+                seen[key] = record.get('id')
+
+    def _row(self, filename: str, record: Dict[str, Any]) -> tuple:
+        columns = INDEXED_COLUMNS.get(filename, [])
+        return (record.get('id'), *[record.get(c) for c in columns], json.dumps(record, ensure_ascii=False))
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection, table: str):
+        """Incrémente le compteur d'écritures d'une table (dans la transaction en cours)"""
+        conn.execute("INSERT OR IGNORE INTO versions (name, version) VALUES (?, 0)", (table,))
+        conn.execute("UPDATE versions SET version = version + 1 WHERE name = ?", (table,))
+
+    def signature(self, filename: str) -> int:
+        """Nombre d'écritures validées sur une collection (visible de tous les processus)"""
+        row = self._connection().execute("SELECT version FROM versions WHERE name = ?",
+                                         (self._table(filename),)).fetchone()
+        return row[0] if row else 0
+
+    def _insert_sql(self, filename: str, table: str) -> str:
+        columns = ["id", *INDEXED_COLUMNS.get(filename, []), "data"]
+        placeholders = ", ".join("?" for _ in columns)
+        return f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+
+    def load(self, filename: str) -> List[Dict[str, Any]]:
+        """Retourne tous les enregistrements d'une collection"""
+        table = self._table(filename)
+        rows = self._connection().execute(f"SELECT data FROM {table} ORDER BY id")
+        return [json.loads(data) for (data,) in rows]
+
+    def iter_records(self, filename: str, predicate: Optional[Callable] = None,
+                     where: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        """Parcourt une table ligne par ligne (curseur), filtres indexés poussés en SQL"""
+        table = self._table(filename)
+        indexed = {k: v for k, v in (where or {}).items() if k in INDEXED_COLUMNS.get(filename, [])}
+        sql = f"SELECT data FROM {table}"
+        if indexed:
+            sql += " WHERE " + " AND ".join(f"{k} = ?" for k in indexed)
+        cursor = self._connection().execute(sql + " ORDER BY id", tuple(indexed.values()))
+        for (data,) in cursor:
+            record = json.loads(data)
+            if matches(record, predicate, where):
+                yield record
+
+    def get(self, filename: str, item_id: int) -> Optional[Dict[str, Any]]:
+        """Récupère un enregistrement par sa clé primaire"""
+        table = self._table(filename)
+        row = self._connection().execute(f"SELECT data FROM {table} WHERE id = ?", (item_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_by(self, filename: str, field: str, value) -> List[Dict[str, Any]]:
+        """Enregistrements dont une clé étrangère indexée vaut `value`"""
+        if field not in INDEXED_COLUMNS.get(filename, []):
+            return [r for r in self.load(filename) if r.get(field) == value]
+        table = self._table(filename)
+        rows = self._connection().execute(f"SELECT data FROM {table} WHERE {field} = ? ORDER BY id", (value,))
+        return [json.loads(data) for (data,) in rows]
+
+    def find_unique(self, filename: str, field: str, value) -> Optional[Dict[str, Any]]:
+        """Enregistrement portant une valeur unique, par l'index d'expression"""
+        table = self._table(filename)
+        row = self._connection().execute(f"SELECT data FROM {table} WHERE {self._unique_expr(field)} = ? LIMIT 1",
+                                         (unique_key(value),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def created_between(self, filename: str, after=None, before=None) -> List[Dict[str, Any]]:
+        """Enregistrements créés dans [after, before[, par l'index sur date_creation (dates ISO)"""
+        table = self._table(filename)
+        column = f"json_extract(data, '$.{TIME_FIELD}')"
+        conditions, params = [f"{column} IS NOT NULL"], []
+        for operator, bound in ((">=", date_bound(after)), ("<", date_bound(before))):
+            if bound is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(bound.isoformat())
+        rows = self._connection().execute(
+            f"SELECT data FROM {table} WHERE {' AND '.join(conditions)} ORDER BY {column}", params)
+        return [json.loads(data) for (data,) in rows]
+
+    def count(self, filename: str) -> int:
+        table = self._table(filename)
+        return self._connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def max_id(self, filename: str) -> int:
+        table = self._table(filename)
+        return self._connection().execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+    def reserve_ids(self, filename: str, count: int) -> range:
+        """Réserve un bloc d'IDs dans la table des séquences (transaction atomique)"""
+        if count < 1:
+            raise ValueError("Le nombre d'IDs à réserver doit être positif")
+        table = self._table(filename)
+        conn = self._writer()
+        with _unpinned():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT last FROM sequences WHERE name = ?", (table,)).fetchone()
+                last = row[0] if row else self.max_id(filename)
+                conn.execute("INSERT OR REPLACE INTO sequences (name, last) VALUES (?, ?)", (table, last + count))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return range(last + 1, last + count + 1)
+
+    def next_id(self, filename: str) -> int:
+        return self.reserve_ids(filename, 1)[0]
+
+    def put(self, filename: str, record: Dict[str, Any]):
+        """Insère ou remplace un enregistrement"""
+        self.put_many(filename, [record])
+
+    def put_many(self, filename: str, records: List[Dict[str, Any]], durable: bool = False):
+        """Insère ou remplace plusieurs enregistrements dans une seule transaction"""
+        self.apply({filename: {"put": records}}, durable)
+
+    def delete(self, filename: str, item_id: int) -> bool:
+        if self.get(filename, item_id) is None:
+            return False
+        self.apply({filename: {"delete": [item_id]}})
+        return True
+
+    def apply(self, changes: Dict[str, Dict[str, list]], durable: bool = False):
+        """Applique des écritures sur plusieurs tables dans une seule transaction.
+
+        durable=True : la transaction est validée en synchronous=FULL (fsync du
+        WAL au commit) au lieu de NORMAL, qui peut perdre les derniers commits
+        en cas de coupure de courant.
+        """
+        conn = self._writer()
+        tables = {filename: self._table(filename) for filename in changes}
+        with self._write_lock, _unpinned():
+            if durable:
+                conn.execute("PRAGMA synchronous=FULL")
+            try:
+                self._apply(conn, tables, changes)
+            finally:
+                if durable:
+                    conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _apply(self, conn: sqlite3.Connection, tables: Dict[str, str], changes: Dict[str, Dict[str, list]]):
+        pending = getattr(self._local, "events", None)  # Dans un bloc exclusive : sa transaction
+        conn.execute("BEGIN IMMEDIATE" if pending is None else "SAVEPOINT apply")
+        before = {} if pending is None else self._local.before
+        try:
+            events = describe_writes(self.get, changes) if self._listeners else []
+            for filename in changes:
+                if filename not in before:  # Lue dans la transaction, avant son incrément
+                    before[filename] = self.signature(filename)
+            for filename, change in changes.items():
+                table = tables[filename]
+                if change.get("put"):
+                    self._check_unique(filename, table, change["put"])
+                    conn.executemany(self._insert_sql(filename, table),
+                                     [self._row(filename, r) for r in change["put"]])
+                if change.get("delete"):
+                    conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(i,) for i in change["delete"]])
+                if change.get("put") or change.get("delete"):
+                    self._bump_version(conn, table)
+            conn.execute("COMMIT" if pending is None else "RELEASE apply")
+        except Exception:
+            if pending is None:
+                conn.execute("ROLLBACK")
+            else:
+                conn.execute("ROLLBACK TO apply")
+                conn.execute("RELEASE apply")
+            raise
+        if pending is None:
+            self._notify(events, before)
+        else:
+            pending.extend(events)  # Notifiés après le COMMIT du bloc
+
+    @contextmanager
+    def exclusive(self, filenames):
+        """Réserve des collections pour un cycle lecture-modification-écriture.
+
+        Le bloc est une transaction d'écriture (BEGIN IMMEDIATE) : ses lectures et
+        ses apply sont validés ensemble, sans écriture d'un autre processus entre
+        les deux ; les événements sont notifiés après le COMMIT.
+        """
+        conn = self._writer()
+        for filename in filenames:
+            self._table(filename)
+        with self._write_lock, _unpinned():
+            if getattr(self._local, "events", None) is not None:
+                yield self  # Bloc imbriqué : transaction déjà ouverte
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.events, self._local.before = [], {}
+            try:
+                yield self
+            except BaseException:
+                self._local.events = None
+                conn.execute("ROLLBACK")
+                raise
+            events, self._local.events = self._local.events, None
+            conn.execute("COMMIT")
+            self._notify(events, self._local.before)
+
+    def write_all(self, filename: str, records: List[Dict[str, Any]]):
+        """Remplace entièrement le contenu d'une table (une seule transaction)"""
+        table = self._table(filename)
+        conn = self._writer()
+        with self._write_lock, _unpinned():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                events = describe_replace(filename, self.load(filename), records) if self._listeners else []
+                before = {filename: self.signature(filename)}
+                conn.execute(f"DELETE FROM {table}")
+                conn.executemany(self._insert_sql(filename, table), [self._row(filename, r) for r in records])
+                conn.execute(
+                    "UPDATE sequences SET last = MAX(last, (SELECT COALESCE(MAX(id), 0) FROM " + table + ")) WHERE name = ?",
+                    (table,)
+                )
+                self._bump_version(conn, table)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._notify(events, before)
+
+    @contextmanager
+    def snapshot(self):
+        """Fige, pour la durée du bloc, la version de la base lue.
+
+        Ouvre une transaction de lecture (BEGIN) sur une connexion réservée au
+        bloc, tenue jusqu'à sa sortie : en WAL, toutes les lectures du bloc (dans
+        le même contexte, y compris le thread d'une route FastAPI) voient le même
+        état, sans bloquer l'écrivain. Les écritures du bloc partent de la
+        dernière version. Un snapshot imbriqué réutilise celui en cours.
+        Les connexions de lecture sont gardées ouvertes (SQLITE_READERS au plus)
+        et reprises par les snapshots suivants : un snapshot ne coûte qu'un BEGIN
+        et un COMMIT. Elles ne sont pas liées à un thread, plusieurs requêtes
+        pouvant ouvrir leur snapshot depuis la même boucle asyncio.
+        """
+        pinned = _pinned_connections.get()
+        if pinned is not None and id(self) in pinned:
+            yield self
+            return
+        conn = self._reader()
+        reusable = False
+        try:
+            conn.execute("BEGIN")
+            conn.execute("SELECT COUNT(*) FROM sequences").fetchone()  # La lecture fixe la version
+            token = _pinned_connections.set({**(pinned or {}), id(self): conn})
+            try:
+                yield self
+            finally:
+                _pinned_connections.reset(token)
+                conn.execute("COMMIT")
+                reusable = True
+        finally:
+            self._release_reader(conn, reusable)
+
+    def _reader(self) -> sqlite3.Connection:
+        """Connexion de lecture libre, ouverte (PRAGMA, tables) seulement si aucune ne l'est"""
+        with self._lock:
+            if self._readers:
+                return self._readers.pop()
+        for filename in INDEXED_COLUMNS:
+            self._table(filename)  # Tables créées avant de figer le schéma lu
+        return self._open(check_same_thread=False)
+
+    def _release_reader(self, conn: sqlite3.Connection, reusable: bool):
+        with self._lock:
+            if reusable and len(self._readers) < self.max_readers:
+                self._readers.append(conn)
+                return
+        conn.close()
+
+    def refresh(self, filename: str, records: List[Dict[str, Any]]):
+        """Sans objet : SQLite est toujours à jour"""
+
+    def invalidate(self, filename: str = None):
+        """Sans objet : pas de cache côté SQLite"""
+
+    def compact_all(self):
+        """Force un checkpoint du WAL dans la base principale"""
+        self._writer().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def migrate_from_json(data_path: str = "data/", db_path: str = None) -> Dict[str, int]:
+    """Importe (une fois) les fichiers JSON existants dans la base SQLite"""
+    from .entity_store import EntityStore
+
+    json_store = EntityStore(data_path, journal=os.environ.get("DATA_JOURNAL", "0") == "1")
+    sqlite_store = SqliteStore(data_path, db_path)
+    counts = {}
+    for filename in INDEXED_COLUMNS:
+        records = json_store.load(filename)
+        sqlite_store.write_all(filename, records)
+        counts[filename] = len(records)
+    return counts
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/"
+    for filename, count in migrate_from_json(path).items():
+        print(f"{filename}: {count} enregistrement(s) importé(s)")
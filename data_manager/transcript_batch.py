@@ -0,0 +1,227 @@
+import json
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+from entities.note import Note
+from .transcripts import build_transcript
+
+BATCH_DIR = "bulletins"
+FORMATS = ("jsonl", "txt")
+
+
+class SnapshotIndex:
+    """Copie en lecture seule des collections d'un bulletin, picklée une fois pour les workers.
+
+    Expose get / find_by comme le store (notes indexées par étudiant) :
+    build_transcript s'y applique sans modification.
+    """
+
+    def __init__(self, store):
+        with store.snapshot():
+            self.by_id = {filename: {r.get('id'): r for r in store.iter_records(filename)}
+                          for filename in ("etudiants.json", "evaluations.json", "cours.json", "professeurs.json")}
+            self.notes_by_etudiant: Dict[Any, List[Dict[str, Any]]] = {}
+            for note in store.iter_records("notes.json"):
+                self.notes_by_etudiant.setdefault(note.get('etudiant_id'), []).append(note)
+
+    def get(self, filename: str, item_id) -> Optional[Dict[str, Any]]:
+        return self.by_id[filename].get(item_id)
+
+    def find_by(self, filename: str, field: str, value) -> List[Dict[str, Any]]:
+        if filename == "notes.json" and field == "etudiant_id":
+            return self.notes_by_etudiant.get(value, [])
+        return [r for r in self.by_id[filename].values() if r.get(field) == value]
+
+
+# Côté worker
+
+_index: Optional[SnapshotIndex] = None
+
+
+def _init_worker(path: str):
+    """Charge l'index une fois par processus (et non à chaque lot d'étudiants)"""
+    global _index
+    with open(path, 'rb') as f:
+        _index = pickle.load(f)
+
+
+def _appreciation(valeur) -> Optional[str]:
+    if not isinstance(valeur, (int, float)) or isinstance(valeur, bool):
+        return None
+    return Note(etudiant_id=None, evaluation_id=None, valeur=valeur).appreciation
+
+
+def render_transcript(transcript: Dict[str, Any], output_format: str = "jsonl") -> str:
+    """Bulletin mis en forme : une ligne JSON (avec appréciations) ou un bloc texte"""
+    for cours in transcript["cours"]:
+        cours["appreciation"] = _appreciation(cours["moyenne"])
+        for evaluation in cours["evaluations"]:
+            for note in evaluation["notes"]:
+                note["appreciation"] = _appreciation(note["valeur"])
+    transcript["appreciation"] = _appreciation(transcript["moyenne_generale"])
+    if output_format == "jsonl":
+        return json.dumps(transcript, ensure_ascii=False) + "\n"
+
+    etudiant = transcript["etudiant"]
+    lines = [f"BULLETIN - {etudiant['nom']} ({etudiant['numero_etudiant']})", "=" * 60]
+    for cours in transcript["cours"]:
+        professeur = (cours["professeur"] or {}).get('nom') or "N/A"
+        lines.append(f"{cours['code']} - {cours['nom']} ({cours['credits']} crédits, {professeur})")
+        for evaluation in cours["evaluations"]:
+            valeurs = ", ".join(f"{n['valeur']}" for n in evaluation["notes"])
+            lines.append(f"    {evaluation['nom']} (coef. {evaluation['coefficient']}): {valeurs}")
+        lines.append(f"    Moyenne: {cours['moyenne']}/20 - {cours['appreciation'] or 'N/A'}")
+    lines.append("-" * 60)
+    lines.append(f"Moyenne générale: {transcript['moyenne_generale']}/20 - {transcript['appreciation'] or 'N/A'}")
+    lines.append(f"Crédits validés: {transcript['credits_valides']}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _render_chunk(etudiant_ids: List[Any], output_format: str) -> str:
+    parts = []
+    for etudiant_id in etudiant_ids:
+        built = build_transcript(_index, etudiant_id)
+        if built is not None:
+            parts.append(render_transcript(built[0], output_format))
+    return "".join(parts)
+
+
+class TranscriptBatch:
+    """Génération des bulletins de tous les étudiants (ou d'une liste) sur plusieurs processus.
+
+    L'index des collections est construit une fois depuis un snapshot du
+    store, picklé dans un fichier temporaire et chargé une seule fois par
+    chaque worker du ProcessPoolExecutor (BULLETIN_WORKERS, par défaut un par
+    cœur). Les étudiants sont répartis par lots ; chaque lot rendu est écrit
+    dans le fichier de sortie dès qu'il revient (ordre d'achèvement), puis le
+    fichier est publié par renommage atomique. progress(fait, total) est
+    appelé après chaque lot ; cancel() arrête la génération entre deux lots.
+    """
+
+    def __init__(self, store, output_format: str = "jsonl", directory: str = None,
+                 workers: int = None, etudiant_ids: List[Any] = None, chunk_size: int = None):
+        if output_format not in FORMATS:
+            raise ValueError(f"Format inconnu: {output_format} ({', '.join(FORMATS)})")
+        self.store = store
+        self.output_format = output_format
+        self.directory = directory or os.path.join(store.data_path, BATCH_DIR)
+        self.workers = workers or int(os.environ.get("BULLETIN_WORKERS", 0)) or os.cpu_count() or 1
+        self.etudiant_ids = etudiant_ids
+        self.chunk_size = chunk_size
+        self.path: Optional[str] = None
+        self.state = "en_attente"
+        self.error: Optional[str] = None
+        self.done = 0
+        self.total = 0
+        self.started_at: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.finished_at: Optional[float] = None  # time.monotonic() à la fin (terminé, annulé ou en erreur)
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def run(self, progress: Callable[[int, int], None] = None) -> Optional[str]:
+        """Génère les bulletins, retourne le chemin du fichier (None si annulé ou en erreur)"""
+        if self._cancel.is_set():  # Annulé avant d'avoir démarré (en file d'attente)
+            self.state = "annule"
+            self.finished_at = time.monotonic()
+            return None
+        self.started_at = time.perf_counter()
+        self.state = "en_cours"
+        os.makedirs(self.directory, exist_ok=True)
+        fd, index_path = tempfile.mkstemp(prefix=".index-", suffix=".pickle", dir=self.directory)
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(self.directory, f"bulletins-{timestamp}.{self.output_format}")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                index = SnapshotIndex(self.store)
+                ids = self.etudiant_ids if self.etudiant_ids is not None else sorted(index.by_id["etudiants.json"], key=str)
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            del index
+            self.total = len(ids)
+            size = self.chunk_size or max(1, min(500, self.total // (self.workers * 4) or 1))
+            chunks = [ids[i:i + size] for i in range(0, len(ids), size)]
+            with open(path + ".tmp", 'w', encoding='utf-8') as out, \
+                    ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(index_path,),
+                                        # spawn : pas de fork d'un processus à threads (API) ; l'index vient du fichier
+                                        mp_context=multiprocessing.get_context("spawn")) as executor:
+                futures = {executor.submit(_render_chunk, chunk, self.output_format): len(chunk) for chunk in chunks}
+                for future in as_completed(futures):
+                    if self._cancel.is_set():
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        break
+                    out.write(future.result())
+                    self.done += futures[future]
+                    if progress:
+                        progress(self.done, self.total)
+            if self._cancel.is_set():
+                os.remove(path + ".tmp")
+                self.state = "annule"
+                return None
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            print(f"❌ Erreur lors de la génération des bulletins: {e}")
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+            self.state, self.error = "erreur", str(e)
+            return None
+        finally:
+            os.remove(index_path)
+            self.duration = time.perf_counter() - self.started_at
+            self.finished_at = time.monotonic()
+        self.path = path
+        self.state = "termine"
+        return path
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = self.duration if self.duration is not None else (
+            time.perf_counter() - self.started_at if self.started_at is not None else 0.0)
+        return {
+            "etat": self.state,
+            "erreur": self.error,
+            "format": self.output_format,
+            "workers": self.workers,
+            "faits": self.done,
+            "total": self.total,
+            "duree_s": round(elapsed, 3),
+            "bulletins_par_s": round(self.done / elapsed, 1) if elapsed else None,
+            "fichier": self.path,
+        }
+
+
+if __name__ == "__main__":
+    import sys
+    from .data_loader import DataLoader
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    options = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    try:
+        batch = TranscriptBatch(DataLoader(args[0] if args else "data/").store,
+                                output_format=options.get("format", "jsonl"),
+                                workers=int(options["workers"]) if "workers" in options else None)
+    except ValueError as e:
+        print(f"❌ {e}")
+        print("Usage: python -m data_manager.transcript_batch [data/] [--format=jsonl|txt] [--workers=N]")
+        sys.exit(1)
+
+    def afficher(fait: int, total: int):
+        print(f"\r{fait}/{total} bulletins", end="", flush=True)
+
+    result = batch.run(afficher)
+    print()
+    if result is None:
+        sys.exit(1)
+    status = batch.status()
+    print(f"✅ {status['total']} bulletins en {status['duree_s']} s ({status['bulletins_par_s']}/s, "
+          f"{status['workers']} processus) -> {result}")
@@ -0,0 +1,243 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+SOURCES = ["etudiants.json", "notes.json", "evaluations.json", "cours.json", "professeurs.json"]
+
+
+def _moyenne(somme: float, poids: float) -> Optional[float]:
+    return round(somme / poids, 2) if poids else None
+
+
+def build_transcript(store, etudiant_id: int) -> Optional[Tuple[Dict[str, Any], Dict[str, Set]]]:
+    """Bulletin d'un étudiant et ses dépendances {collection: ids}, None si l'étudiant n'existe pas.
+
+    Jointure etudiants -> notes -> evaluations -> cours -> professeurs par les
+    index du store (une recherche par enregistrement lié, aucun fichier relu).
+    Moyennes pondérées par le coefficient des évaluations, comme GradeEngine.
+    """
+    etudiant = store.get("etudiants.json", etudiant_id)
+    if etudiant is None:
+        return None
+    dependencies = {"evaluations.json": set(), "cours.json": set(), "professeurs.json": set()}
+    par_cours: Dict[Any, Dict[str, Any]] = {}
+    par_evaluation: Dict[Any, Dict[str, Any]] = {}
+    total, poids = 0.0, 0.0
+    for note in sorted(store.find_by("notes.json", "etudiant_id", etudiant_id), key=lambda n: str(n.get('date_creation'))):
+        evaluation_id = note.get('evaluation_id')
+        dependencies["evaluations.json"].add(evaluation_id)
+        entry = par_evaluation.get(evaluation_id)
+        if entry is None:
+            evaluation = store.get("evaluations.json", evaluation_id) or {}
+            cours_id = evaluation.get('cours_id')
+            entry = par_evaluation[evaluation_id] = {
+                "evaluation_id": evaluation_id,
+                "nom": evaluation.get('nom'),
+                "type": evaluation.get('type'),
+                "coefficient": float(evaluation.get('coefficient') or 1.0),
+                "notes": [],
+                "_cours_id": cours_id,
+            }
+            if cours_id not in par_cours:
+                dependencies["cours.json"].add(cours_id)
+                cours = store.get("cours.json", cours_id) or {}
+                professeur = None
+                if cours.get('professeur_id') is not None:
+                    dependencies["professeurs.json"].add(cours['professeur_id'])
+                    prof = store.get("professeurs.json", cours['professeur_id'])
+                    if prof:
+                        professeur = {"id": prof.get('id'), "nom": prof.get('nom'), "email": prof.get('email')}
+                par_cours[cours_id] = {
+                    "cours_id": cours_id,
+                    "nom": cours.get('nom'),
+                    "code": cours.get('code'),
+                    "credits": cours.get('credits'),
+                    "professeur": professeur,
+                    "evaluations": [],
+                    "_somme": 0.0,
+                    "_poids": 0.0,
+                }
+            par_cours[cours_id]["evaluations"].append(entry)
+        valeur = note.get('valeur')
+        entry["notes"].append({"id": note.get('id'), "valeur": valeur,
+                               "commentaire": note.get('commentaire'), "date_creation": note.get('date_creation')})
+        if isinstance(valeur, (int, float)) and not isinstance(valeur, bool):
+            cours = par_cours[entry["_cours_id"]]
+            cours["_somme"] += entry["coefficient"] * valeur
+            cours["_poids"] += entry["coefficient"]
+            total += entry["coefficient"] * valeur
+            poids += entry["coefficient"]
+
+    cours_list = []
+    for cours in par_cours.values():
+        for entry in cours["evaluations"]:
+            entry.pop("_cours_id")
+            valeurs = [n["valeur"] for n in entry["notes"] if isinstance(n["valeur"], (int, float))]
+            entry["moyenne"] = _moyenne(sum(valeurs), len(valeurs))
+        cours["moyenne"] = _moyenne(cours.pop("_somme"), cours.pop("_poids"))
+        cours_list.append(cours)
+    transcript = {
+        "etudiant": {k: etudiant.get(k) for k in ("id", "nom", "email", "numero_etudiant")},
+        "cours": cours_list,
+        "moyenne_generale": _moyenne(total, poids),
+        "credits_valides": sum(c["credits"] or 0 for c in cours_list if c["moyenne"] is not None and c["moyenne"] >= 10),
+        "genere_le": datetime.now().isoformat(),
+    }
+    return transcript, dependencies
+
+
+class TranscriptCache:
+    """Bulletins matérialisés par étudiant, invalidés précisément par les écritures.
+
+    Chaque bulletin retient les évaluations, cours et professeurs qu'il cite ;
+    un événement du store n'invalide que les bulletins concernés (les notes de
+    l'étudiant, ou un enregistrement référencé). Cache LRU en mémoire
+    (BULLETIN_CACHE_SIZE) et, si BULLETIN_CACHE_DIR est défini, copie sur disque
+    réutilisée tant qu'aucune des collections sources n'a changé.
+    """
+
+    _attach_lock = threading.Lock()
+
+    def __init__(self, store, max_size: int = None, directory: str = None):
+        self.store = store
+        self.max_size = max_size or int(os.environ.get("BULLETIN_CACHE_SIZE", 1000))
+        self.directory = directory if directory is not None else os.environ.get("BULLETIN_CACHE_DIR") or None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        self._dependencies: Dict[Any, Dict[str, Set]] = {}
+        self._dependents: Dict[Tuple[str, Any], Set] = {}  # {(collection, id): étudiants}
+        self._versions: Dict[Any, int] = {}
+        self._signatures = self._current_signatures()
+        self.hits = 0
+        self.misses = 0
+        store.add_listener(self._on_events)
+
+    @classmethod
+    def for_store(cls, store) -> "TranscriptCache":
+        """Cache partagé d'un store (créé et abonné au premier appel)"""
+        with cls._attach_lock:
+            cache = getattr(store, "transcripts", None)
+            if cache is None:
+                cache = store.transcripts = cls(store)
+            return cache
+
+    def _current_signatures(self) -> Dict[str, Any]:
+        return {filename: self.store.signature(filename) for filename in SOURCES}
+
+    # Invalidation
+
+    def _forget(self, etudiant_id, disk: bool = True):
+        """Retire un bulletin et ses dépendances (appelé sous self._lock)"""
+        self._entries.pop(etudiant_id, None)
+        self._versions[etudiant_id] = self._versions.get(etudiant_id, 0) + 1
+        for filename, ids in self._dependencies.pop(etudiant_id, {}).items():
+            for item_id in ids:
+                dependents = self._dependents.get((filename, item_id))
+                if dependents is not None:
+                    dependents.discard(etudiant_id)
+                    if not dependents:
+                        del self._dependents[(filename, item_id)]
+        if disk and self.directory:
+            try:
+                os.remove(self._path(etudiant_id))
+            except FileNotFoundError:
+                pass
+
+    def _on_events(self, events: List[Dict[str, Any]]):
+        # Sous le verrou d'écriture du store : seules les collections écrites changent de signature
+        filenames = {f"{e['collection']}.json" for e in events}.intersection(SOURCES)
+        signatures = {filename: self.store.signature(filename) for filename in filenames}
+        with self._lock:
+            if any(self._signatures.get(f) != self.store.signature_before(f) for f in filenames):
+                # Une écriture d'un autre processus n'a pas été vue : tout est périmé
+                for item in list(self._entries):
+                    self._forget(item)
+                self._signatures = self._current_signatures()
+                return
+            for event in events:
+                filename = f"{event['collection']}.json"
+                if filename == "notes.json":
+                    for record in (event.get("record"), event.get("avant")):
+                        if record:
+                            self._forget(record.get('etudiant_id'))
+                elif filename == "etudiants.json":
+                    self._forget(event["id"])
+                elif filename in SOURCES and event["op"] != "create":
+                    for etudiant_id in list(self._dependents.get((filename, event["id"]), ())):
+                        self._forget(etudiant_id)
+            self._signatures = {**self._signatures, **signatures}
+
+    def invalidate(self, etudiant_id=None):
+        with self._lock:
+            for item in ([etudiant_id] if etudiant_id is not None else list(self._entries)):
+                self._forget(item)
+
+    # Lecture
+
+    def _path(self, etudiant_id) -> str:
+        return os.path.join(self.directory, f"bulletin-{etudiant_id}.json")
+
+    def _read_disk(self, etudiant_id, signatures) -> Optional[Tuple[Dict[str, Any], Dict[str, Set]]]:
+        try:
+            with open(self._path(etudiant_id), 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if cached.get("sources") != json.loads(json.dumps(signatures)):
+            return None
+        return cached["bulletin"], {k: set(v) for k, v in cached["dependances"].items()}
+
+    def _write_disk(self, etudiant_id, transcript, dependencies, signatures):
+        path = self._path(etudiant_id)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({"sources": signatures, "bulletin": transcript,
+                       "dependances": {k: list(v) for k, v in dependencies.items()}}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def get(self, etudiant_id: int) -> Optional[Dict[str, Any]]:
+        """Bulletin d'un étudiant (depuis le cache ou construit), None s'il n'existe pas"""
+        signatures = self._current_signatures()
+        with self._lock:
+            if signatures != self._signatures:
+                # Écriture sans événement (autre processus, édition manuelle) : tout est périmé
+                for item in list(self._entries):
+                    self._forget(item)
+                self._signatures = signatures
+            transcript = self._entries.get(etudiant_id)
+            if transcript is not None:
+                self._entries.move_to_end(etudiant_id)
+                self.hits += 1
+                return transcript
+            self.misses += 1
+            version = self._versions.get(etudiant_id, 0)
+
+        built = self._read_disk(etudiant_id, signatures) if self.directory else None
+        from_disk = built is not None
+        if built is None:
+            with self.store.snapshot():
+                built = build_transcript(self.store, etudiant_id)
+            if built is None:
+                return None
+        transcript, dependencies = built
+        with self._lock:
+            if self._versions.get(etudiant_id, 0) != version or self._signatures != signatures:
+                return transcript  # Invalidé pendant la construction : servi sans être mis en cache
+            self._entries[etudiant_id] = transcript
+            self._dependencies[etudiant_id] = dependencies
+            for filename, ids in dependencies.items():
+                for item_id in ids:
+                    self._dependents.setdefault((filename, item_id), set()).add(etudiant_id)
+            while len(self._entries) > self.max_size:
+                self._forget(next(iter(self._entries)), disk=False)
+        if self.directory and not from_disk:
+            self._write_disk(etudiant_id, transcript, dependencies, signatures)
+        return transcript
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"bulletins_en_cache": len(self._entries), "hits": self.hits, "misses": self.misses}
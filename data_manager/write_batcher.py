@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional
+from .entity_store import EntityStore
+from .integrity import IntegrityError, check_references, referenced_collections
+
+
+class _PendingWrite:
+    """Écriture en attente d'un appelant, acquittée après le commit de son lot"""
+
+    def __init__(self, record: Dict[str, Any]):
+        self.record = record
+        self.done = threading.Event()
+        self.error: Optional[Exception] = None
+
+
+class WriteBatcher:
+    """Regroupe les sauvegardes concurrentes d'une collection (group commit).
+
+    Les écritures reçues pendant une courte fenêtre (WRITE_BATCH_WINDOW_MS) ou
+    jusqu'à WRITE_BATCH_MAX_SIZE enregistrements sont appliquées en une seule
+    écriture du store. Chaque appelant reste bloqué jusqu'au fsync de son lot
+    et récupère son propre enregistrement avec son ID. Une fenêtre de 0 désactive
+    le regroupement (écriture immédiate).
+    Les clés étrangères de chaque enregistrement sont vérifiées au commit, sous
+    le verrou d'écriture de la collection et des collections référencées.
+    """
+
+    _instances: Dict[str, "WriteBatcher"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, store, window_ms: float = None, max_batch: int = None):
+        self.store = store
+        if window_ms is None:
+            window_ms = float(os.environ.get("WRITE_BATCH_WINDOW_MS", 0))
+        self.window = window_ms / 1000
+        self.max_batch = max_batch or int(os.environ.get("WRITE_BATCH_MAX_SIZE", 500))
+        self._pending: Dict[str, List[_PendingWrite]] = {}
+        self._first_pending_at: Optional[float] = None
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes: Dict[int, int] = {}
+        self._nb_batches = 0
+        self._nb_records = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    @classmethod
+    def for_path(cls, data_path: str = "data/") -> "WriteBatcher":
+        """Retourne le batcher partagé associé à un dossier de données"""
+        key = os.path.abspath(data_path)
+        with cls._instances_lock:
+            batcher = cls._instances.get(key)
+            if batcher is None:
+                batcher = cls(EntityStore.for_path(data_path))
+                cls._instances[key] = batcher
+            return batcher
+
+    def submit(self, filename: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Enregistre un enregistrement et attend que son lot soit écrit.
+
+        Un ID est attribué si l'enregistrement n'en a pas encore. Lève
+        IntegrityError si une clé étrangère ou une valeur unique est invalide.
+        """
+        pending = _PendingWrite(record)
+        if self.window <= 0:
+            self._commit(filename, [pending])
+        else:
+            with self._cond:
+                self._ensure_worker()
+                self._pending.setdefault(filename, []).append(pending)
+                if self._first_pending_at is None:
+                    self._first_pending_at = time.monotonic()
+                self._cond.notify_all()
+            pending.done.wait()
+        if pending.error:
+            raise pending.error
+        return pending.record
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def _nb_pending(self) -> int:
+        return sum(len(queue) for queue in self._pending.values())
+
+    def _run(self):
+        """Boucle du thread de commit : attend la fenêtre puis écrit les lots"""
+        while True:
+            with self._cond:
+                while not self._nb_pending():
+                    self._cond.wait()
+                deadline = self._first_pending_at + self.window
+                while self._nb_pending() < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batches = {}
+                for filename, queue in self._pending.items():
+                    if queue:
+                        batches[filename] = queue[:self.max_batch]
+                        del queue[:self.max_batch]
+                self._first_pending_at = time.monotonic() if self._nb_pending() else None
+            for filename, batch in batches.items():
+                self._commit(filename, batch)
+
+    def _commit(self, filename: str, batch: List[_PendingWrite]):
+        """Écrit un lot en une seule opération puis acquitte chaque appelant"""
+        start = time.perf_counter()
+        try:
+            without_id = [p for p in batch if p.record.get('id') is None]
+            if without_id:
+                ids = self.store.reserve_ids(filename, len(without_id))
+                for pending, new_id in zip(without_id, ids):
+                    pending.record['id'] = new_id
+            with self.store.exclusive(referenced_collections(filename)):
+                for pending in batch:
+                    check_references(self.store, filename, pending.record)
+                self.store.put_many(filename, [p.record for p in batch], durable=True)
+        except IntegrityError as e:
+            if len(batch) > 1:
+                # Un doublon ou une référence absente ne doit pas faire échouer les autres écritures du lot
+                for pending in batch:
+                    self._commit(filename, [pending])
+                return
+            batch[0].error = e
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        self._record_metrics(len(batch), time.perf_counter() - start)
+        for pending in batch:
+            pending.done.set()
+
+    def _record_metrics(self, size: int, latency: float):
+        with self._metrics_lock:
+            self._nb_batches += 1
+            self._nb_records += size
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            bucket = 1
+            while bucket < size:
+                bucket *= 2
+            self._batch_sizes[bucket] = self._batch_sizes.get(bucket, 0) + 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Statistiques des lots : tailles (histogramme par puissance de 2) et latence de commit"""
+        with self._metrics_lock:
+            nb = self._nb_batches
+            return {
+                "nb_lots": nb,
+                "nb_enregistrements": self._nb_records,
+                "taille_moyenne_lot": round(self._nb_records / nb, 2) if nb else 0,
+                "histogramme_tailles": {f"<={k}": v for k, v in sorted(self._batch_sizes.items())},
+                "latence_commit_moyenne_ms": round(self._total_latency / nb * 1000, 3) if nb else 0,
+                "latence_commit_max_ms": round(self._max_latency * 1000, 3),
+            }
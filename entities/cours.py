@@ -53,6 +53,41 @@ class Cours:
         if evaluation_id not in self.evaluations:
             self.evaluations.append(evaluation_id)
     
+    def calculer_moyenne(self, notes_details: list = None, evaluations: list = None) -> float:
+        """Calcule la moyenne du cours, pondérée par le coefficient des évaluations
+        
+        `notes_details` est le moteur de moyennes (data_manager.grades.GradeEngine),
+        les notes au format colonne (data_manager.columnar.ColumnarNotes) ou une
+        liste de notes ; sans moteur, `evaluations` indique le cours et le
+        coefficient de chaque évaluation. Les valeurs non numériques sont
+        ignorées, comme par le moteur.
+        """
+        # Imports locaux : les entités restent utilisables sans le data_manager
+        from data_manager.columnar import ColumnarNotes
+        from data_manager.grades import GradeEngine
+        
+        if isinstance(notes_details, ColumnarNotes):
+            notes_details = GradeEngine(notes_details, evaluations or [])
+        if isinstance(notes_details, GradeEngine):
+            return notes_details.moyenne(cours_id=self.id)
+        if not notes_details:
+            return 0.0
+        
+        coefficients = {e.get('id'): e.get('coefficient') or 1.0
+                        for e in evaluations or [] if e.get('cours_id') == self.id}
+        total = 0.0
+        poids = 0.0
+        for note in notes_details:
+            valeur = note.get('valeur')
+            if not isinstance(valeur, (int, float)) or isinstance(valeur, bool):
+                continue
+            coefficient = coefficients.get(note.get('evaluation_id'))
+            if coefficient is not None:
+                total += valeur * coefficient
+                poids += coefficient
+        
+        return round(total / poids, 2) if poids > 0 else 0.0
+    
     def to_dict(self) -> dict:
         """Convertit l'objet en dictionnaire pour la sérialisation JSON"""
         return {
@@ -72,15 +72,34 @@ class Etudiant:
         if note_id not in self.notes:
             self.notes.append(note_id)
     
-    def calculer_moyenne(self, notes_details: list = None) -> float:
-        """Calcule la moyenne générale de l'étudiant"""
+    def calculer_moyenne(self, notes_details: list = None, evaluations: list = None) -> float:
+        """Calcule la moyenne générale de l'étudiant
+        
+        `notes_details` peut être la liste complète des notes ou, plus efficace,
+        celle déjà filtrée par DataLoader.get_notes_by_etudiant(id), ou encore
+        les notes au format colonne (data_manager.columnar.ColumnarNotes) ou le
+        moteur de moyennes pondérées (data_manager.grades.GradeEngine).
+        Avec `evaluations`, chaque note est pondérée par le coefficient de son évaluation.
+        Les valeurs non numériques sont ignorées, comme par le moteur.
+        """
+        if hasattr(notes_details, 'moyenne'):
+            return notes_details.moyenne(etudiant_id=self.id)
         if not notes_details:
             return 0.0
         
-        total = sum(note.get('valeur', 0) for note in notes_details if note.get('etudiant_id') == self.id)
-        count = len([note for note in notes_details if note.get('etudiant_id') == self.id])
+        coefficients = {e.get('id'): e.get('coefficient') or 1.0 for e in evaluations or []}
+        total = 0.0
+        poids = 0.0
+        for note in notes_details:
+            valeur = note.get('valeur')
+            if not isinstance(valeur, (int, float)) or isinstance(valeur, bool):
+                continue
+            if note.get('etudiant_id') == self.id:
+                coefficient = coefficients.get(note.get('evaluation_id'), 1.0)
+                total += valeur * coefficient
+                poids += coefficient
         
-        return round(total / count, 2) if count > 0 else 0.0
+        return round(total / poids, 2) if poids > 0 else 0.0
     
     def to_dict(self) -> dict:
         """Convertit l'objet en dictionnaire pour la sérialisation JSON"""
@@ -44,7 +44,14 @@ class Evaluation:
             self.notes.append(note_id)
     
     def calculer_moyenne(self, notes_details: list = None) -> float:
-        """Calcule la moyenne pour cette évaluation"""
+        """Calcule la moyenne pour cette évaluation
+        
+        `notes_details` peut être déjà filtrée par DataLoader.get_notes_by_evaluation(id),
+        ou être les notes au format colonne (data_manager.columnar.ColumnarNotes)
+        ou le moteur de moyennes (data_manager.grades.GradeEngine).
+        """
+        if hasattr(notes_details, 'moyenne'):
+            return notes_details.moyenne(evaluation_id=self.id)
         if not notes_details:
             return 0.0
         
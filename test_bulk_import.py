@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests de l'import en masse CSV/JSONL (data_manager.bulk_import)
+"""
+import io
+import json
+
+import pytest
+
+from data_manager.bulk_import import RowError, iter_rows, validate_rows
+from data_manager.data_saver import DataSaver
+from data_manager.import_cli import main
+
+
+@pytest.fixture(autouse=True)
+def environnement(monkeypatch):
+    monkeypatch.setenv("DATA_COORDINATION", "0")
+    monkeypatch.setenv("CHANGE_FEED", "0")
+
+
+ETUDIANTS_CSV = (
+    "nom,email,numero_etudiant\n"
+    "Alice,alice@etu.com,E2024001\n"
+    "Bob,bob@etu.com,E2024002\n"
+    "Carl,carl@etu.com,X\n"
+    "Alice bis, ALICE@etu.com ,E2024003\n"
+)
+
+
+def test_lecture_jsonl_signale_les_lignes_invalides():
+    """Une ligne illisible devient un RowError sans interrompre la lecture ; les lignes vides sont ignorées"""
+    lignes = ['{"nom": "Alice"}\n', "\n", "{pas du json\n", "[1, 2]\n", '{"nom": "Bob"}\n']
+    rows = list(iter_rows(lignes))
+    assert rows[0] == {"nom": "Alice"} and rows[3] == {"nom": "Bob"}
+    assert isinstance(rows[1], RowError) and isinstance(rows[2], RowError)
+    with pytest.raises(ValueError):
+        list(iter_rows(lignes, "xml"))
+
+
+def test_validation_csv_convertit_et_rapporte_par_ligne():
+    """Les colonnes CSV sont converties vers les types des entités ; chaque erreur porte son numéro de ligne"""
+    csv = "etudiant_id,evaluation_id,valeur\n1,1,12.5\n1,1,25\n2,1,abc\n"
+    valid, errors = validate_rows("notes", iter_rows(io.StringIO(csv), "csv"))
+    assert len(valid) == 1
+    assert valid[0]["etudiant_id"] == 1 and valid[0]["valeur"] == 12.5 and valid[0]["date_creation"]
+    assert [e["ligne"] for e in errors] == [2, 3]
+
+
+def test_import_verifie_les_cles_et_ecrit_une_seule_fois(tmp_path):
+    """Format, doublons dans le fichier et dans le store rejetés ; les autres lignes reçoivent un bloc d'ID"""
+    saver = DataSaver(str(tmp_path))
+    saver.store.put("etudiants.json", {"id": 7, "nom": "Bob", "email": "BOB@etu.com", "numero_etudiant": "E2024009"})
+    saver.store.next_id("etudiants.json")
+    report = saver.bulk_save("etudiants", iter_rows(io.StringIO(ETUDIANTS_CSV), "csv"))
+    assert report["importes"] == 1
+    assert [e["ligne"] for e in report["erreurs"]] == [2, 3, 4]
+    assert "ligne 1" in report["erreurs"][2]["erreur"]
+    assert saver.store.get("etudiants.json", report["ids"][0])["nom"] == "Alice"
+
+    notes = saver.bulk_save("notes.json", [{"etudiant_id": 99, "evaluation_id": 1, "valeur": 10.0}])
+    assert notes["importes"] == 0 and len(notes["erreurs"]) == 1
+    with pytest.raises(ValueError):
+        saver.bulk_save("inconnus", [])
+
+
+def test_ligne_de_commande(tmp_path, capsys):
+    """python -m data_manager.import_cli importe le fichier et affiche les erreurs"""
+    fichier = tmp_path / "profs.jsonl"
+    fichier.write_text("\n".join(json.dumps(p) for p in [
+        {"nom": "Dr. A", "email": "a@univ.com", "specialite": "Maths"},
+        {"nom": "Dr. B", "email": "a@univ.com", "specialite": "Maths"},
+    ]) + "\n", encoding="utf-8")
+    assert main(["professeurs", str(fichier), str(tmp_path / "data")]) == 0
+    sortie = capsys.readouterr().out
+    assert "1 enregistrement(s) importé(s) depuis profs.jsonl, 1 erreur(s)" in sortie
+    assert "ligne 2" in sortie
+    assert main([]) == 1
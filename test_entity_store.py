@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+Tests du data_manager : snapshots, journal, contraintes, shards, archives, agrégats et bulletins
+"""
+import io
+import os
+import threading
+
+import pytest
+
+from data_manager.aggregates import Aggregates
+from data_manager.archive import Archive
+from data_manager.changes import ChangeFeed
+from data_manager.entity_store import EntityStore
+from data_manager.id_sequence import IdSequence
+from data_manager.integrity import (DuplicateKeyError, IntegrityError, affected_collections, check_references,
+                                    delete_with_dependents)
+from data_manager.json_handler import JsonHandler
+from data_manager.sharding import ShardedStore
+from data_manager.sqlite_store import SqliteStore
+from data_manager.transcripts import TranscriptCache
+from data_manager.write_batcher import WriteBatcher
+
+
+@pytest.fixture(autouse=True)
+def environnement(monkeypatch):
+    """Store isolé : ni coordination entre processus, ni flux de changements"""
+    monkeypatch.setenv("DATA_COORDINATION", "0")
+    monkeypatch.setenv("CHANGE_FEED", "0")
+
+
+def _note(note_id, etudiant_id=1, evaluation_id=1, valeur=10.0):
+    return {"id": note_id, "etudiant_id": etudiant_id, "evaluation_id": evaluation_id, "valeur": valeur}
+
+
+def _peupler(store):
+    store.put("professeurs.json", {"id": 1, "nom": "Dr. Test", "email": "test@university.com"})
+    store.put("cours.json", {"id": 1, "nom": "Algèbre", "code": "ALG001", "professeur_id": 1})
+    store.put("evaluations.json", {"id": 1, "nom": "Partiel", "cours_id": 1, "coefficient": 1})
+    store.put("evaluations.json", {"id": 2, "nom": "Examen", "cours_id": 1, "coefficient": 2})
+    store.put_many("etudiants.json", [
+        {"id": 1, "nom": "Alice", "numero_etudiant": "E2024001", "email": "alice@etu.com"},
+        {"id": 2, "nom": "Bob", "numero_etudiant": "E2024002", "email": "bob@etu.com"},
+    ])
+
+
+def test_snapshot_isole_des_ecritures_concurrentes(tmp_path):
+    """Un snapshot voit la même version de bout en bout, même si un autre thread écrit"""
+    store = EntityStore(str(tmp_path))
+    store.put_many("notes.json", [_note(i) for i in range(1, 51)])
+    lu = threading.Event()
+    ecrit = threading.Event()
+
+    def ecrivain():
+        lu.wait()
+        store.put_many("notes.json", [_note(i, valeur=20.0) for i in range(51, 101)])
+        store.put("notes.json", _note(1, valeur=0.0))
+        store.delete("notes.json", 2)
+        ecrit.set()
+
+    thread = threading.Thread(target=ecrivain)
+    thread.start()
+    with store.snapshot():
+        assert store.count("notes.json") == 50
+        lu.set()
+        assert ecrit.wait(5)
+        assert store.count("notes.json") == 50
+        assert store.get("notes.json", 1)["valeur"] == 10.0
+        assert store.get("notes.json", 2) is not None
+        assert len(store.find_by("notes.json", "etudiant_id", 1)) == 50
+    thread.join()
+    assert store.count("notes.json") == 99
+    assert store.get("notes.json", 1)["valeur"] == 0.0
+    assert store.get("notes.json", 2) is None
+
+
+def test_snapshot_sqlite_reutilise_ses_connexions(tmp_path):
+    """Un snapshot SQLite est isolé des écritures et ne rouvre pas de connexion à chaque fois"""
+    store = SqliteStore(str(tmp_path))
+    store.put_many("notes.json", [_note(i) for i in range(1, 11)])
+    ouvertures = []
+    ouvrir = store._open
+    store._open = lambda **options: ouvertures.append(options) or ouvrir(**options)
+
+    for _ in range(3):
+        with store.snapshot():
+            assert store.count("notes.json") == 10
+            thread = threading.Thread(target=store.put, args=("notes.json", _note(100, valeur=0.0)))
+            thread.start()
+            thread.join()
+            assert store.count("notes.json") == 10
+            assert store.get("notes.json", 100) is None
+        assert store.count("notes.json") == 11
+        store.delete("notes.json", 100)
+    assert len([o for o in ouvertures if o.get("check_same_thread") is False]) == 1
+
+
+def test_sqlite_transactions_et_sequences(tmp_path):
+    """Un apply multi-tables est atomique, un bloc exclusive annulé n'écrit ni ne notifie rien,
+    et deux processus réservent des blocs d'ID disjoints"""
+    store, autre = SqliteStore(str(tmp_path)), SqliteStore(str(tmp_path))
+    evenements = []
+    store.add_listener(evenements.extend)
+    _peupler(store)
+    version = store.signature("notes.json")
+    store.apply({"notes.json": {"put": [dict(_note(1), date_creation="2024-01-01T10:00:00")]},
+                 "cours.json": {"put": [{"id": 2, "nom": "Analyse", "code": "ANA001", "professeur_id": 1}]}},
+                durable=True)
+    assert store.signature("notes.json") == version + 1
+    with pytest.raises(DuplicateKeyError):
+        store.apply({"notes.json": {"put": [_note(2)]},
+                     "cours.json": {"put": [{"id": 3, "nom": "Copie", "code": "ana001", "professeur_id": 1}]}})
+    assert store.get("notes.json", 2) is None
+
+    nombre = len(evenements)
+    with pytest.raises(RuntimeError):
+        with store.exclusive(["notes.json"]):
+            store.put("notes.json", _note(3))
+            raise RuntimeError("annulé")
+    assert store.get("notes.json", 3) is None and len(evenements) == nombre
+
+    premiers, seconds = store.reserve_ids("notes.json", 5), autre.reserve_ids("notes.json", 5)
+    assert set(premiers).isdisjoint(seconds) and min(premiers) > 1
+    assert [r["id"] for r in autre.find_by("notes.json", "evaluation_id", 1)] == [1]
+    assert [r["id"] for r in autre.created_between("notes.json", after="2023-12-31")] == [1]
+    assert SqliteStore(str(tmp_path)).find_unique("cours.json", "code", " ana001 ")["id"] == 2
+
+
+def test_sequence_graine_calculee_hors_des_verrous(tmp_path):
+    """La graine lit le store sans tenir le verrou de la séquence (ordre des verrous du store)"""
+    appels = []
+
+    def graine():
+        appels.append(sequence._lock.locked())
+        return 41
+
+    sequence = IdSequence(str(tmp_path / "notes.seq"), seed=graine)
+    assert sequence.next_id() == 42
+    assert list(sequence.reserve(3)) == [43, 44, 45]
+    assert appels == [False]
+
+
+def test_sequence_sans_interblocage_avec_une_ecriture(tmp_path):
+    """Une écriture (verrou du store puis de la séquence) pendant le calcul de la graine ne bloque pas"""
+    store = EntityStore(str(tmp_path))
+    store.put_many("notes.json", [_note(i) for i in range(1, 6)])
+    sequence = store._sequence("notes.json")
+    store.invalidate("notes.json")  # La graine devra relire la collection (verrou du store)
+    dans_la_graine, verrou_pris = threading.Event(), threading.Event()
+    graine = sequence._seed
+
+    def graine_lente():
+        dans_la_graine.set()
+        verrou_pris.wait(5)
+        return graine()
+
+    sequence._seed = graine_lente
+    ids = []
+    thread = threading.Thread(target=lambda: ids.append(sequence.next_id()), daemon=True)
+    thread.start()
+    assert dans_la_graine.wait(5)
+
+    def ecrire():
+        with store._lock:
+            verrou_pris.set()
+            sequence.ensure_at_least(5)
+
+    ecriture = threading.Thread(target=ecrire, daemon=True)
+    ecriture.start()
+    ecriture.join(5)
+    thread.join(5)
+    assert not ecriture.is_alive() and not thread.is_alive()
+    assert ids == [6]
+
+
+def test_journal_rejoue_puis_compacte(tmp_path):
+    """Les écritures journalisées survivent à un redémarrage, avant et après compactage"""
+    store = EntityStore(str(tmp_path), journal=True)
+    store.put_many("notes.json", [_note(i) for i in range(1, 11)])
+    store.put("notes.json", _note(3, valeur=18.5))
+    store.delete("notes.json", 4)
+
+    relu = EntityStore(str(tmp_path), journal=True)
+    assert relu.count("notes.json") == 9
+    assert relu.get("notes.json", 3)["valeur"] == 18.5
+    assert relu.get("notes.json", 4) is None
+
+    store.compact("notes.json")
+    assert store._journal("notes.json").size() == 0
+    compacte = EntityStore(str(tmp_path), journal=True)
+    assert sorted(r["id"] for r in compacte.load("notes.json")) == [1, 2, 3, 5, 6, 7, 8, 9, 10]
+    assert compacte.get("notes.json", 3)["valeur"] == 18.5
+    # Le fichier JSON seul (sans journal) contient tout
+    assert EntityStore(str(tmp_path), journal=False).count("notes.json") == 9
+
+
+def test_flux_de_changements_sequence_et_segments(tmp_path, monkeypatch):
+    """Événements numérotés dans l'ordre, relus depuis un numéro, segments tournants, reprise après redémarrage"""
+    monkeypatch.setenv("CHANGE_LOG_MAX_BYTES", "300")
+    monkeypatch.setenv("CHANGE_LOG_MAX_FILES", "2")
+    store = EntityStore(str(tmp_path))
+    feed = ChangeFeed.attach(store)
+    recus = []
+    feed.subscribe(recus.extend)
+
+    store.put("notes.json", _note(1))
+    store.put("notes.json", _note(1, valeur=12.0))
+    store.put("notes.json", _note(1, valeur=12.0))  # Sans changement : pas d'événement
+    store.delete("notes.json", 1)
+    evenements = feed.read_since(0)
+    assert [(e["seq"], e["op"]) for e in evenements] == [(1, "create"), (2, "update"), (3, "delete")]
+    assert evenements[1]["avant"]["valeur"] == 10.0 and evenements[1]["record"]["valeur"] == 12.0
+    assert [e["seq"] for e in recus] == [1, 2, 3]
+    assert [e["seq"] for e in feed.read_since(1, limit=1)] == [2]
+
+    for note_id in range(2, 12):
+        store.put("notes.json", _note(note_id))
+    assert len(os.listdir(feed.directory)) <= 4  # 2 segments, la séquence et son verrou
+    assert feed.oldest_seq() > 1
+    assert feed.read_since(0)[0]["seq"] == feed.oldest_seq()
+
+    reprise = ChangeFeed(feed.directory)
+    assert reprise.last_seq() == 13
+    reprise.publish([{"collection": "notes", "op": "delete", "id": 2}])
+    assert feed.read_since(13)[0]["seq"] == 14
+
+
+def test_cle_unique_refusee(tmp_path):
+    """Un doublon d'email (casse et espaces ignorés) est refusé sans rien écrire"""
+    store = EntityStore(str(tmp_path))
+    _peupler(store)
+    with pytest.raises(DuplicateKeyError):
+        store.put("etudiants.json", {"id": 3, "nom": "Carol", "numero_etudiant": "E2024003",
+                                     "email": "  ALICE@etu.com "})
+    assert store.get("etudiants.json", 3) is None
+    assert store.find_unique("etudiants.json", "numero_etudiant", "e2024002")["id"] == 2
+    # Réécrire un enregistrement avec ses propres valeurs uniques reste permis
+    store.put("etudiants.json", {"id": 1, "nom": "Alice M.", "numero_etudiant": "E2024001", "email": "alice@etu.com"})
+    assert store.get("etudiants.json", 1)["nom"] == "Alice M."
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+@pytest.mark.parametrize("email", ["ÉLODIE@etu.com", "\télodie@etu.com", "élodie@etu.com\u00a0"])
+def test_cle_unique_meme_regle_sur_les_deux_backends(tmp_path, backend, email):
+    """Casse Unicode et blancs (tabulation, espace insécable) sont normalisés comme schema.unique_key"""
+    store = SqliteStore(str(tmp_path)) if backend == "sqlite" else EntityStore(str(tmp_path))
+    store.put("etudiants.json", {"id": 1, "nom": "Élodie", "numero_etudiant": "E2024001", "email": email})
+    with pytest.raises(DuplicateKeyError):
+        store.put("etudiants.json", {"id": 2, "nom": "Autre", "numero_etudiant": "E2024002", "email": "élodie@etu.com"})
+    assert store.find_unique("etudiants.json", "email", "Élodie@etu.com")["id"] == 1
+
+
+def test_cle_etrangere_invalide(tmp_path):
+    """check_references signale une note dont l'évaluation n'existe pas"""
+    store = EntityStore(str(tmp_path))
+    _peupler(store)
+    check_references(store, "notes.json", _note(1))
+    with pytest.raises(IntegrityError) as erreur:
+        check_references(store, "notes.json", _note(1, evaluation_id=99))
+    assert "evaluation_id=99" in str(erreur.value)
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_insertion_attend_une_suppression_en_cours(tmp_path, monkeypatch, backend):
+    """Une note dont l'évaluation est supprimée pendant l'insertion est refusée, jamais orpheline"""
+    monkeypatch.setenv("STORAGE_BACKEND", backend)
+    handler = JsonHandler(str(tmp_path))
+    store = handler.store
+    _peupler(store)
+    erreurs = []
+
+    def inserer():
+        try:
+            handler.add_item("notes.json", {"etudiant_id": 1, "evaluation_id": 1, "valeur": 12.0})
+        except IntegrityError as e:
+            erreurs.append(e)
+
+    with store.exclusive(affected_collections("evaluations.json")):
+        thread = threading.Thread(target=inserer)
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()  # La vérification attend la fin de la suppression
+        store.apply({"evaluations.json": {"delete": [1]}})
+    thread.join()
+    assert len(erreurs) == 1
+    assert store.find_by("notes.json", "evaluation_id", 1) == []
+
+
+def test_batcher_verifie_les_references(tmp_path):
+    """Le batcher refuse une référence absente sans faire échouer le reste du lot"""
+    store = EntityStore(str(tmp_path))
+    _peupler(store)
+    batcher = WriteBatcher(store, window_ms=50)
+    resultats = {}
+
+    def soumettre(nom, note):
+        try:
+            resultats[nom] = batcher.submit("notes.json", note)["id"]
+        except IntegrityError as e:
+            resultats[nom] = e
+
+    threads = [threading.Thread(target=soumettre, args=(nom, note)) for nom, note in (
+        ("valide", {"etudiant_id": 1, "evaluation_id": 1, "valeur": 10.0}),
+        ("orpheline", {"etudiant_id": 1, "evaluation_id": 99, "valeur": 10.0}))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert isinstance(resultats["orpheline"], IntegrityError)
+    assert store.get("notes.json", resultats["valide"])["evaluation_id"] == 1
+    assert store.count("notes.json") == 1
+
+
+def test_batcher_regroupe_les_ecritures_concurrentes(tmp_path):
+    """Les écritures d'une même fenêtre partent en lots de max_batch ; chacun récupère son ID"""
+    store = EntityStore(str(tmp_path))
+    _peupler(store)
+    batcher = WriteBatcher(store, window_ms=200, max_batch=4)
+    ids = []
+    threads = [threading.Thread(target=lambda v=v: ids.append(
+        batcher.submit("notes.json", {"etudiant_id": 1, "evaluation_id": 1, "valeur": float(v)})["id"]))
+        for v in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(ids) == list(range(1, 9))
+    metrics = batcher.metrics()
+    assert metrics["nb_enregistrements"] == 8
+    assert metrics["nb_lots"] < 8
+    assert sum(metrics["histogramme_tailles"].values()) == metrics["nb_lots"]
+    assert set(metrics["histogramme_tailles"]) <= {"<=1", "<=2", "<=4"}
+
+    immediat = WriteBatcher(store, window_ms=0)
+    assert immediat.submit("notes.json", _note(None))["id"] == 9
+    assert immediat.metrics()["nb_lots"] == 1
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_suppression_cascade_restrict_nullify(tmp_path, backend):
+    """Les dépendants sont supprimés (cascade), détachés (nullify) ou bloquent (restrict)"""
+    store = SqliteStore(str(tmp_path)) if backend == "sqlite" else EntityStore(str(tmp_path))
+    _peupler(store)
+    store.put_many("notes.json", [_note(1, 1, 1), _note(2, 2, 2)])
+
+    with pytest.raises(IntegrityError):
+        delete_with_dependents(store, "cours.json", 1, "restrict")
+    assert store.count("evaluations.json") == 2
+
+    assert delete_with_dependents(store, "professeurs.json", 1) == {"professeurs.json": 1}
+    assert store.get("cours.json", 1)["professeur_id"] is None
+
+    assert delete_with_dependents(store, "cours.json", 1) == {"cours.json": 1, "evaluations.json": 2, "notes.json": 2}
+    assert store.count("notes.json") == 0
+    assert delete_with_dependents(store, "cours.json", 1) is None
+
+
+def test_note_change_de_shard(tmp_path, monkeypatch):
+    """Changer la clé de shard d'une note la déplace : elle n'existe qu'une fois, dans le bon shard"""
+    monkeypatch.setenv("NOTES_SHARD_KEY", "evaluation_id")
+    store = ShardedStore(str(tmp_path))
+    _peupler(store)
+    store.put_many("notes.json", [_note(1, evaluation_id=1), _note(2, evaluation_id=1), _note(3, evaluation_id=2)])
+    store.put("notes.json", _note(1, evaluation_id=2, valeur=15.0))
+
+    assert store.count("notes.json") == 3
+    assert store.get("notes.json", 1)["evaluation_id"] == 2
+    assert sorted(r["id"] for r in store.find_by("notes.json", "evaluation_id", 1)) == [2]
+    assert sorted(r["id"] for r in store.find_by("notes.json", "evaluation_id", 2)) == [1, 3]
+
+    relu = ShardedStore(str(tmp_path))
+    assert sorted(r["id"] for r in relu.load("notes.json")) == [1, 2, 3]
+    assert relu.get("notes.json", 1)["valeur"] == 15.0
+
+
+@pytest.mark.parametrize("ecriture", ["put", "write_all"])
+def test_evaluation_change_de_cours_deplace_ses_notes(tmp_path, monkeypatch, ecriture):
+    """Notes découpées par cours : celles d'une évaluation déplacée suivent son nouveau cours"""
+    monkeypatch.setenv("NOTES_SHARD_KEY", "cours_id")
+    store = ShardedStore(str(tmp_path))
+    _peupler(store)
+    store.put("cours.json", {"id": 2, "nom": "Analyse", "code": "ANA001", "professeur_id": 1})
+    store.put_many("notes.json", [_note(1, 1, 1), _note(2, 2, 1), _note(3, 1, 2)])
+
+    deplacee = {"id": 1, "nom": "Partiel", "cours_id": 2, "coefficient": 1}
+    if ecriture == "put":
+        store.put("evaluations.json", deplacee)
+    else:
+        store.write_all("evaluations.json", [deplacee, store.get("evaluations.json", 2)])
+
+    for lecteur in (store, ShardedStore(str(tmp_path))):
+        assert sorted(r["id"] for r in lecteur.find_by("notes.json", "evaluation_id", 1)) == [1, 2]
+        assert lecteur.count("notes.json") == 3
+        assert lecteur.get("notes.json", 1)["evaluation_id"] == 1
+    assert sorted(n["id"] for n in store.load("notes/cours_2.json")) == [1, 2]
+    assert sorted(n["id"] for n in store.load("notes/cours_1.json")) == [3]
+
+
+@pytest.mark.parametrize("compression", ["gzip", "lzma"])
+def test_archive_deplace_les_annees_passees(tmp_path, compression):
+    """Les notes anciennes passent dans un segment compressé, relu par période ; un archivage repris n'a pas de doublon"""
+    store = EntityStore(str(tmp_path))
+    dates = ["2022-03-01T10:00:00", "2023-06-15T10:00:00", "2023-12-31T23:59:00", "2025-01-10T10:00:00"]
+    store.put_many("notes.json", [dict(_note(i, etudiant_id=i % 2), date_creation=d) for i, d in enumerate(dates, 1)])
+    archive = Archive(store, compression)
+
+    segment = archive.archive_before("notes", "2024-01-01")
+    assert (segment["nombre"], segment["id_min"], segment["id_max"]) == (3, 1, 3)
+    assert segment["fichier"].endswith(".jsonl.gz" if compression == "gzip" else ".jsonl.xz")
+    assert [r["id"] for r in store.load("notes.json")] == [4]
+    assert [r["id"] for r in archive.iter_records("notes", after="2023-01-01")] == [2, 3]
+    assert [r["id"] for r in archive.iter_history("notes", where={"etudiant_id": 0})] == [2, 4]
+    sortie = io.StringIO()
+    assert archive.export("notes", sortie, include_hot=True) == 4
+    assert archive.segments("notes", after="2024-01-01") == []
+
+    store.put("notes.json", dict(_note(3), date_creation=dates[2]))  # Retrait interrompu : encore chaude
+    assert archive.archive_before("notes", "2024-01-01") is None
+    assert store.get("notes.json", 3) is None and len(archive.segments("notes")) == 1
+    with pytest.raises(ValueError):
+        archive.archive_before("cours", "2024-01-01")
+
+
+@pytest.mark.parametrize("journal", [False, True])
+def test_agregats_apres_ecritures_et_compactage(tmp_path, journal):
+    """Les agrégats suivent les écritures et ne sont pas reconstruits par un compactage"""
+    store = EntityStore(str(tmp_path), journal=journal)
+    _peupler(store)
+    store.put_many("notes.json", [_note(1, 1, 1, 10.0), _note(2, 2, 1, 14.0), _note(3, 1, 2, 16.0)])
+    aggregates = Aggregates.for_store(store)
+    assert aggregates.totals() == (40.0, 3)
+
+    store.put("notes.json", _note(2, 2, 1, 8.0))
+    store.delete("notes.json", 3)
+    store.put("notes.json", _note(4, 2, 2, 12.0))
+    assert aggregates.totals() == (30.0, 3)
+    assert aggregates.totals(etudiant_id=2) == (20.0, 2)
+    assert aggregates.totals(evaluation_id=1) == (18.0, 2)
+    assert aggregates.counts()["nb_notes"] == 3
+
+    etat = aggregates._state
+    store.compact("notes.json")
+    assert aggregates.totals() == (30.0, 3)
+    assert aggregates._state is etat
+
+    # Une écriture hors de ce processus (autre store sur le même dossier) force une reconstruction
+    EntityStore(str(tmp_path), journal=journal).put("notes.json", _note(5, 1, 1, 20.0))
+    assert aggregates.totals() == (50.0, 4)
+
+
+def _deux_processus(tmp_path, backend):
+    """Deux stores sur le même dossier, comme deux processus (API à plusieurs workers)"""
+    if backend == "sqlite":
+        return SqliteStore(str(tmp_path)), SqliteStore(str(tmp_path))
+    journal = backend == "journal"
+    return EntityStore(str(tmp_path), journal=journal), EntityStore(str(tmp_path), journal=journal)
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite"])
+def test_agregats_ecriture_externe_puis_locale(tmp_path, backend):
+    """Une écriture locale n'efface pas une écriture d'un autre processus pas encore vue"""
+    store, autre = _deux_processus(tmp_path, backend)
+    _peupler(store)
+    store.put("notes.json", _note(1, 1, 1, 10.0))
+    aggregates = Aggregates.for_store(store)
+    assert aggregates.totals() == (10.0, 1)
+
+    autre.put("notes.json", _note(2, 2, 1, 20.0))
+    store.put("notes.json", _note(3, 1, 2, 5.0))
+    assert aggregates.totals() == (35.0, 3)
+    assert aggregates.totals(etudiant_id=2) == (20.0, 1)
+
+
+def test_bulletin_invalide_seulement_par_ses_dependances(tmp_path):
+    """Moyennes pondérées du bulletin ; seules les écritures qu'il cite le reconstruisent ; copie disque réutilisée"""
+    store = EntityStore(str(tmp_path))
+    _peupler(store)
+    store.put("cours.json", {"id": 1, "nom": "Algèbre", "code": "ALG001", "professeur_id": 1, "credits": 6})
+    store.put_many("notes.json", [_note(1, 1, 1, 8.0), _note(2, 1, 2, 14.0), _note(3, 2, 1, 15.0)])
+    cache = TranscriptCache(store, directory=str(tmp_path / "bulletins"))
+    bulletin = cache.get(1)
+    assert bulletin["moyenne_generale"] == 12.0 and bulletin["credits_valides"] == 6
+    assert bulletin["cours"][0]["professeur"]["nom"] == "Dr. Test"
+    assert cache.get(99) is None
+
+    store.put("notes.json", _note(4, 2, 2, 5.0))  # Note d'un autre étudiant
+    assert cache.get(1) is bulletin
+    store.put("evaluations.json", {"id": 1, "nom": "Partiel", "cours_id": 1, "coefficient": 4})
+    assert cache.get(1)["moyenne_generale"] == round((8.0 * 4 + 14.0 * 2) / 6, 2)
+    assert cache.metrics()["hits"] == 1
+
+    relu = TranscriptCache(store, directory=str(tmp_path / "bulletins"))
+    assert relu.get(1)["moyenne_generale"] == 10.0
+    assert relu.get(1)["genere_le"] == cache.get(1)["genere_le"]
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite"])
+def test_bulletin_ecriture_externe_puis_locale(tmp_path, backend):
+    """Un cours renommé par un autre processus n'est pas masqué par une écriture locale d'étudiant"""
+    store, autre = _deux_processus(tmp_path, backend)
+    _peupler(store)
+    store.put("notes.json", _note(1, 1, 1, 12.0))
+    cache = TranscriptCache(store)
+    assert cache.get(1)["cours"][0]["nom"] == "Algèbre"
+
+    autre.put("cours.json", {"id": 1, "nom": "RENAMED", "code": "ALG001", "professeur_id": 1})
+    store.put("etudiants.json", {"id": 3, "nom": "Carol", "numero_etudiant": "E2024003", "email": "carol@etu.com"})
+    assert cache.get(1)["cours"][0]["nom"] == "RENAMED"
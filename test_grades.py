@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests des moyennes : moteur de cohorte, format colonne, distributions, classements et calculs des entités
+"""
+import math
+import time
+
+import pytest
+
+from data_manager.aggregates import Aggregates
+from data_manager.columnar import ColumnarCache, ColumnarNotes, write_columnar
+from data_manager.distribution import GradeSketch
+from data_manager.entity_store import EntityStore
+from data_manager.grades import GradeEngine
+from data_manager.rankings import Leaderboard
+from entities.cours import Cours
+from entities.etudiant import Etudiant
+
+EVALUATIONS = [
+    {"id": 1, "cours_id": 1, "coefficient": 1},
+    {"id": 2, "cours_id": 1, "coefficient": 3},
+    {"id": 3, "cours_id": 2, "coefficient": 2},
+]
+
+NOTES = [
+    {"id": 1, "etudiant_id": 1, "evaluation_id": 1, "valeur": 10.0},
+    {"id": 2, "etudiant_id": 1, "evaluation_id": 2, "valeur": 14.0},
+    {"id": 3, "etudiant_id": 1, "evaluation_id": 3, "valeur": "abs"},
+    {"id": 4, "etudiant_id": 2, "evaluation_id": 1, "valeur": 18.0},
+    {"id": 5, "etudiant_id": 2, "evaluation_id": 3, "valeur": 8.0},
+    {"id": 6, "etudiant_id": 2, "evaluation_id": 2, "valeur": None},
+]
+
+
+@pytest.fixture
+def environnement(monkeypatch):
+    """Store isolé : ni coordination entre processus, ni flux de changements"""
+    monkeypatch.setenv("DATA_COORDINATION", "0")
+    monkeypatch.setenv("CHANGE_FEED", "0")
+
+
+def _colonnes_a_jour(cache, timeout=5.0):
+    """Attend la fin de la reconstruction en arrière-plan"""
+    limite = time.monotonic() + timeout
+    while (notes := cache.notes()) is None:
+        assert time.monotonic() < limite, "format colonne jamais reconstruit"
+        time.sleep(0.01)
+    return notes
+
+
+@pytest.fixture
+def colonnes(tmp_path):
+    write_columnar(NOTES, str(tmp_path))
+    notes = ColumnarNotes(str(tmp_path))
+    yield notes
+    notes.close()
+
+
+def test_moyenne_cours_identique_sur_tous_les_chemins(colonnes):
+    """Moteur, format colonne et liste donnent la même moyenne ; les valeurs non numériques sont écartées"""
+    cours = Cours("Algèbre", "ALG001", "", 3, id=1)
+    attendu = round((10.0 * 1 + 14.0 * 3 + 18.0 * 1) / 5, 2)
+    assert cours.calculer_moyenne(GradeEngine(NOTES, EVALUATIONS)) == attendu
+    assert cours.calculer_moyenne(colonnes, EVALUATIONS) == attendu
+    assert cours.calculer_moyenne(NOTES, EVALUATIONS) == attendu
+
+
+def test_moyenne_etudiant_par_ses_notes_comme_le_moteur():
+    """La moyenne pondérée calculée sur les seules notes de l'étudiant est celle du moteur"""
+    engine = GradeEngine(NOTES, EVALUATIONS)
+    for etudiant_id in (1, 2):
+        etudiant = Etudiant("Test", f"test{etudiant_id}@etu.com", f"E2024{etudiant_id:03d}", id=etudiant_id)
+        notes = [n for n in NOTES if n["etudiant_id"] == etudiant_id]
+        evaluations = [e for e in EVALUATIONS if e["id"] in {n["evaluation_id"] for n in notes}]
+        assert etudiant.calculer_moyenne(notes, evaluations) == engine.moyenne(etudiant_id=etudiant_id)
+        assert etudiant.calculer_moyenne(notes) == round(
+            sum(n["valeur"] for n in notes if isinstance(n["valeur"], float))
+            / sum(1 for n in notes if isinstance(n["valeur"], float)), 2)
+
+
+def test_format_colonne_sans_perte(tmp_path):
+    """Les valeurs non numériques sont lues en NaN mais restituées telles quelles"""
+    write_columnar(NOTES + [{"id": 7, "etudiant_id": "x", "evaluation_id": 1, "commentaire": "é"}], str(tmp_path))
+    notes = ColumnarNotes(str(tmp_path))
+    assert math.isnan(notes.columns["valeur"][2])
+    assert list(notes.records()) == NOTES + [{"id": 7, "etudiant_id": "x", "evaluation_id": 1, "commentaire": "é"}]
+    assert notes.moyenne(etudiant_id=1) == 12.0
+    notes.close()
+
+
+def test_cache_colonne_ajoute_puis_reconstruit(tmp_path, environnement):
+    """Une création est ajoutée aux colonnes ; une modification les reconstruit.
+    Les notes déjà ouvertes restent lisibles par les threads qui les tiennent."""
+    store = EntityStore(str(tmp_path))
+    store.put_many("notes.json", NOTES)
+    cache = ColumnarCache.for_store(store)
+    premieres = _colonnes_a_jour(cache)
+    assert len(premieres) == 6
+
+    store.put("notes.json", {"id": 7, "etudiant_id": 3, "evaluation_id": 1, "valeur": 12.0})
+    ajoutees = cache.notes()
+    assert ajoutees is not None and len(ajoutees) == 7
+    assert list(premieres.columns["id"]) == [1, 2, 3, 4, 5, 6]
+
+    store.put("notes.json", {"id": 1, "etudiant_id": 1, "evaluation_id": 1, "valeur": 20.0})
+    reconstruites = _colonnes_a_jour(cache)
+    assert reconstruites.moyenne(evaluation_id=1) == round((20.0 + 18.0 + 12.0) / 3, 2)
+    assert premieres.moyenne(evaluation_id=1) == 14.0
+    assert ajoutees.moyenne(evaluation_id=1) == round((10.0 + 18.0 + 12.0) / 3, 2)
+
+
+def test_distribution_quantiles_histogramme_et_retrait():
+    """Quantiles identiques à numpy.quantile ; fusion et retrait exacts ; 20 compte dans la dernière case"""
+    valeurs = [0.0, 4.5, 8.25, 10.0, 10.0, 12.75, 15.5, 19.99, 20.0]
+    sketch = GradeSketch()
+    for valeur in valeurs + [7.0]:
+        sketch.add(valeur)
+    sketch.add(7.0, -1)
+    # numpy.quantile(valeurs, [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1]), arrondi au centième
+    assert sketch.quantiles([0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0]) == [0.0, 3.6, 8.25, 10.0, 15.5, 19.99, 20.0]
+
+    fusion = GradeSketch.merged([GradeSketch({1000: 2}), GradeSketch({1500: 1})])
+    assert fusion.total == 3 and fusion.quantile(0.5) == 10.0
+    histogramme = sketch.histogram()
+    assert len(histogramme) == 20 and histogramme[19]["nombre"] == 2 and histogramme[10]["nombre"] == 2
+    resume = sketch.summary()
+    assert (resume["nombre"], resume["min"], resume["max"], resume["mediane"]) == (9, 0.0, 20.0, 10.0)
+    assert GradeSketch().summary()["mediane"] is None
+
+
+def test_classement_rangs_ex_aequo_et_top():
+    """Ex aequo au même rang, top-k étendu aux ex aequo du k-ième, rang mis à jour au changement de score"""
+    classement = Leaderboard()
+    for membre, score in {"a": 12.0, "b": 15.5, "c": 12.0, "d": 8.0, "e": 20.0}.items():
+        classement.set(membre, score)
+    assert classement.rank("a") == {"rang": 3, "sur": 5, "score": 12.0}
+    assert classement.rank("c")["rang"] == 3 and classement.rank("d")["rang"] == 5
+    assert [(r["rang"], r["membre"]) for r in classement.top(3)] == [(1, "e"), (2, "b"), (3, "a"), (3, "c")]
+    classement.set("d", 19.0)
+    classement.remove("e")
+    assert [r["membre"] for r in classement.top(2)] == ["d", "b"]
+    assert classement.rank("e") is None and len(classement) == 4
+
+
+def test_classements_tenus_a_jour_par_les_ecritures(tmp_path, environnement):
+    """Classement d'un cours par moyenne pondérée, recalculé quand un coefficient ou une note change"""
+    store = EntityStore(str(tmp_path))
+    store.put_many("evaluations.json", EVALUATIONS)
+    store.put_many("notes.json", NOTES)
+    aggregates = Aggregates(store)
+    # Étudiant 1 : (10 + 14 * 3) / 4 = 13 ; étudiant 2 : 18 (sa note None est écartée)
+    assert [(r["membre"], r["score"]) for r in aggregates.top(cours_id=1)] == [(2, 18.0), (1, 13.0)]
+    assert aggregates.rank(1, evaluation_id=2) == {"rang": 1, "sur": 1, "score": 14.0}
+
+    store.put("evaluations.json", {"id": 1, "cours_id": 1, "coefficient": 0.5})
+    assert aggregates.rank(1, cours_id=1)["score"] == round((10 * 0.5 + 14 * 3) / 3.5, 2)
+    store.put("notes.json", {"id": 7, "etudiant_id": 1, "evaluation_id": 2, "valeur": 20.0})
+    store.delete("notes.json", 4)
+    assert aggregates.top(cours_id=1, k=1)[0]["membre"] == 1
+    assert aggregates.rank(2, cours_id=1) is None
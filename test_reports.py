@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests du planificateur de rapports (data_manager.reports)
+"""
+import time
+
+import pytest
+
+from data_manager.entity_store import EntityStore
+from data_manager.reports import ReportScheduler
+from data_manager.sqlite_store import SqliteStore
+
+
+@pytest.fixture(autouse=True)
+def environnement(monkeypatch):
+    monkeypatch.setenv("DATA_COORDINATION", "0")
+    monkeypatch.setenv("CHANGE_FEED", "0")
+
+
+def _nombre_notes(store, cancel):
+    """Nombre de notes"""
+    return store.count("notes.json")
+
+
+def _note(note_id, valeur=10.0):
+    return {"id": note_id, "etudiant_id": 1, "evaluation_id": 1, "valeur": valeur}
+
+
+def _deux_processus(tmp_path, backend):
+    if backend == "sqlite":
+        return SqliteStore(str(tmp_path)), SqliteStore(str(tmp_path))
+    return EntityStore(str(tmp_path)), EntityStore(str(tmp_path))
+
+
+def _planificateur(store, tmp_path, **options):
+    scheduler = ReportScheduler(store, directory=str(tmp_path / "reports"))
+    scheduler.register("notes", _nombre_notes, ("notes.json",), **options)
+    return scheduler
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_version_publiee_et_relue(tmp_path, backend):
+    """Une exécution publie une version relue telle quelle, avec les signatures de ses sources"""
+    store, _ = _deux_processus(tmp_path, backend)
+    store.put("notes.json", _note(1))
+    scheduler = _planificateur(store, tmp_path)
+    meta = scheduler.run("notes")
+    assert meta["version"] == 1
+    assert scheduler.read("notes")["donnees"] == 1
+    assert "notes.json" in scheduler.meta("notes")["sources"]
+    scheduler.stop()
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_seuil_atteint_par_un_autre_processus(tmp_path, backend):
+    """Les écritures d'un autre worker comptent pour le seuil (comparaison des signatures au tick)"""
+    store, autre = _deux_processus(tmp_path, backend)
+    store.put("notes.json", _note(1))
+    scheduler = _planificateur(store, tmp_path, change_threshold=3 if backend == "sqlite" else 1)
+    scheduler.run("notes")
+    assert scheduler._due() == []
+
+    for note_id in (2, 3, 4):
+        autre.put("notes.json", _note(note_id))
+    assert scheduler._due() == ["notes"]
+    assert scheduler.run("notes")["version"] == 2
+    assert scheduler.read("notes")["donnees"] == 4
+    assert scheduler._due() == []
+    scheduler.stop()
+
+
+def test_intervalle_apres_ecriture_externe_puis_locale(tmp_path):
+    """Une écriture locale ne masque pas une écriture externe encore non comptée"""
+    store, autre = _deux_processus(tmp_path, "sqlite")
+    store.put("notes.json", _note(1))
+    scheduler = _planificateur(store, tmp_path, interval=0.05)
+    scheduler.run("notes")
+    autre.put("notes.json", _note(2))
+    store.put("notes.json", _note(3))
+    time.sleep(0.06)
+    assert scheduler._due() == ["notes"]
+    assert scheduler.status()[0]["ecritures_depuis"] == 2
+    scheduler.stop()
+
+
+def test_reprise_compte_les_ecritures_depuis_la_derniere_version(tmp_path):
+    """Au redémarrage, les écritures faites depuis la dernière version la rendent périmée"""
+    store, autre = _deux_processus(tmp_path, "sqlite")
+    store.put("notes.json", _note(1))
+    _planificateur(store, tmp_path).run("notes")
+    autre.put("notes.json", _note(2))
+
+    reprise = _planificateur(SqliteStore(str(tmp_path)), tmp_path, change_threshold=1)
+    assert reprise._due() == ["notes"]
+    sans_changement = _planificateur(SqliteStore(str(tmp_path)), tmp_path / "autre", change_threshold=1)
+    assert sans_changement._due() == ["notes"]  # Jamais exécuté dans ce dossier
+    reprise.stop()
+    sans_changement.stop()